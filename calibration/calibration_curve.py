@@ -0,0 +1,97 @@
+# calibration_curve.py
+
+"""The calibration_curve.py module implements a piecewise-linear calibration curve engine.
+Breakpoints and segment slopes are precomputed once, so evaluating a single value is a
+pure-Python bisect plus one multiply-add, and evaluating a whole buffer is one NumPy
+searchsorted over the array. It replaces scipy's interp1d, which is slow to import on the
+ARM boards and costly per scalar call."""
+
+import bisect
+import math
+
+try:
+    import numpy as np
+except ImportError:  # scalar evaluation and the list fallback do not need NumPy
+    np = None
+
+EXTRAPOLATION_POLICIES = ('linear', 'clamp', 'nan', 'error')
+
+
+class CalibrationCurve:
+    """Piecewise-linear mapping from x to y with an explicit extrapolation policy.
+
+    Extrapolation policies outside the calibrated range:
+    'linear' extends the first/last segment, 'clamp' holds the end values,
+    'nan' returns NaN and 'error' raises ValueError.
+    """
+
+    def __init__(self, xs, ys, extrapolation='linear'):
+        if extrapolation not in EXTRAPOLATION_POLICIES:
+            raise ValueError(f"Unknown extrapolation policy {extrapolation!r}, use one of {EXTRAPOLATION_POLICIES}")
+        points = sorted(zip((float(x) for x in xs), (float(y) for y in ys)))
+        if len(points) < 2:
+            raise ValueError("A calibration curve needs at least two points")
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        if any(b <= a for a, b in zip(xs, xs[1:])):
+            raise ValueError("Calibration points must have distinct x values")
+
+        self.extrapolation = extrapolation
+        self.xs = xs
+        self.ys = ys
+        self.slopes = [(y1 - y0) / (x1 - x0) for x0, x1, y0, y1 in zip(xs, xs[1:], ys, ys[1:])]
+        self.x_min = xs[0]
+        self.x_max = xs[-1]
+        self._last_segment = len(xs) - 2
+        if np is not None:
+            self._xs_array = np.asarray(xs)
+            self._ys_array = np.asarray(ys)
+            self._slopes_array = np.asarray(self.slopes)
+
+    @classmethod
+    def from_points(cls, points, x_key, y_key, extrapolation='linear'):
+        """Builds a curve from a list of dicts, e.g. calibration_data.json point lists."""
+        return cls([point[x_key] for point in points], [point[y_key] for point in points], extrapolation)
+
+    def inverse(self, extrapolation=None):
+        """Returns the y -> x curve. Only valid for strictly monotonic curves."""
+        return CalibrationCurve(self.ys, self.xs, extrapolation or self.extrapolation)
+
+    def __call__(self, x):
+        """Evaluates a single value with a bisect over the breakpoints."""
+        if x < self.x_min or x > self.x_max:
+            if self.extrapolation == 'clamp':
+                return self.ys[0] if x < self.x_min else self.ys[-1]
+            if self.extrapolation == 'nan':
+                return math.nan
+            if self.extrapolation == 'error':
+                raise ValueError(f"{x} is outside the calibrated range [{self.x_min}, {self.x_max}]")
+        i = min(max(bisect.bisect_right(self.xs, x) - 1, 0), self._last_segment)
+        return self.ys[i] + self.slopes[i] * (x - self.xs[i])
+
+    def evaluate(self, values):
+        """Evaluates a whole buffer. Returns a NumPy array, or a list when NumPy is unavailable."""
+        if np is None:
+            return [self(value) for value in values]
+        x = np.asarray(values, dtype=float)
+        i = np.searchsorted(self._xs_array, x, side='right') - 1
+        np.clip(i, 0, self._last_segment, out=i)
+        y = self._ys_array[i] + self._slopes_array[i] * (x - self._xs_array[i])
+        if self.extrapolation != 'linear':
+            below = x < self.x_min
+            above = x > self.x_max
+            if self.extrapolation == 'clamp':
+                y[below] = self.ys[0]
+                y[above] = self.ys[-1]
+            elif self.extrapolation == 'nan':
+                y[below | above] = np.nan
+            elif np.any(below | above):
+                raise ValueError(f"Values outside the calibrated range [{self.x_min}, {self.x_max}]")
+        return y
+
+
+# Example usage
+if __name__ == '__main__':
+    curve = CalibrationCurve([0, 10, 20], [0, 5, 15], extrapolation='clamp')
+    print(f"Flow at 15 m: {curve(15)}")
+    print(f"Flow for a buffer: {curve.evaluate([0, 5, 15, 25])}")
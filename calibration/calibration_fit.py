@@ -0,0 +1,269 @@
+# calibration_fit.py
+
+"""The calibration_fit.py module fits calibration models to the reference points stored in
+calibration_data.json and reports how well they fit. Linear, polynomial and continuous piecewise-linear
+models are solved with NumPy least squares for every sensor section in one pass. The result is written as
+a 'fit' entry per section into a new, versioned calibration file, which calibration_pipeline compiles in
+preference to the raw points; '_comment' entries and other keys the tool does not understand are carried
+over unchanged. Stored raw history can be re-converted in bulk with the new calibration.
+
+Usage:
+    python -m calibration.calibration_fit fit calibration/calibration_data.json --model linear --write
+    python -m calibration.calibration_fit reapply calibration/calibration_data.json --pipeline pH --history raw.csv
+"""
+
+import argparse
+import copy
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from calibration.calibration_pipeline import POINT_KEYS, compile_calibration, fit_stage, load_calibration_file
+from state_manager.persistence import atomic_write
+
+MODELS = ('linear', 'polynomial', 'piecewise')
+
+
+@dataclass
+class FitResult:
+    section: str
+    points_key: str
+    model: str
+    fit: dict
+    x: np.ndarray = field(repr=False)
+    y: np.ndarray = field(repr=False)
+    residuals: np.ndarray = field(repr=False)
+
+    @property
+    def rmse(self):
+        return float(np.sqrt(np.mean(self.residuals ** 2)))
+
+    @property
+    def max_abs_error(self):
+        return float(np.max(np.abs(self.residuals)))
+
+    @property
+    def r_squared(self):
+        total = float(np.sum((self.y - self.y.mean()) ** 2))
+        if total == 0.0:
+            return 1.0
+        return 1.0 - float(np.sum(self.residuals ** 2)) / total
+
+    def report(self):
+        return {'section': self.section, 'model': self.model, 'points': len(self.x), 'r_squared': self.r_squared,
+                'rmse': self.rmse, 'max_abs_error': self.max_abs_error, 'residuals': self.residuals.tolist()}
+
+
+def fit_linear(x, y):
+    """Least-squares y = slope * x + intercept. Returns the 'fit' entry."""
+    design = np.column_stack([x, np.ones_like(x)])
+    (slope, intercept), *_ = np.linalg.lstsq(design, y, rcond=None)
+    return {'model': 'linear', 'coefficients': [float(slope), float(intercept)]}
+
+
+def fit_polynomial(x, y, degree=2):
+    """Least-squares polynomial, coefficients highest power first. The degree is capped by the point count."""
+    degree = min(degree, len(x) - 1)
+    coefficients = np.polyfit(x, y, degree)
+    return {'model': 'polynomial', 'coefficients': [float(c) for c in coefficients]}
+
+
+def fit_piecewise(x, y, segments=2, knots=None):
+    """Least-squares continuous piecewise-linear model with hinge functions at the knots.
+
+    Knots default to evenly spaced quantiles of x. Returns the knot positions (including both ends)
+    and the fitted values there, which is exactly what a PiecewiseLinearStage needs.
+    """
+    if knots is None:
+        segments = max(1, min(segments, len(x) - 1))
+        knots = np.quantile(x, np.linspace(0, 1, segments + 1))[1:-1]
+    knots = np.unique(np.asarray(knots, dtype=float))
+    knots = knots[(knots > x.min()) & (knots < x.max())]
+    design = np.column_stack([np.ones_like(x), x] + [np.maximum(0.0, x - k) for k in knots])
+    coefficients, *_ = np.linalg.lstsq(design, y, rcond=None)
+    positions = np.concatenate([[x.min()], knots, [x.max()]])
+    basis = np.column_stack([np.ones_like(positions), positions] + [np.maximum(0.0, positions - k) for k in knots])
+    return {'model': 'piecewise', 'knots': positions.tolist(), 'values': (basis @ coefficients).tolist()}
+
+
+def fit_points(x, y, model='linear', degree=2, segments=2):
+    if model == 'linear':
+        return fit_linear(x, y)
+    if model == 'polynomial':
+        return fit_polynomial(x, y, degree)
+    if model == 'piecewise':
+        return fit_piecewise(x, y, segments)
+    raise ValueError(f"Unknown model {model!r}, use one of {MODELS}")
+
+
+def iter_point_sets(data):
+    """Yields (section, points_key, x, y) for every section that carries calibration points."""
+    for section_name, section in data.items():
+        if not isinstance(section, dict):
+            continue
+        for points_key, (x_key, y_key) in POINT_KEYS.items():
+            points = section.get(points_key)
+            if points:
+                x = np.array([point[x_key] for point in points], dtype=float)
+                y = np.array([point[y_key] for point in points], dtype=float)
+                yield section_name, points_key, x, y
+
+
+def fit_all(data, model='linear', degree=2, segments=2, models=None):
+    """Fits every section with at least two points. models maps section -> model to override model."""
+    results = {}
+    for section, points_key, x, y in iter_point_sets(data):
+        if len(x) < 2:
+            logging.getLogger('CalibrationFit').warning(f"Skipping {section}: fewer than two points.")
+            continue
+        section_model = (models or {}).get(section, model)
+        fit = fit_points(x, y, section_model, degree, segments)
+        residuals = y - np.asarray(fit_stage(fit).apply(x), dtype=float)
+        results[section] = FitResult(section, points_key, section_model, fit, x, y, residuals)
+    return results
+
+
+def apply_fits(data, results):
+    """Returns a copy of data with each result stored as the section's 'fit' entry."""
+    updated = copy.deepcopy(data)
+    for section, result in results.items():
+        updated[section]['fit'] = dict(result.fit, r_squared=result.r_squared, rmse=result.rmse)
+    return updated
+
+
+def next_version(output_path):
+    """Returns 1 + the highest <stem>.v<N>.json version next to output_path."""
+    stem, extension = os.path.splitext(output_path)
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r'\.v(\d+)' + re.escape(extension) + '$')
+    versions = [int(match.group(1)) for match in
+                (pattern.match(os.path.basename(path)) for path in glob.glob(f"{glob.escape(stem)}.v*{extension}"))
+                if match]
+    return max(versions, default=0) + 1
+
+
+class _Pairs(list):
+    """A JSON object decoded as its (key, value) pairs, so repeated keys such as '_comment' survive."""
+
+
+def read_document(path):
+    """Returns the top-level (key, value) pairs of a calibration file in file order, including the
+    '_'-prefixed and repeated keys that load_calibration_file() drops."""
+    def to_dicts(value):
+        if isinstance(value, _Pairs):
+            return {key: to_dicts(item) for key, item in value}
+        if isinstance(value, list):
+            return [to_dicts(item) for item in value]
+        return value
+
+    with open(path, 'r') as file:
+        return [(key, to_dicts(value)) for key, value in json.load(file, object_pairs_hook=_Pairs)]
+
+
+def merge_document(pairs, data):
+    """Replaces the sections of data in the original pairs, keeping every other key and the key order.
+    Sections that are new in data are appended."""
+    merged = []
+    written = set()
+    for key, value in pairs:
+        if key in data:
+            if key in written:
+                continue
+            value = data[key]
+            written.add(key)
+        merged.append((key, value))
+    merged.extend((key, value) for key, value in data.items() if key not in written)
+    return merged
+
+
+def dumps_pairs(pairs):
+    """Formats top-level pairs like json.dumps(indent=2), repeated keys included."""
+    members = [f"  {json.dumps(key)}: {json.dumps(value, indent=2)}".replace('\n', '\n  ') for key, value in pairs]
+    return '{\n' + ',\n'.join(members) + '\n}\n'
+
+
+def write_versioned(data, output_path, source_path=None):
+    """Writes <stem>.v<N>.json and atomically replaces output_path with the same content.
+    Keys of source_path (default output_path, if it exists) that data does not replace, such as
+    '_comment' entries, are carried over. Returns the versioned path. Running watchers pick the new
+    calibration up from output_path."""
+    version = next_version(output_path)
+    source_path = source_path or output_path
+    pairs = read_document(source_path) if os.path.exists(source_path) else []
+    stamp = {'_version': version, '_fitted_at': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+    text = dumps_pairs(merge_document(pairs, dict(data, **stamp)))
+    stem, extension = os.path.splitext(output_path)
+    versioned_path = f"{stem}.v{version}{extension}"
+    atomic_write(versioned_path, text)
+    atomic_write(output_path, text)
+    return versioned_path
+
+
+def recalibrate_history(raw_values, data, pipeline_name):
+    """Converts a whole buffer of stored raw readings with the calibration in data."""
+    pipelines = compile_calibration(data)
+    if pipeline_name not in pipelines:
+        raise KeyError(f"No calibration pipeline named {pipeline_name!r}")
+    return pipelines[pipeline_name].apply(np.asarray(raw_values, dtype=float))
+
+
+def format_report(results):
+    lines = [f"{'section':<16}{'model':<12}{'points':>7}{'R^2':>10}{'RMSE':>12}{'max |err|':>12}"]
+    for result in results.values():
+        lines.append(f"{result.section:<16}{result.model:<12}{len(result.x):>7}"
+                     f"{result.r_squared:>10.5f}{result.rmse:>12.5g}{result.max_abs_error:>12.5g}")
+        lines.append(f"{'':<16}residuals: {np.array2string(result.residuals, precision=4)}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit calibration models and re-apply them to history.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fit_parser = commands.add_parser('fit', help="Fit every sensor section and report residuals")
+    fit_parser.add_argument('calibration_file')
+    fit_parser.add_argument('--model', choices=MODELS, default='linear')
+    fit_parser.add_argument('--degree', type=int, default=2, help="Polynomial degree")
+    fit_parser.add_argument('--segments', type=int, default=2, help="Piecewise segments")
+    fit_parser.add_argument('--section-model', action='append', default=[], metavar='SECTION=MODEL',
+                            help="Per-section model override, may be repeated")
+    fit_parser.add_argument('--write', action='store_true', help="Write a new versioned calibration file")
+    fit_parser.add_argument('--output', help="Calibration file to replace (default: the input file)")
+    fit_parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    reapply_parser = commands.add_parser('reapply', help="Convert a raw history CSV with a calibration")
+    reapply_parser.add_argument('calibration_file')
+    reapply_parser.add_argument('--pipeline', required=True, help="Pipeline name, e.g. pH or radar_level")
+    reapply_parser.add_argument('--history', required=True, help="CSV with timestamp,raw columns")
+    reapply_parser.add_argument('--output', help="Output CSV (default: stdout)")
+    args = parser.parse_args(argv)
+
+    data = load_calibration_file(args.calibration_file)
+    if args.command == 'fit':
+        models = dict(item.split('=', 1) for item in args.section_model)
+        results = fit_all(data, args.model, args.degree, args.segments, models)
+        if args.json:
+            print(json.dumps([result.report() for result in results.values()], indent=2))
+        else:
+            print(format_report(results))
+        if args.write:
+            versioned_path = write_versioned(apply_fits(data, results), args.output or args.calibration_file,
+                                             args.calibration_file)
+            print(f"Wrote {versioned_path}", file=sys.stderr)
+        return 0
+
+    history = np.loadtxt(args.history, delimiter=',', ndmin=2)
+    values = recalibrate_history(history[:, 1], data, args.pipeline)
+    output = np.column_stack([history[:, 0], history[:, 1], values])
+    np.savetxt(args.output or sys.stdout, output, delimiter=',', fmt='%.6f', header='timestamp,raw,value', comments='')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+# calibration_pipeline.py
+
+"""The calibration_pipeline.py module compiles each sensor section of calibration_data.json into a
+chain of vectorized stages (linear, piecewise-linear, polynomial, lookup table). A pipeline converts a
+single raw value or a whole block of register values in one pass. CalibrationManager owns the compiled
+pipelines, swaps them atomically when the file changes, and hands sensors bound pipelines that always
+use the latest calibration."""
+
+import json
+import logging
+import numbers
+import threading
+
+from calibration.calibration_curve import CalibrationCurve
+from calibration.ph_compensation import PHTemperatureCompensation
+from state_manager.file_watcher import FileWatcher
+
+try:
+    import numpy as np
+except ImportError:  # pipelines still work on scalars and lists without NumPy
+    np = None
+
+
+def _is_scalar(values):
+    return isinstance(values, numbers.Number)
+
+
+class LinearStage:
+    """y = slope * x + intercept"""
+
+    def __init__(self, slope, intercept=0.0):
+        self.slope = float(slope)
+        self.intercept = float(intercept)
+
+    def __call__(self, x):
+        return self.slope * x + self.intercept
+
+    def apply(self, values):
+        if np is None:
+            return [self(x) for x in values]
+        return np.asarray(values, dtype=float) * self.slope + self.intercept
+
+
+class PiecewiseLinearStage:
+    """Interpolates between calibration points with a precomputed CalibrationCurve."""
+
+    def __init__(self, xs, ys, extrapolation='linear'):
+        self.curve = CalibrationCurve(xs, ys, extrapolation)
+
+    def __call__(self, x):
+        return self.curve(x)
+
+    def apply(self, values):
+        return self.curve.evaluate(values)
+
+
+class PolynomialStage:
+    """y = c0 * x**n + ... + cn, coefficients highest power first (as numpy.polyval)."""
+
+    def __init__(self, coefficients):
+        if not coefficients:
+            raise ValueError("A polynomial stage needs at least one coefficient")
+        self.coefficients = [float(c) for c in coefficients]
+
+    def __call__(self, x):
+        result = 0.0
+        for c in self.coefficients:  # Horner's scheme
+            result = result * x + c
+        return result
+
+    def apply(self, values):
+        if np is None:
+            return [self(x) for x in values]
+        return np.polyval(self.coefficients, np.asarray(values, dtype=float))
+
+
+class LookupTableStage:
+    """Maps integer raw codes (e.g. 16-bit register values) through a precomputed table.
+    Codes outside the table are clamped to its ends."""
+
+    def __init__(self, table):
+        self.table = np.asarray(table, dtype=float) if np is not None else [float(v) for v in table]
+        self._last = len(self.table) - 1
+
+    @classmethod
+    def from_function(cls, function, size=65536):
+        """Tabulates function over the codes 0..size-1."""
+        if np is not None and hasattr(function, 'apply'):
+            return cls(function.apply(np.arange(size)))
+        return cls([function(code) for code in range(size)])
+
+    def __call__(self, x):
+        return float(self.table[min(max(int(x), 0), self._last)])
+
+    def apply(self, values):
+        if np is None:
+            return [self(x) for x in values]
+        return np.take(self.table, np.asarray(values, dtype=np.int64), mode='clip')
+
+
+class CalibrationPipeline:
+    """An ordered chain of stages. Calling it converts one value; apply() converts a block."""
+
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = list(stages)
+
+    def __call__(self, value):
+        for stage in self.stages:
+            value = stage(value)
+        return value
+
+    def apply(self, values):
+        if _is_scalar(values):
+            return self(values)
+        for stage in self.stages:
+            values = stage.apply(values)
+        return values
+
+    def then(self, *stages, name=None):
+        """Returns a new pipeline with extra stages appended."""
+        return CalibrationPipeline(name or self.name, self.stages + list(stages))
+
+    def tabulate(self, size=65536):
+        """Collapses the chain into a single lookup table for integer register codes."""
+        return CalibrationPipeline(self.name, [LookupTableStage.from_function(self, size)])
+
+
+# calibration point lists: points key -> (raw x key, reference y key)
+POINT_KEYS = {
+    'calibration_points': ('measured_value', 'standard_value'),
+    'calibration_curve': ('voltage', 'ntu'),
+    'calibration_distance_points': ('measured_distance', 'actual_distance'),
+    'calibration_flow_points': ('adc_reading', 'actual_flow_l_min'),
+}
+
+
+def _points(section, key):
+    x_key, y_key = POINT_KEYS[key]
+    points = section.get(key) or []
+    return [point[x_key] for point in points], [point[y_key] for point in points]
+
+
+def fit_stage(fit):
+    """Builds the stage for a fitted model written by calibration_fit ('fit' entry of a section)."""
+    model = fit['model']
+    if model == 'linear':
+        return LinearStage(*fit['coefficients'])
+    if model == 'polynomial':
+        return PolynomialStage(fit['coefficients'])
+    if model == 'piecewise':
+        return PiecewiseLinearStage(fit['knots'], fit['values'])
+    raise ValueError(f"Unknown fitted model {model!r}")
+
+
+def _measurement_stage(section, points_key, extrapolation='linear'):
+    """A fitted model if the section has one, else interpolation through at least two points, else None."""
+    if 'fit' in section:
+        return fit_stage(section['fit'])
+    xs, ys = _points(section, points_key)
+    if len(xs) >= 2:
+        return PiecewiseLinearStage(xs, ys, extrapolation)
+    return None
+
+
+def compile_ph(section):
+    """measured value -> pH from the fit or calibration points, or slope/intercept as the fallback."""
+    stage = _measurement_stage(section, 'calibration_points')
+    if stage is None:
+        stage = LinearStage(section['slope'], section['intercept'])
+    return CalibrationPipeline('pH', [stage])
+
+
+def compile_turbidity(section):
+    """voltage -> NTU along the calibration curve."""
+    stage = _measurement_stage(section, 'calibration_curve', extrapolation='clamp')
+    if stage is None:
+        raise ValueError("turbidity needs a fit or at least two calibration_curve points")
+    return CalibrationPipeline('turbidity', [stage])
+
+
+def compile_turbidity_mg_l(section):
+    """voltage -> NTU -> mg/L."""
+    return compile_turbidity(section).then(LinearStage(section['ntu_to_mg_l_conversion']), name='turbidity_mg_l')
+
+
+def compile_radar_level(section):
+    """measured distance -> corrected distance -> level (scaling_factor * distance + offset)."""
+    stages = []
+    stage = _measurement_stage(section, 'calibration_distance_points')
+    if stage is not None:
+        stages.append(stage)
+    conversion = section.get('distance_to_level_conversion')
+    if conversion:
+        stages.append(LinearStage(conversion.get('scaling_factor', 1.0), conversion.get('offset', 0.0)))
+    return CalibrationPipeline('radar_level', stages)
+
+
+def compile_flow_rate(section):
+    """ADC reading -> l/min from the fit or calibration points, or (adc - zero_flow_adc) / k_factor."""
+    stage = _measurement_stage(section, 'calibration_flow_points')
+    if stage is None:
+        conversion = section['flow_conversion']
+        k_factor = float(conversion['k_factor'])
+        stage = LinearStage(1.0 / k_factor, -conversion['zero_flow_adc'] / k_factor)
+    return CalibrationPipeline('flow_rate', [stage])
+
+
+# pipeline name -> (section in calibration_data.json, compiler)
+COMPILERS = {
+    'pH': ('pH', compile_ph),
+    'turbidity': ('turbidity', compile_turbidity),
+    'turbidity_mg_l': ('turbidity', compile_turbidity_mg_l),
+    'radar_level': ('radar_level', compile_radar_level),
+    'flow_rate': ('flow_rate', compile_flow_rate),
+}
+
+
+def compile_calibration(data):
+    """Compiles every known section present in data into {name: CalibrationPipeline}.
+    Raises ValueError (or KeyError) if any section is malformed, so a bad file never half-applies."""
+    pipelines = {}
+    for name, (section_name, compiler) in COMPILERS.items():
+        section = data.get(section_name)
+        if section is not None:
+            pipelines[name] = compiler(section)
+    return pipelines
+
+
+def load_calibration_file(path):
+    """Reads calibration_data.json. Keys starting with '_' are comments."""
+    with open(path, 'r') as file:
+        data = json.load(file)
+    return {key: value for key, value in data.items() if not key.startswith('_')}
+
+
+class BoundPipeline:
+    """A sensor's handle on one named pipeline; always resolves the manager's current version."""
+
+    def __init__(self, manager, name):
+        self.manager = manager
+        self.name = name
+
+    def __call__(self, value):
+        return self.manager.pipelines[self.name](value)
+
+    def apply(self, values):
+        return self.manager.pipelines[self.name].apply(values)
+
+
+class CalibrationManager:
+    def __init__(self, file_path='calibration/calibration_data.json', watch=False, poll_interval=1.0):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.file_path = file_path
+        self.pipelines = {}
+        self.data = {}
+        self.version = 0
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self.reload()
+        if watch:
+            self.start_watching(poll_interval)
+
+    def reload(self):
+        """Recompiles the file and swaps all pipelines at once. On error the previous ones stay active."""
+        with self._reload_lock:
+            try:
+                data = load_calibration_file(self.file_path)
+                pipelines = compile_calibration(data)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.logger.error(f"Error loading calibration from {self.file_path}: {e}")
+                return False
+            self.pipelines = pipelines  # single reference swap, readers never see a partial set
+            self.data = data
+            self.version += 1
+        self.logger.info(f"Calibration version {self.version} loaded: {sorted(pipelines)}")
+        return True
+
+    def get(self, name):
+        return self.pipelines.get(name)
+
+    def bind(self, name):
+        """Returns a callable for a sensor's calibration parameter that follows reloads."""
+        if name not in self.pipelines:
+            raise KeyError(f"No calibration pipeline named {name!r}")
+        return BoundPipeline(self, name)
+
+    def apply(self, name, values):
+        return self.pipelines[name].apply(values)
+
+    def ph_compensation(self):
+        """Returns the pH temperature compensation for the reference temperature in the pH section."""
+        return PHTemperatureCompensation.from_section(self.data.get('pH', {}))
+
+    def start_watching(self, poll_interval=1.0, use_inotify=True):
+        if self._watcher is None:
+            self._watcher = FileWatcher([self.file_path], lambda changed: self.reload(),
+                                        poll_interval=poll_interval, use_inotify=use_inotify)
+            self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+
+# Example usage
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    calibration = CalibrationManager('calibration/calibration_data.json')
+    print(f"pH for measured 3.0: {calibration.apply('pH', 3.0)}")
+    print(f"Turbidity in mg/L for a block of voltages: {calibration.apply('turbidity_mg_l', [0.5, 1.5, 3.5])}")
+    print(f"Flow for ADC block: {calibration.apply('flow_rate', [600, 650, 700])}")
+
+"""Each section of calibration_data.json is compiled once into a CalibrationPipeline of stages.
+A 'fit' entry written by calibration_fit takes precedence, then the calibration points (at least two), then the coefficient fields.
+Pipelines convert a scalar with plain Python arithmetic and a block with a few NumPy array operations.
+tabulate() collapses a pipeline into a 65536-entry lookup table for raw 16-bit register codes.
+Sensors take a BoundPipeline from CalibrationManager.bind(), so a reload reaches them without reconstruction."""
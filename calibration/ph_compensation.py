@@ -0,0 +1,65 @@
+# ph_compensation.py
+
+"""The ph_compensation.py module corrects pH readings for the electrode temperature.
+The electrode slope follows the Nernst equation and is proportional to absolute temperature,
+so a reading taken at T is rescaled around the isopotential point (pH 7) to the reference temperature:
+pH_comp = 7 + (pH - 7) * (T_ref / T), with both temperatures in kelvin.
+Each pH sample is paired with the temperature sample from the same register block, and whole arrays
+of samples are corrected in one NumPy pass."""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # scalar compensation and the list fallback do not need NumPy
+    np = None
+
+KELVIN_OFFSET = 273.15
+ISOPOTENTIAL_PH = 7.0
+
+
+def compensate_ph(ph, temperature, reference_temperature=25.0, isopotential_ph=ISOPOTENTIAL_PH):
+    """Compensates one pH value measured at temperature (degrees C) to reference_temperature."""
+    if ph is None or temperature is None:
+        return None
+    temperature_k = temperature + KELVIN_OFFSET
+    if temperature_k <= 0:
+        return math.nan
+    return isopotential_ph + (ph - isopotential_ph) * ((reference_temperature + KELVIN_OFFSET) / temperature_k)
+
+
+class PHTemperatureCompensation:
+    """Nernst-slope compensation relative to the calibration reference temperature."""
+
+    def __init__(self, reference_temperature=25.0, isopotential_ph=ISOPOTENTIAL_PH):
+        self.reference_temperature = float(reference_temperature)
+        self.isopotential_ph = float(isopotential_ph)
+        self._reference_k = self.reference_temperature + KELVIN_OFFSET
+
+    @classmethod
+    def from_section(cls, section):
+        """Builds the compensation from the pH section of calibration_data.json."""
+        return cls(section.get('reference_temperature', 25.0))
+
+    def __call__(self, ph, temperature):
+        return compensate_ph(ph, temperature, self.reference_temperature, self.isopotential_ph)
+
+    def apply(self, ph_values, temperatures):
+        """Compensates paired arrays of pH and temperature samples."""
+        if np is None:
+            return [self(ph, temperature) for ph, temperature in zip(ph_values, temperatures)]
+        ph = np.asarray(ph_values, dtype=float)
+        temperature_k = np.asarray(temperatures, dtype=float) + KELVIN_OFFSET
+        if ph.shape != temperature_k.shape:
+            raise ValueError(f"pH and temperature blocks differ in shape: {ph.shape} vs {temperature_k.shape}")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            compensated = self.isopotential_ph + (ph - self.isopotential_ph) * (self._reference_k / temperature_k)
+        compensated[temperature_k <= 0] = np.nan
+        return compensated
+
+
+# Example usage
+if __name__ == '__main__':
+    compensation = PHTemperatureCompensation(reference_temperature=25)
+    print(f"pH 9.0 at 40 C compensated to 25 C: {compensation(9.0, 40.0):.3f}")
+    print(f"Block: {compensation.apply([4.0, 7.0, 10.0], [10.0, 25.0, 35.0])}")
@@ -0,0 +1,234 @@
+"""The compiled_config.py module compiles the configuration layers (built-in defaults, config file,
+environment variables and ThingsBoard attributes) into one validated, immutable object tree.
+Layers are deep-merged in that order, type-coerced and validated once at startup, so bad config
+fails fast with every problem listed. The result is a set of frozen, slotted dataclasses plus a flat
+precomputed index for dotted keys, so hot paths pay an attribute access instead of nested dict lookups."""
+
+# compiled_config.py
+import dataclasses
+import logging
+import os
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+
+class ConfigError(ValueError):
+    """Raised when the merged configuration fails validation."""
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("Invalid configuration:\n  " + "\n  ".join(problems))
+
+
+@dataclass(frozen=True, slots=True)
+class SystemSettings:
+    name: str = "Water Treatment Monitoring IoT System"
+    version: str = "1.0.0"
+
+
+@dataclass(frozen=True, slots=True)
+class ThingsBoardSettings:
+    host: str = 'demo.thingsboard.io'
+    port: int = 1883
+    token: str = 'YourDefaultAccessToken'
+
+
+@dataclass(frozen=True, slots=True)
+class SensorIntervals:
+    radar: int = 5
+    turbidity: int = 10
+    ph: int = 5
+
+
+@dataclass(frozen=True, slots=True)
+class DatabaseSettings:
+    host: str = 'localhost'
+    port: int = 5432
+    name: str = 'iot_system_db'
+    user: str = 'iot_user'
+    password: str = 'securepassword'
+
+
+@dataclass(frozen=True, slots=True)
+class LoggingSettings:
+    level: str = 'INFO'
+    file: str = 'system.log'
+
+
+@dataclass(frozen=True, slots=True)
+class AppConfig:
+    system: SystemSettings = SystemSettings()
+    thingsboard: ThingsBoardSettings = ThingsBoardSettings()
+    sensor_intervals: SensorIntervals = SensorIntervals()
+    database: DatabaseSettings = DatabaseSettings()
+    logging: LoggingSettings = LoggingSettings()
+    index: MappingProxyType = field(default_factory=lambda: MappingProxyType({}), init=False, repr=False, compare=False)
+
+    def get(self, key, default=None):
+        """O(1) lookup of a dotted key such as 'thingsboard.port' or a section such as 'database'."""
+        return self.index.get(key, default)
+
+
+# Environment variables understood by DefaultConfig, mapped onto dotted schema keys.
+# The same upper-case names are accepted as top-level keys in a config file.
+ENV_KEYS = {
+    'SYSTEM_NAME': 'system.name',
+    'SYSTEM_VERSION': 'system.version',
+    'THINGSBOARD_HOST': 'thingsboard.host',
+    'THINGSBOARD_PORT': 'thingsboard.port',
+    'THINGSBOARD_TOKEN': 'thingsboard.token',
+    'RADAR_INTERVAL': 'sensor_intervals.radar',
+    'TURBIDITY_INTERVAL': 'sensor_intervals.turbidity',
+    'PH_INTERVAL': 'sensor_intervals.ph',
+    'DATABASE_HOST': 'database.host',
+    'DATABASE_PORT': 'database.port',
+    'DATABASE_NAME': 'database.name',
+    'DATABASE_USER': 'database.user',
+    'DATABASE_PASSWORD': 'database.password',
+    'LOGGING_LEVEL': 'logging.level',
+    'LOG_FILE': 'logging.file',
+}
+
+LOGGING_LEVELS = {'CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET'}
+
+
+def _positive(value):
+    return None if value > 0 else "must be greater than 0"
+
+
+def _port(value):
+    return None if 0 < value < 65536 else "must be between 1 and 65535"
+
+
+def _logging_level(value):
+    return None if value.upper() in LOGGING_LEVELS else f"must be one of {sorted(LOGGING_LEVELS)}"
+
+
+VALIDATORS = {
+    'thingsboard.port': _port,
+    'database.port': _port,
+    'sensor_intervals.radar': _positive,
+    'sensor_intervals.turbidity': _positive,
+    'sensor_intervals.ph': _positive,
+    'logging.level': _logging_level,
+}
+
+
+def deep_merge(base, override):
+    """Returns base updated recursively with override; nested dicts are merged, not replaced."""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def expand_keys(layer):
+    """Turns dotted keys ('thingsboard.port') and DefaultConfig-style names into nested dicts."""
+    nested = {}
+    for key, value in layer.items():
+        path = ENV_KEYS.get(key, key)
+        if isinstance(value, dict):
+            value = expand_keys(value)
+        node = nested
+        parts = path.split('.')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        if isinstance(value, dict) and isinstance(node.get(parts[-1]), dict):
+            node[parts[-1]] = deep_merge(node[parts[-1]], value)
+        else:
+            node[parts[-1]] = value
+    return nested
+
+
+def env_layer(environ):
+    """Builds a config layer from environment variables."""
+    return expand_keys({name: environ[name] for name in ENV_KEYS if name in environ})
+
+
+def _coerce(value, target_type):
+    if isinstance(value, target_type) and not (target_type is int and isinstance(value, bool)):
+        return value
+    if target_type is bool:
+        if isinstance(value, str) and value.strip().lower() in ('1', 'true', 'yes', 'on'):
+            return True
+        if isinstance(value, str) and value.strip().lower() in ('0', 'false', 'no', 'off'):
+            return False
+        raise ValueError(f"cannot interpret {value!r} as a boolean")
+    if target_type is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"expected an integer, got {value!r}")
+    return target_type(value)
+
+
+def _build_section(cls, raw, prefix, problems):
+    if not isinstance(raw, dict):
+        problems.append(f"{prefix}: expected a mapping, got {type(raw).__name__}")
+        return cls()
+    names = {f.name for f in dataclasses.fields(cls)}
+    for unknown in sorted(set(raw) - names):
+        problems.append(f"{prefix}.{unknown}: unknown setting")
+    values = {}
+    for f in dataclasses.fields(cls):
+        if f.name not in raw:
+            continue
+        key = f"{prefix}.{f.name}"
+        try:
+            value = _coerce(raw[f.name], f.type)
+        except (TypeError, ValueError) as e:
+            problems.append(f"{key}: {e}")
+            continue
+        validator = VALIDATORS.get(key)
+        message = validator(value) if validator else None
+        if message:
+            problems.append(f"{key}: {message}")
+            continue
+        values[f.name] = value
+    return cls(**values)
+
+
+def _build_index(config):
+    index = {}
+    for section in dataclasses.fields(config):
+        if section.name == 'index':
+            continue
+        settings = getattr(config, section.name)
+        index[section.name] = settings
+        for f in dataclasses.fields(settings):
+            index[f"{section.name}.{f.name}"] = getattr(settings, f.name)
+    return MappingProxyType(index)
+
+
+def compile_config(file_config=None, environ=None, attributes=None):
+    """Deep-merges file < environment < ThingsBoard attributes over the dataclass defaults, validates
+    and freezes. The dataclass defaults above are the only copy of the built-in defaults.
+
+    Raises ConfigError listing every problem if the merged configuration is invalid.
+    """
+    environ = os.environ if environ is None else environ
+    layers = [expand_keys(file_config or {}), env_layer(environ), expand_keys(attributes or {})]
+    merged = {}
+    for layer in layers:
+        merged = deep_merge(merged, layer)
+
+    problems = []
+    sections = {f.name: f.type for f in dataclasses.fields(AppConfig) if f.name != 'index'}
+    for unknown in sorted(set(merged) - set(sections)):
+        problems.append(f"{unknown}: unknown section")
+    built = {name: _build_section(cls, merged.get(name, {}), name, problems) for name, cls in sections.items()}
+    if problems:
+        raise ConfigError(problems)
+
+    config = AppConfig(**built)
+    object.__setattr__(config, 'index', _build_index(config))
+    logging.getLogger('CompiledConfig').info("Configuration compiled and validated.")
+    return config
+
+
+# Example usage
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config = compile_config({'sensor_intervals': {'radar': 2}}, attributes={'logging.level': 'DEBUG'})
+    print(f"ThingsBoard: {config.thingsboard.host}:{config.thingsboard.port}")
+    print(f"Radar interval: {config.get('sensor_intervals.radar')} s, logging level {config.logging.level}")
@@ -9,33 +9,38 @@ import json
 import logging
 import sys
 
+from config.compiled_config import AppConfig
+
+# The built-in defaults live once, in the compiled configuration's dataclasses
+_DEFAULTS = AppConfig()
+
 class DefaultConfig:
     # System-wide default configurations
-    SYSTEM_NAME = os.getenv('SYSTEM_NAME', "Water Treatment Monitoring IoT System")
-    SYSTEM_VERSION = os.getenv('SYSTEM_VERSION', "1.0.0")
+    SYSTEM_NAME = os.getenv('SYSTEM_NAME', _DEFAULTS.system.name)
+    SYSTEM_VERSION = os.getenv('SYSTEM_VERSION', _DEFAULTS.system.version)
 
     # ThingsBoard platform configurations
-    THINGSBOARD_HOST = os.getenv('THINGSBOARD_HOST', 'demo.thingsboard.io')
-    THINGSBOARD_PORT = int(os.getenv('THINGSBOARD_PORT', 1883))
-    THINGSBOARD_TOKEN = os.getenv('THINGSBOARD_TOKEN', 'YourDefaultAccessToken')
+    THINGSBOARD_HOST = os.getenv('THINGSBOARD_HOST', _DEFAULTS.thingsboard.host)
+    THINGSBOARD_PORT = int(os.getenv('THINGSBOARD_PORT', _DEFAULTS.thingsboard.port))
+    THINGSBOARD_TOKEN = os.getenv('THINGSBOARD_TOKEN', _DEFAULTS.thingsboard.token)
 
     # Sensor reading intervals in seconds
     SENSOR_READING_INTERVALS = {
-        'radar': int(os.getenv('RADAR_INTERVAL', 5)),
-        'turbidity': int(os.getenv('TURBIDITY_INTERVAL', 10)),
-        'ph': int(os.getenv('PH_INTERVAL', 5))
+        'radar': int(os.getenv('RADAR_INTERVAL', _DEFAULTS.sensor_intervals.radar)),
+        'turbidity': int(os.getenv('TURBIDITY_INTERVAL', _DEFAULTS.sensor_intervals.turbidity)),
+        'ph': int(os.getenv('PH_INTERVAL', _DEFAULTS.sensor_intervals.ph))
     }
 
     # Database configurations
-    DATABASE_HOST = os.getenv('DATABASE_HOST', 'localhost')
-    DATABASE_PORT = int(os.getenv('DATABASE_PORT', 5432))
-    DATABASE_NAME = os.getenv('DATABASE_NAME', 'iot_system_db')
-    DATABASE_USER = os.getenv('DATABASE_USER', 'iot_user')
-    DATABASE_PASSWORD = os.getenv('DATABASE_PASSWORD', 'securepassword')
+    DATABASE_HOST = os.getenv('DATABASE_HOST', _DEFAULTS.database.host)
+    DATABASE_PORT = int(os.getenv('DATABASE_PORT', _DEFAULTS.database.port))
+    DATABASE_NAME = os.getenv('DATABASE_NAME', _DEFAULTS.database.name)
+    DATABASE_USER = os.getenv('DATABASE_USER', _DEFAULTS.database.user)
+    DATABASE_PASSWORD = os.getenv('DATABASE_PASSWORD', _DEFAULTS.database.password)
 
     # Logging configurations
-    LOGGING_LEVEL = os.getenv('LOGGING_LEVEL', 'INFO')
-    LOG_FILE = os.getenv('LOG_FILE', 'system.log')
+    LOGGING_LEVEL = os.getenv('LOGGING_LEVEL', _DEFAULTS.logging.level)
+    LOG_FILE = os.getenv('LOG_FILE', _DEFAULTS.logging.file)
 
     @staticmethod
     def load_from_env():
@@ -2,47 +2,81 @@
 connection retries, and sensor calibration, would look something like this:"""
 
 # ph_sensor.py
-from device_manager.modbus_lib import ModbusClient
-from device_interface import DeviceInterface
+from device_manager.modbus_lib import ModbusDevice
+from device_manager.device_interface import DeviceInterface
+from calibration.calibration_pipeline import CalibrationManager
 import logging
 import time
 
 class PHSensor(DeviceInterface):
     PH_VALUE_REGISTER = 0x0001  # Example register address for pH value
     PH_TEMPERATURE_REGISTER = 0x0003  # Example register address for sensor temperature
+    BLOCK_COUNT = PH_TEMPERATURE_REGISTER - PH_VALUE_REGISTER + 1  # pH .. temperature in one transaction
     RETRY_ATTEMPTS = 5
     RETRY_INTERVAL = 2  # seconds
 
-    def __init__(self, port, slave_id, baudrate=9600):
+    def __init__(self, port, slave_id, baudrate=9600, calibration=None, compensation=None):
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.modbus_client = ModbusClient(port, slave_id, baudrate)
+        self.modbus_device = ModbusDevice(port, slave_id, baudrate)
+        self.calibration = calibration  # e.g. CalibrationManager.bind('pH')
+        self.compensation = compensation  # e.g. CalibrationManager.ph_compensation()
 
-    def read_ph_value(self):
-        """Reads the pH value from the sensor with retries."""
+    def _read_registers(self, address, count, description):
+        """Reads a register range with retries. Returns the register list or None."""
         for attempt in range(self.RETRY_ATTEMPTS):
             try:
-                ph_value = self.modbus_client.read_register(self.PH_VALUE_REGISTER)
-                return self.convert_ph_value(ph_value)
+                registers = self.modbus_device.read_registers(address, count)
+                if registers and len(registers) >= count:
+                    return registers
+                self.logger.error(f"Short or failed read of {description}, attempt {attempt + 1}")
             except Exception as e:
-                self.logger.error(f"Error reading pH value, attempt {attempt + 1}: {e}")
-                time.sleep(self.RETRY_INTERVAL)
+                self.logger.error(f"Error reading {description}, attempt {attempt + 1}: {e}")
+            time.sleep(self.RETRY_INTERVAL)
         return None
 
+    def read_ph_value(self):
+        """Reads the pH value from the sensor with retries."""
+        registers = self._read_registers(self.PH_VALUE_REGISTER, 1, 'pH value')
+        return self.convert_ph_value(registers[0]) if registers else None
+
     def read_temperature(self):
         """Reads the temperature from the sensor with retries."""
-        for attempt in range(self.RETRY_ATTEMPTS):
-            try:
-                temperature = self.modbus_client.read_register(self.PH_TEMPERATURE_REGISTER)
-                return self.convert_temperature(temperature)
-            except Exception as e:
-                self.logger.error(f"Error reading sensor temperature, attempt {attempt + 1}: {e}")
-                time.sleep(self.RETRY_INTERVAL)
-        return None
+        registers = self._read_registers(self.PH_TEMPERATURE_REGISTER, 1, 'sensor temperature')
+        return self.convert_temperature(registers[0]) if registers else None
+
+    def read_block(self):
+        """Reads pH and temperature in one Modbus transaction, so both samples belong together.
+        Returns {'pH', 'pH_raw', 'temperature'} or None; 'pH' is temperature compensated when
+        a compensation is configured, 'pH_raw' is the calibrated but uncompensated value."""
+        registers = self._read_registers(self.PH_VALUE_REGISTER, self.BLOCK_COUNT, 'pH block')
+        if registers is None:
+            return None
+        ph_raw = self.convert_ph_value(registers[0])
+        temperature = self.convert_temperature(registers[self.PH_TEMPERATURE_REGISTER - self.PH_VALUE_REGISTER])
+        ph = self.compensation(ph_raw, temperature) if self.compensation is not None else ph_raw
+        return {'pH': ph, 'pH_raw': ph_raw, 'temperature': temperature}
+
+    def read_data(self):
+        """Returns the telemetry for one block read, publishing both raw and compensated pH."""
+        return self.read_block()
+
+    def compensate_samples(self, ph_values, temperatures):
+        """Compensates paired buffers of pH and temperature samples in one vectorized pass."""
+        if self.compensation is None:
+            return ph_values
+        return self.compensation.apply(ph_values, temperatures)
 
     def convert_ph_value(self, raw_value):
         """Converts raw pH register value to actual pH value."""
-        # Conversion logic goes here based on sensor specifications
-        return raw_value
+        if self.calibration is None:
+            return raw_value
+        return self.calibration(raw_value)
+
+    def convert_ph_values(self, raw_values):
+        """Converts a block of raw pH register values in one vectorized pass."""
+        if self.calibration is None:
+            return raw_values
+        return self.calibration.apply(raw_values)
 
     def convert_temperature(self, raw_value):
         """Converts raw temperature register value to actual temperature."""
@@ -56,7 +90,7 @@ class PHSensor(DeviceInterface):
 
     def close(self):
         """Closes the Modbus connection to the sensor."""
-        self.modbus_client.close()
+        self.modbus_device.close()
 
 # Example usage
 if __name__ == '__main__':
@@ -64,7 +98,9 @@ if __name__ == '__main__':
     PORT = '/dev/ttyUSB0'  # Serial port for pH sensor
     SLAVE_ID = 1           # Modbus slave ID for the pH sensor
 
-    ph_sensor = PHSensor(PORT, SLAVE_ID)
+    calibration = CalibrationManager('calibration/calibration_data.json')
+    ph_sensor = PHSensor(PORT, SLAVE_ID, calibration=calibration.bind('pH'),
+                         compensation=calibration.ph_compensation())
 
     ph_value = ph_sensor.read_ph_value()
     if ph_value is not None:
@@ -78,18 +114,25 @@ if __name__ == '__main__':
     else:
         logging.error("Failed to read sensor temperature after multiple attempts.")
 
+    # pH, raw pH and temperature from a single transaction
+    telemetry = ph_sensor.read_block()
+    if telemetry is not None:
+        logging.info(f"pH telemetry: {telemetry}")
+
     # Example calibration process
     ph_sensor.calibrate('two_point', {'low': 4.0, 'high': 7.0})
 
     ph_sensor.close()
 
 
-"""This example includes a ModbusClient class, which is a hypothetical class that handles the lower-level details of Modbus communication.
-The PHSensor class uses this client to perform read operations with retries. 
+"""This example uses the ModbusDevice class from modbus_lib, which handles the lower-level details of Modbus communication.
+The PHSensor class uses this device to perform read operations with retries. 
 It also includes a calibrate method placeholder for implementing sensor calibration.
 The logging module provides a way to log information and errors, which is helpful for debugging and monitoring the sensor's operation.
 
-The conversion functions (convert_ph_value and convert_temperature) are placeholders 
-where you would add the actual conversion logic based on your sensor's specifications. 
+convert_ph_value applies the optional calibration pipeline compiled from calibration_data.json,
+and convert_ph_values does the same for a whole block; convert_temperature is still a placeholder.
+read_block reads the pH and temperature registers in one transaction and applies the Nernst temperature
+compensation, returning both the compensated and the raw pH; compensate_samples does this for whole buffers. 
 The calibration function (calibrate) is also a placeholder that would need to be implemented according to 
 how the sensor expects to receive calibration commands and data."""
@@ -1,13 +1,14 @@
 # radar_sensor.py
 from device_manager.modbus_lib import ModbusDevice
-from device_interface import DeviceInterface
+from device_manager.device_interface import DeviceInterface
 
 class RadarSensor(DeviceInterface):
     # Assuming we have registers defined for radar sensor
     RADAR_DISTANCE_REGISTER = 100  # Example register address for radar distance
 
-    def __init__(self, port, slave_id, baudrate=9600):
+    def __init__(self, port, slave_id, baudrate=9600, calibration=None):
         self.modbus_device = ModbusDevice(port, slave_id, baudrate)
+        self.calibration = calibration  # optional CalibrationPipeline or CalibrationManager.bind(...)
     
     def read_distance(self):
         """Reads the distance measured by the radar sensor."""
@@ -15,14 +16,20 @@ class RadarSensor(DeviceInterface):
             # Read a single register that holds the distance value
             distance_register_values = self.modbus_device.read_registers(self.RADAR_DISTANCE_REGISTER, 1)
             if distance_register_values:
-                # Assuming the distance is in the first register and no conversion is needed
-                return distance_register_values[0]
+                # Assuming the distance is in the first register
+                return self.convert(distance_register_values[0])
             else:
                 return None
         except Exception as e:
             print(f"Error reading radar sensor distance: {e}")
             return None
 
+    def convert(self, raw_values):
+        """Applies the calibration to one raw value or a block of raw values."""
+        if self.calibration is None:
+            return raw_values
+        return self.calibration.apply(raw_values)
+
     def close(self):
         """Closes the connection to the sensor."""
         self.modbus_device.close()
@@ -1,13 +1,14 @@
 # turbidity_sensor.py
 from device_manager.modbus_lib import ModbusDevice
-from device_interface import DeviceInterface
+from device_manager.device_interface import DeviceInterface
 
 class TurbiditySensor(DeviceInterface):
     # Assuming we have a register defined for turbidity value
     TURBIDITY_REGISTER = 101  # Example register address for turbidity
 
-    def __init__(self, port, slave_id, baudrate=9600):
+    def __init__(self, port, slave_id, baudrate=9600, calibration=None):
         self.modbus_device = ModbusDevice(port, slave_id, baudrate)
+        self.calibration = calibration  # optional CalibrationPipeline or CalibrationManager.bind(...)
 
     def read_turbidity(self):
         """Reads the turbidity value from the sensor."""
@@ -15,14 +16,20 @@ class TurbiditySensor(DeviceInterface):
             # Read a single register that holds the turbidity value
             turbidity_register_values = self.modbus_device.read_registers(self.TURBIDITY_REGISTER, 1)
             if turbidity_register_values:
-                # Assuming the turbidity is in the first register and no conversion is needed
-                return turbidity_register_values[0]
+                # Assuming the turbidity is in the first register
+                return self.convert(turbidity_register_values[0])
             else:
                 return None
         except Exception as e:
             print(f"Error reading turbidity sensor value: {e}")
             return None
 
+    def convert(self, raw_values):
+        """Applies the calibration to one raw value or a block of raw values."""
+        if self.calibration is None:
+            return raw_values
+        return self.calibration.apply(raw_values)
+
     def close(self):
         """Closes the connection to the sensor."""
         self.modbus_device.close()
@@ -0,0 +1,159 @@
+"""The gps_decimator.py module decides which GPS fixes are worth publishing.
+Live fixes pass through GPSDecimator, which publishes only when the position moved more than
+min_distance (haversine), the heading or speed changed significantly, or max_interval elapsed since the
+last published fix, so a parked station sends a heartbeat instead of the same position every loop.
+Batched uploads of recorded tracks go through simplify_fixes, a Douglas-Peucker simplification in local
+metres that keeps every fix needed to stay within a distance tolerance of the original track."""
+
+# gps_decimator.py
+import logging
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres between two (or arrays of) positions in degrees."""
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def heading_difference(a, b):
+    """Smallest absolute angle in degrees between two headings."""
+    return abs((a - b + 180.0) % 360.0 - 180.0)
+
+
+class GPSDecimator:
+    def __init__(self, min_distance=25.0, heading_change=20.0, speed_change=2.0, max_interval=300.0,
+                 min_interval=0.0, moving_speed=1.0):
+        """min_distance in metres, heading_change in degrees, speed_change in m/s, intervals in seconds.
+        Heading changes only count above moving_speed m/s, where the GPS track is meaningful."""
+        self.min_distance = min_distance
+        self.heading_change = heading_change
+        self.speed_change = speed_change
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.moving_speed = moving_speed
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.last = None
+        self.accepted = 0
+        self.dropped = 0
+
+    def reason(self, fix):
+        """Why fix should be published ('first', 'distance', 'heading', 'speed', 'interval'), or None."""
+        last = self.last
+        if last is None:
+            return 'first'
+        if 'monotonic' in fix and 'monotonic' in last:
+            elapsed = fix['monotonic'] - last['monotonic']  # live fixes: immune to wall-clock steps
+        else:
+            elapsed = fix['timestamp'] - last['timestamp']
+        if elapsed <= 0 or elapsed < self.min_interval:
+            return None
+        if haversine(last['latitude'], last['longitude'], fix['latitude'], fix['longitude']) >= self.min_distance:
+            return 'distance'
+        speed, last_speed = fix.get('speed'), last.get('speed')
+        if speed is not None and last_speed is not None:
+            if abs(speed - last_speed) >= self.speed_change:
+                return 'speed'
+            track, last_track = fix.get('track'), last.get('track')
+            if (track is not None and last_track is not None and min(speed, last_speed) >= self.moving_speed
+                    and heading_difference(track, last_track) >= self.heading_change):
+                return 'heading'
+        if elapsed >= self.max_interval:
+            return 'interval'
+        return None
+
+    def filter(self, fix):
+        """Returns fix if it should be published (and remembers it), else None."""
+        if fix is None:
+            return None
+        if self.reason(fix) is None:
+            self.dropped += 1
+            return None
+        self.last = fix
+        self.accepted += 1
+        return fix
+
+    def reduction(self):
+        """Fraction of offered fixes that were not published."""
+        total = self.accepted + self.dropped
+        return self.dropped / total if total else 0.0
+
+
+def local_metres(latitudes, longitudes):
+    """Equirectangular projection around the mean latitude; accurate to well under 1% over tens of km."""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    scale = math.radians(1) * EARTH_RADIUS_M
+    x = (longitudes - longitudes[0]) * scale * math.cos(math.radians(float(latitudes.mean())))
+    y = (latitudes - latitudes[0]) * scale
+    return x, y
+
+
+def douglas_peucker(x, y, tolerance):
+    """Boolean mask of the points kept by Douglas-Peucker for a polyline (iterative, vectorised per segment)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(x)
+    keep = np.zeros(count, dtype=bool)
+    if count == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(px * dy - py * dx) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+
+def simplify_fixes(fixes, tolerance=10.0, max_interval=None):
+    """Simplifies a time-ordered list of fixes to within tolerance metres of the original track.
+    With max_interval, extra fixes are kept so kept fixes are never further apart in time."""
+    if len(fixes) < 3:
+        return list(fixes)
+    x, y = local_metres([fix['latitude'] for fix in fixes], [fix['longitude'] for fix in fixes])
+    keep = douglas_peucker(x, y, tolerance)
+    if max_interval is not None:
+        last_kept = 0
+        for index in range(1, len(fixes)):
+            if fixes[index]['timestamp'] - fixes[last_kept]['timestamp'] > max_interval and index - 1 > last_kept:
+                keep[index - 1] = True
+                last_kept = index - 1
+            if keep[index]:
+                last_kept = index
+    return [fix for fix, kept in zip(fixes, keep) if kept]
+
+
+# Example usage
+if __name__ == '__main__':
+    import random
+    logging.basicConfig(level=logging.INFO)
+    decimator = GPSDecimator()
+    track = []
+    for second in range(3600):
+        moving = 1200 <= second < 2400
+        fix = {'latitude': 52.0 + min(max(second - 1200, 0), 1200) * 5e-5 + random.gauss(0, 1e-5),
+               'longitude': 5.0 + random.gauss(0, 1e-5), 'speed': 5.5 if moving else 0.1,
+               'track': 0.0 if moving else random.uniform(0, 360), 'timestamp': 1_700_000_000 + second}
+        track.append(fix)
+        decimator.filter(fix)
+    logging.info(f"Live: published {decimator.accepted} of 3600 fixes ({decimator.reduction():.1%} fewer)")
+    logging.info(f"Batch: {len(simplify_fixes(track, tolerance=10.0, max_interval=600))} of 3600 fixes kept")
@@ -1,57 +1,176 @@
-
-"""A comprehensive gps_handler.py module may include functions for 
+"""A comprehensive gps_handler.py module may include functions for
 initializing the GPS device, reading data, error handling, and potentially logging or storing the GPS data."""
 
 # gps_handler.py
+import json
 import logging
-from gps import *
-from time import sleep
+import socket
+import threading
+import time
+
+GPSD_HOST = '127.0.0.1'
+GPSD_PORT = 2947
+WATCH_COMMAND = b'?WATCH={"enable":true,"json":true};\n'
+MODE_NO_FIX, MODE_2D, MODE_3D = 1, 2, 3
+# Fix fields published as telemetry; mode, eph, gps_time and the local timestamps are bookkeeping
+TELEMETRY_KEYS = ('latitude', 'longitude', 'altitude', 'speed', 'track')
+
 
 class GPSHandler:
-    def __init__(self):
-        self.gpsd = gps(mode=WATCH_ENABLE)
+    def __init__(self, host=GPSD_HOST, port=GPSD_PORT, connect_timeout=2.0, read_timeout=5.0,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0, stale_after=10.0, decimator=None, autostart=True):
+        """Reads gpsd's JSON reports on a background thread; fetch_data() never blocks on gpsd.
+        read_timeout: seconds without any report before the connection is considered dead.
+        decimator: optional GPSDecimator applied by fetch_telemetry()."""
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.stale_after = stale_after
+        self.decimator = decimator
         self.logger = logging.getLogger(self.__class__.__name__)
         self.running = True
 
-    def fetch_data(self):
-        """Retrieve the latest GPS data."""
+        # Replaced as a whole (never mutated), so readers always see a consistent fix
+        self.latest_fix = None
+        self.fix_mode = 0
+        self.connected = False
+        self.connects = 0
+        self.reports_parsed = 0
+        self.malformed_reports = 0
+        self._sock = None
+        self._stop = threading.Event()
+        self._thread = None
+        if autostart:
+            self.start()
+
+    def start(self):
+        """Starts the background gpsd reader."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._reader_loop, name='GPSReader', daemon=True)
+            self._thread.start()
+
+    def _reader_loop(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            except OSError as e:
+                self.logger.warning(f"Cannot connect to gpsd at {self.host}:{self.port}: {e}")
+            else:
+                delay = self.reconnect_delay
+                self._read_reports(sock)
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _read_reports(self, sock):
+        self._sock = sock
+        self.connected = True
+        self.connects += 1
+        buffer = b''
+        try:
+            sock.settimeout(self.read_timeout)
+            sock.sendall(WATCH_COMMAND)
+            while not self._stop.is_set():
+                chunk = sock.recv(65536)
+                if not chunk:
+                    self.logger.warning("gpsd closed the connection.")
+                    break
+                lines = (buffer + chunk).split(b'\n')
+                buffer = lines.pop()
+                for line in lines:
+                    if line:
+                        self.handle_line(line)
+        except socket.timeout:
+            self.logger.warning(f"No report from gpsd for {self.read_timeout} s, reconnecting.")
+        except OSError as e:
+            if not self._stop.is_set():
+                self.logger.warning(f"gpsd connection failed: {e}")
+        finally:
+            self.connected = False
+            self._sock = None
+            sock.close()
+
+    def handle_line(self, line):
+        """Parses one gpsd JSON report. Returns the new fix for TPV reports with a fix, else None."""
         try:
-            report = self.gpsd.next()
-            if report['class'] == 'TPV':
-                latitude = getattr(report, 'lat', 0.0)
-                longitude = getattr(report, 'lon', 0.0)
-                altitude = getattr(report, 'alt', 'Not Available')
-                speed = getattr(report, 'speed', 'Not Available')
-                return {
-                    'latitude': latitude,
-                    'longitude': longitude,
-                    'altitude': altitude,
-                    'speed': speed
-                }
-        except KeyError as e:
-            self.logger.error(f"Key error: {e}")
+            report = json.loads(line)
+        except ValueError:
+            self.malformed_reports += 1
             return None
-        except StopIteration:
-            self.gpsd = None
-            self.logger.error("GPSD has terminated")
+        self.reports_parsed += 1
+        if not isinstance(report, dict) or report.get('class') != 'TPV':
             return None
-        except Exception as e:
-            self.logger.error(f"Unhandled exception: {e}")
+        mode = report.get('mode', 0)
+        self.fix_mode = mode
+        if mode < MODE_2D:
+            self.latest_fix = None  # fix lost: the last position is no longer current
             return None
+        if 'lat' not in report or 'lon' not in report:
+            return None
+        fix = {
+            'latitude': report['lat'],
+            'longitude': report['lon'],
+            'altitude': report.get('altMSL', report.get('alt')) if mode == MODE_3D else None,
+            'speed': report.get('speed'),
+            'track': report.get('track'),
+            'mode': mode,
+            'eph': report.get('eph'),
+            'gps_time': report.get('time'),
+            'timestamp': time.time(),  # reported only; wall time can step (NTP, gpsd setting the clock)
+            'monotonic': time.monotonic(),  # receive time used for staleness
+        }
+        self.latest_fix = fix
+        return fix
+
+    def fetch_data(self, max_age=None):
+        """Returns the latest fix without blocking, or None if there is none younger than max_age
+        (default stale_after) seconds."""
+        fix = self.latest_fix
+        max_age = self.stale_after if max_age is None else max_age
+        if fix is None or (max_age and time.monotonic() - fix['monotonic'] > max_age):
+            return None
+        return fix
 
-    def start_tracking(self):
-        """Start tracking GPS data in a loop."""
+    def fetch_telemetry(self):
+        """Returns the TELEMETRY_KEYS of the latest fix when it should be published (see GPSDecimator), else None."""
+        fix = self.fetch_data()
+        if self.decimator is not None:
+            fix = self.decimator.filter(fix)
+        if fix is None:
+            return None
+        return {key: fix[key] for key in TELEMETRY_KEYS}
+
+    def start_tracking(self, interval=5):
+        """Logs the latest fix every interval seconds until stop_tracking() is called."""
         while self.running:
             data = self.fetch_data()
             if data:
                 self.logger.info(f"GPS Data: {data}")
-                # Here you could also store the data to a database or a file
-            sleep(5)  # Wait for a while before reading next data
+            time.sleep(interval)
 
     def stop_tracking(self):
         """Stop the GPS data fetching loop."""
         self.running = False
 
+    def cleanup(self):
+        """Stops the reader thread and closes the gpsd connection."""
+        self.running = False
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=self.connect_timeout + 1)
+            self._thread = None
+
 # Example usage
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
@@ -59,13 +178,17 @@ if __name__ == '__main__':
     try:
         gps_handler.start_tracking()
     except (KeyboardInterrupt, SystemExit):
-        gps_handler.stop_tracking()
+        gps_handler.cleanup()
         logging.info("GPS tracking stopped.")
 
-""" the GPSHandler class is responsible for interacting with the GPS device using the gps module. 
-It contains methods to fetch and process GPS data and to start and stop data tracking in a loop. 
-Error handling is included to manage potential issues during GPS data retrieval.
-The fetch_data method retrieves the current data and captures it in a dictionary. 
-If there is an error, such as a key error or an iteration stoppage, it logs the error and returns None.
-The start_tracking method runs a loop that continuously fetches and logs GPS data at regular intervals (every 5 seconds in this case).
-The stop_tracking method allows for a graceful shutdown of the tracking loop."""
+""" the GPSHandler class connects to gpsd (localhost:2947) and speaks its JSON protocol directly.
+A daemon thread reads reports as they arrive and swaps in a new fix dict for every TPV report with a 2D/3D fix;
+a TPV without a fix clears it, so a lost fix is never reported as the current position.
+fetch_data only reads that reference, so the acquisition loop never waits for gpsd; a fix received more
+than stale_after seconds ago (measured on the monotonic clock, so wall-clock steps do not matter) is
+reported as None. A silent or closed gpsd connection times out after read_timeout
+seconds and is re-established with exponential backoff, so a dead gpsd never hangs acquisition.
+fetch_telemetry applies an optional GPSDecimator, so only moved, turned or overdue fixes are published,
+and returns just the TELEMETRY_KEYS (position, altitude, speed and track).
+The start_tracking method logs the latest fix at regular intervals (every 5 seconds by default).
+The cleanup method stops the reader thread and closes the connection."""
@@ -0,0 +1,349 @@
+"""The gpsd_stub.py module is a localhost stand-in for gpsd, so GPSHandler can be tested and measured without
+a receiver. It speaks the subset of gpsd's JSON protocol GPSHandler uses (VERSION on connect, ?WATCH to
+start the stream) and replays a recorded log to each client: gpsd JSON logs as recorded with gpspipe -w,
+or raw NMEA logs, whose RMC/GGA sentences are turned into TPV reports. Replay follows the log's own
+timestamps at 1-1000x speed (or as fast as possible), and can inject fix loss windows, bursts of
+back-to-back reports, malformed lines and dropped connections. The benchmark command measures
+GPSHandler's parse throughput and the latency from a report leaving the stub to it being the latest fix.
+
+Usage:
+    python -m handlers.gpsd_stub serve --log drive.nmea --speed 10 [--port 2947]
+    python -m handlers.gpsd_stub benchmark [--reports 100000] [--rate 10]
+"""
+
+# gpsd_stub.py
+import argparse
+import json
+import logging
+import random
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime, timezone
+
+from handlers.gps_handler import GPSHandler
+
+VERSION_REPORT = {'class': 'VERSION', 'release': '3.25', 'rev': 'stub', 'proto_major': 3, 'proto_minor': 15}
+DEVICE_PATH = '/dev/ttyStub0'
+KNOTS_TO_MS = 0.514444
+
+
+def nmea_checksum_ok(sentence):
+    body, _, checksum = sentence.strip().lstrip('$').partition('*')
+    if not checksum:
+        return True
+    value = 0
+    for char in body:
+        value ^= ord(char)
+    return f"{value:02X}" == checksum[:2].upper()
+
+
+def _coordinate(value, hemisphere):
+    if not value:
+        return None
+    degrees_width = value.index('.') - 2
+    degrees = float(value[:degrees_width]) + float(value[degrees_width:]) / 60.0
+    return -degrees if hemisphere in ('S', 'W') else degrees
+
+
+def _iso(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f"{moment.microsecond // 1000:03d}Z"
+
+
+def parse_nmea(lines):
+    """Converts NMEA sentences to [(seconds since the first fix, TPV report)], one TPV per RMC sentence.
+    Altitude and fix quality come from the most recent GGA sentence."""
+    reports = []
+    gga = None
+    first = None
+    for line in lines:
+        line = line.strip()
+        if not line.startswith('$') or not nmea_checksum_ok(line):
+            continue
+        fields = line.split('*')[0].split(',')
+        kind = fields[0][3:]
+        if kind == 'GGA' and len(fields) > 9:
+            gga = {'quality': int(fields[6] or 0), 'alt': float(fields[9]) if fields[9] else None}
+        elif kind == 'RMC' and len(fields) > 9 and fields[1] and fields[9]:
+            moment = datetime.strptime(fields[9] + fields[1].split('.')[0], '%d%m%y%H%M%S').replace(tzinfo=timezone.utc)
+            if '.' in fields[1]:
+                moment = moment.replace(microsecond=int(float('0.' + fields[1].split('.')[1]) * 1e6))
+            first = first or moment
+            report = {'class': 'TPV', 'device': DEVICE_PATH, 'time': _iso(moment), 'mode': 1}
+            if fields[2] == 'A':
+                report['mode'] = 3 if gga and gga['quality'] and gga['alt'] is not None else 2
+                report['lat'] = _coordinate(fields[3], fields[4])
+                report['lon'] = _coordinate(fields[5], fields[6])
+                if report['mode'] == 3:
+                    report['altMSL'] = gga['alt']
+                if fields[7]:
+                    report['speed'] = round(float(fields[7]) * KNOTS_TO_MS, 3)
+                if fields[8]:
+                    report['track'] = float(fields[8])
+            reports.append(((moment - first).total_seconds(), report))
+    return reports
+
+
+def parse_gpsd_json(lines):
+    """Reads a gpsd JSON log; reports are timed by the latest TPV 'time' seen (others ride along)."""
+    reports = []
+    first = offset = None
+    for line in lines:
+        line = line.strip()
+        if not line.startswith('{'):
+            continue
+        try:
+            report = json.loads(line)
+        except ValueError:
+            continue
+        if report.get('class') == 'TPV' and report.get('time'):
+            moment = datetime.fromisoformat(report['time'].replace('Z', '+00:00'))
+            first = first or moment
+            offset = (moment - first).total_seconds()
+        reports.append((offset or 0.0, report))
+    return reports
+
+
+def load_log(path):
+    with open(path) as file:
+        lines = file.readlines()
+    is_nmea = any(line.startswith('$') for line in lines[:50])
+    return parse_nmea(lines) if is_nmea else parse_gpsd_json(lines)
+
+
+def synthetic_reports(count, rate=1.0, latitude=52.0, longitude=5.0, speed=5.0):
+    """TPV reports of a unit driving north at speed m/s, rate reports per second."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+    reports = []
+    for index in range(count):
+        offset = index / rate
+        moment = datetime.fromtimestamp(start + offset, timezone.utc)
+        reports.append((offset, {'class': 'TPV', 'device': DEVICE_PATH, 'mode': 3, 'time': _iso(moment),
+                                 'lat': round(latitude + offset * speed / 111195.0, 8), 'lon': longitude,
+                                 'altMSL': 3.2, 'speed': speed, 'track': 0.0, 'eph': 2.5}))
+    return reports
+
+
+class _GpsdConnectionHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        stub = self.server.stub
+        sock = self.request
+        try:
+            sock.sendall(stub.encode(VERSION_REPORT))
+            sock.settimeout(stub.watch_timeout)
+            command = b''
+            while b'?WATCH' not in command:
+                chunk = sock.recv(1024)
+                if not chunk:
+                    return
+                command += chunk
+            sock.settimeout(None)
+            sock.sendall(stub.encode({'class': 'DEVICES', 'devices': [{'class': 'DEVICE', 'path': DEVICE_PATH}]}) +
+                         stub.encode({'class': 'WATCH', 'enable': True, 'json': True}))
+            stub._count('connections')
+            stub.replay(sock)
+        except (ConnectionError, OSError, socket.timeout) as e:
+            stub.logger.debug(f"Client {self.client_address} closed: {e}")
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class GpsdStub:
+    def __init__(self, reports, host='127.0.0.1', port=0, speed=1.0, loop=False, fix_loss=(), burst_every=0,
+                 burst_size=1, malformed_rate=0.0, disconnect_after=None, seed=0, watch_timeout=5.0):
+        """reports: [(log seconds, report dict)] from load_log/parse_nmea/synthetic_reports.
+        speed: replay speed factor, or None for as fast as possible.
+        fix_loss: [(start, end)] log-second windows in which TPVs carry no fix.
+        burst_every/burst_size: every burst_every-th report starts burst_size reports sent back to back.
+        malformed_rate: probability that a report line is truncated.
+        disconnect_after: log seconds after which the connection is dropped."""
+        self.reports = list(reports)
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.loop = loop
+        self.fix_loss = list(fix_loss)
+        self.burst_every = burst_every
+        self.burst_size = burst_size
+        self.malformed_rate = malformed_rate
+        self.disconnect_after = disconnect_after
+        self.watch_timeout = watch_timeout
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.on_send = None  # called with (report, monotonic send time) for every sent report
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._counters = {'connections': 0, 'reports_sent': 0, 'malformed_sent': 0, 'fixes_lost': 0, 'bursts': 0}
+
+    def start(self):
+        """Starts serving on a background thread and returns the bound port."""
+        self._stopping.clear()
+        self._server = _ThreadingServer((self.host, self.port), _GpsdConnectionHandler)
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='GpsdStub', daemon=True)
+        self._thread.start()
+        self.logger.info(f"gpsd stub listening on {self.host}:{self.port} with {len(self.reports)} reports")
+        return self.port
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._stopping.set()
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+        self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    @staticmethod
+    def encode(report):
+        return json.dumps(report, separators=(',', ':')).encode('utf-8') + b'\n'
+
+    def _faulted(self, offset, report):
+        """Applies fix loss to a report; returns (report, line)."""
+        if report.get('class') == 'TPV' and any(start <= offset < end for start, end in self.fix_loss):
+            report = {'class': 'TPV', 'device': report.get('device', DEVICE_PATH), 'time': report.get('time'),
+                      'mode': 1}
+            self._count('fixes_lost')
+        line = self.encode(report)
+        if self.malformed_rate and self._random.random() < self.malformed_rate:
+            line = line[:len(line) // 2] + b'\n'
+            self._count('malformed_sent')
+        return report, line
+
+    def replay(self, sock):
+        """Streams the reports to one client, paced by their log timestamps."""
+        started = time.monotonic()
+        cycle_offset = 0.0
+        burst_left = 0
+        while True:
+            for index, (offset, report) in enumerate(self.reports):
+                offset += cycle_offset
+                if self._stopping.is_set() or (self.disconnect_after is not None and offset >= self.disconnect_after):
+                    return
+                if self.burst_every and index % self.burst_every == 0 and index:
+                    burst_left = self.burst_size
+                    self._count('bursts')
+                if burst_left:
+                    burst_left -= 1  # no pacing inside a burst; the reports pile up at the client
+                elif self.speed:
+                    delay = started + offset / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                report, line = self._faulted(offset, report)
+                sock.sendall(line)
+                if self.on_send is not None:
+                    self.on_send(report, time.monotonic())
+                self._count('reports_sent')
+            if not self.loop or not self.reports:
+                return
+            cycle_offset += self.reports[-1][0] + (self.reports[1][0] - self.reports[0][0] if len(self.reports) > 1
+                                                   else 1.0)
+
+
+def benchmark(reports=100000, rate=10.0, latency_reports=200):
+    """Measures GPSHandler parse throughput (offline and over the socket) and report-to-fix latency."""
+    results = {}
+    handler = GPSHandler(autostart=False)
+    lines = [GpsdStub.encode(report) for _, report in synthetic_reports(reports, rate=1000.0)]
+    started = time.perf_counter()
+    for line in lines:
+        handler.handle_line(line)
+    results['parse_reports_per_second'] = len(lines) / (time.perf_counter() - started)
+
+    with GpsdStub(synthetic_reports(reports, rate=1000.0), speed=None) as stub:
+        handler = GPSHandler(port=stub.port, reconnect_delay=60.0)
+        started = time.perf_counter()
+        deadline = time.monotonic() + 120
+        while handler.reports_parsed < reports + 3 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        results['socket_reports_per_second'] = handler.reports_parsed / (time.perf_counter() - started)
+        handler.cleanup()
+
+    sent_at = {}
+    latencies = []
+    with GpsdStub(synthetic_reports(latency_reports, rate=rate), speed=1.0) as stub:
+        stub.on_send = lambda report, moment: sent_at.__setitem__(report.get('time'), moment)
+        handler = GPSHandler(port=stub.port, reconnect_delay=60.0)
+        original = handler.handle_line
+
+        def timed_handle_line(line):
+            fix = original(line)
+            if fix is not None:
+                latencies.append((fix['gps_time'], time.monotonic()))
+            return fix
+
+        handler.handle_line = timed_handle_line
+        deadline = time.monotonic() + latency_reports / rate + 10
+        while len(latencies) < latency_reports and time.monotonic() < deadline:
+            time.sleep(0.05)
+        handler.cleanup()
+    delays = sorted((received - sent_at[key]) * 1000.0 for key, received in latencies if key in sent_at)
+    if delays:
+        results['latency_ms'] = {'p50': delays[len(delays) // 2], 'p99': delays[int(len(delays) * 0.99) - 1],
+                                 'max': delays[-1]}
+    results['reports'] = reports
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="gpsd stand-in with log replay and fault injection")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help="Replay a log to gpsd clients")
+    serve.add_argument('--log', help="NMEA or gpsd JSON log (default: synthetic 1 Hz drive)")
+    serve.add_argument('--port', type=int, default=2947)
+    serve.add_argument('--speed', type=float, default=1.0, help="Replay speed 1-1000, 0 for as fast as possible")
+    serve.add_argument('--loop', action='store_true')
+    serve.add_argument('--fix-loss', action='append', default=[], metavar='START:END',
+                       help="Log seconds without a fix (repeatable)")
+    serve.add_argument('--burst-every', type=int, default=0)
+    serve.add_argument('--burst-size', type=int, default=1)
+    serve.add_argument('--malformed-rate', type=float, default=0.0)
+    bench = commands.add_parser('benchmark', help="Measure GPSHandler throughput and latency")
+    bench.add_argument('--reports', type=int, default=100000)
+    bench.add_argument('--rate', type=float, default=10.0, help="Report rate for the latency run")
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        print(json.dumps(benchmark(args.reports, args.rate), indent=2))
+        return 0
+    if not 0 <= args.speed <= 1000:
+        parser.error("--speed must be between 0 and 1000")
+    reports = load_log(args.log) if args.log else synthetic_reports(3600)
+    fix_loss = [tuple(float(part) for part in window.split(':')) for window in args.fix_loss]
+    with GpsdStub(reports, port=args.port, speed=args.speed or None, loop=args.loop, fix_loss=fix_loss,
+                  burst_every=args.burst_every, burst_size=args.burst_size,
+                  malformed_rate=args.malformed_rate) as stub:
+        try:
+            while True:
+                time.sleep(5)
+                logging.info(f"gpsd stub stats: {stub.stats()}")
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,27 +1,78 @@
 """
-The gpiocontrol.py script is intended to provide an interface for controlling the General Purpose Input/Output (GPIO) pins on a Linux system. 
-When it comes to advanced features and methods, we might consider including error handling, 
+The gpiocontrol.py script is intended to provide an interface for controlling the General Purpose Input/Output (GPIO) pins on a Linux system.
+When it comes to advanced features and methods, we might consider including error handling,
 encapsulation of the GPIO setup and teardown process, and perhaps some system-level interaction for robust control."""
 
 import os
+import select
+import threading
+import time
 import logging
 
+GPIO_ROOT = "/sys/class/gpio"
+DIRECTIONS = ("in", "out", "high", "low")  # "high"/"low" set the output level atomically with the direction
+EDGES = ("none", "rising", "falling", "both")
+
+
+def _encode(value):
+    """Accepts 1/0, True/False or "1"/"0" and returns the byte sysfs expects."""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode().strip()
+    return b"1" if str(value).strip() in ("1", "True", "true", "high") else b"0"
+
+
 class GPIOControl:
-    def __init__(self, gpio_num):
+    def __init__(self, gpio_num, direction="out", gpio_root=GPIO_ROOT, edge=None):
         self.gpio_num = gpio_num
-        self.gpio_path = f"/sys/class/gpio/gpio{gpio_num}"
-        self.initialize_gpio()
+        self.gpio_root = gpio_root
+        self.gpio_path = f"{gpio_root}/gpio{gpio_num}"
+        self.direction = None  # cached, so unchanged directions are never rewritten
+        self.edge = None
+        self.fd = None
+        self.initialize_gpio(direction, edge)
 
-    def initialize_gpio(self):
+    def initialize_gpio(self, direction="out", edge=None):
         try:
             if not os.path.exists(self.gpio_path):
-                with open("/sys/class/gpio/export", 'w') as f:
+                with open(f"{self.gpio_root}/export", 'w') as f:
                     f.write(str(self.gpio_num))
-            with open(f"{self.gpio_path}/direction", 'w') as f:
-                f.write("out")
+            self.set_direction(direction)
+            if edge is not None:
+                self.set_edge(edge)
+            self.fd = self._open_value()
         except IOError as e:
             logging.error(f"GPIO Initialization failed: {e}")
 
+    def _open_value(self, attempts=20):
+        # udev may still be fixing the permissions of a freshly exported pin
+        for attempt in range(attempts):
+            try:
+                return os.open(f"{self.gpio_path}/value", os.O_RDWR)
+            except PermissionError:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.05)
+
+    def set_direction(self, direction):
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        cached = "out" if direction in ("high", "low") else direction
+        if self.direction == cached and direction == cached:
+            return
+        with open(f"{self.gpio_path}/direction", 'w') as f:
+            f.write(direction)
+        self.direction = cached
+
+    def set_edge(self, edge):
+        """Selects which transitions of an input raise an interrupt: none, rising, falling or both."""
+        if edge not in EDGES:
+            raise ValueError(f"edge must be one of {EDGES}")
+        if self.edge == edge:
+            return
+        with open(f"{self.gpio_path}/edge", 'w') as f:
+            f.write(edge)
+        self.edge = edge
+
     def set_high(self):
         self.write_value("1")
 
@@ -30,26 +81,247 @@ class GPIOControl:
 
     def write_value(self, value):
         try:
-            with open(f"{self.gpio_path}/value", 'w') as f:
-                f.write(value)
-        except IOError as e:
+            os.pwrite(self.fd, _encode(value), 0)
+        except (OSError, TypeError) as e:
             logging.error(f"GPIO Value write failed: {e}")
 
     def read_value(self):
         try:
-            with open(f"{self.gpio_path}/value", 'r') as f:
-                return f.read().strip()
-        except IOError as e:
+            return os.pread(self.fd, 8, 0).decode().strip()
+        except (OSError, TypeError) as e:
             logging.error(f"GPIO Value read failed: {e}")
             return None
 
+    def close(self):
+        """Closes the value file descriptor without unexporting the pin."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
     def cleanup(self):
+        self.close()
         try:
-            with open("/sys/class/gpio/unexport", 'w') as f:
+            with open(f"{self.gpio_root}/unexport", 'w') as f:
                 f.write(str(self.gpio_num))
         except IOError as e:
             logging.error(f"GPIO Cleanup failed: {e}")
 
+
+class GPIOBank:
+    """Many pins driven or sampled per call, over the pins' persistent value descriptors."""
+
+    def __init__(self, pins, direction="out", gpio_root=GPIO_ROOT):
+        """pins: GPIO numbers; direction: one direction for all pins or {pin: direction}."""
+        self.pins = {}
+        for pin in pins:
+            pin_direction = direction.get(pin, "out") if isinstance(direction, dict) else direction
+            self.pins[pin] = GPIOControl(pin, pin_direction, gpio_root)
+
+    @property
+    def directions(self):
+        return {pin: control.direction for pin, control in self.pins.items()}
+
+    def set_directions(self, directions):
+        """Changes directions ({pin: direction}); pins already in that direction are not touched."""
+        for pin, direction in directions.items():
+            self.pins[pin].set_direction(direction)
+
+    def write(self, values):
+        """Writes {pin: value}, one pwrite per pin and no per-call open/close."""
+        for pin, value in values.items():
+            os.pwrite(self.pins[pin].fd, _encode(value), 0)
+
+    def write_all(self, value):
+        self.write({pin: value for pin in self.pins})
+
+    def read(self, pins=None):
+        """Returns {pin: 0/1} for the given pins (default all)."""
+        pins = self.pins if pins is None else pins
+        return {pin: 1 if os.pread(self.pins[pin].fd, 1, 0) == b"1" else 0 for pin in pins}
+
+    def close(self):
+        for control in self.pins.values():
+            control.close()
+
+    def cleanup(self):
+        for control in self.pins.values():
+            control.cleanup()
+
+
+class GPIOEventDispatcher:
+    """Waits for edge interrupts on many input pins with one epoll on one thread.
+
+    Each pin's value fd is registered for EPOLLPRI; an interrupt wakes the thread, which re-reads the
+    value at offset 0 (re-arming the interrupt) and delivers an event dict {'pin', 'value', 'edge',
+    'timestamp', 'monotonic'} to the pin's callback and/or the shared queue. With a debounce interval,
+    every edge (re)starts a settle timer: once the pin has been quiet that long the value is read
+    again and an event, stamped with the time of the burst's first edge, is delivered if it differs
+    from the last delivered value, so contact bounce yields one event. Callbacks run without the
+    dispatcher's lock held and may add or remove inputs.
+    The thread sleeps in epoll between events and is woken through a pipe to stop.
+    """
+
+    def __init__(self, debounce=0.0, events=None):
+        """debounce: default settle time in seconds; events: a queue.Queue receiving every event."""
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.debounce = debounce
+        self.events = events
+        self.inputs = {}  # fd -> input record
+        self.events_delivered = 0
+        self.edges_seen = 0
+        self._epoll = select.epoll()
+        self._wake_read, self._wake_write = os.pipe()
+        self._epoll.register(self._wake_read, select.EPOLLIN)
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def add_input(self, pin, callback=None, edge="both", debounce=None, gpio_root=GPIO_ROOT):
+        """Watches a pin (a GPIO number, or a GPIOControl already configured as an input).
+        A control created here from a GPIO number is closed again by remove_input() and close()."""
+        owned = isinstance(pin, int)
+        control = GPIOControl(pin, "in", gpio_root, edge) if owned else pin
+        if control.fd is None:
+            raise OSError(f"GPIO {control.gpio_num} has no open value file; was it exported as an input?")
+        value = self._read(control)  # also clears an interrupt that is already pending
+        record = {'control': control, 'callback': callback, 'edge': edge, 'value': value,
+                  'debounce': self.debounce if debounce is None else debounce, 'deadline': None,
+                  'first_edge': None, 'owned': owned}
+        with self._lock:
+            try:
+                self._epoll.register(control.fd, select.EPOLLPRI | select.EPOLLERR)
+            except OSError:
+                if owned:
+                    control.close()
+                raise
+            self.inputs[control.fd] = record
+        return control
+
+    def remove_input(self, gpio_num):
+        with self._lock:
+            for fd, record in list(self.inputs.items()):
+                if record['control'].gpio_num == gpio_num:
+                    self._drop(fd)
+                    return record['control']
+        return None
+
+    def _drop(self, fd):
+        """Unregisters an input (lock held) and closes its control if add_input() created it."""
+        record = self.inputs.pop(fd)
+        self._epoll.unregister(fd)
+        if record['owned']:
+            record['control'].close()
+
+    @staticmethod
+    def _read(control):
+        value = control.read_value()
+        return 1 if value == "1" else 0
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="GPIOEvents", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._running = False
+        os.write(self._wake_write, b"x")
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            for fd in list(self.inputs):
+                self._drop(fd)
+        self._epoll.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def _timeout(self, now):
+        deadlines = [record['deadline'] for record in self.inputs.values() if record['deadline'] is not None]
+        return max(min(deadlines) - now, 0.0) if deadlines else -1
+
+    def _run(self):
+        while self._running:
+            with self._lock:
+                timeout = self._timeout(time.monotonic())
+            try:
+                ready = self._epoll.poll(timeout)
+            except InterruptedError:
+                continue
+            now, wall = time.monotonic(), time.time()
+            events = []
+            with self._lock:
+                for fd, _ in ready:
+                    if fd == self._wake_read:
+                        os.read(self._wake_read, 64)
+                        continue
+                    record = self.inputs.get(fd)
+                    if record is not None:
+                        self._edge(record, now, wall, events)
+                for record in self.inputs.values():
+                    if record['deadline'] is not None and record['deadline'] <= now:
+                        record['deadline'] = None
+                        self._settle(record, events)
+            # Delivered without the lock, so callbacks may add or remove inputs and never stall add_input
+            for record, event in events:
+                self._deliver(record, event)
+
+    def _edge(self, record, now, wall, events):
+        self.edges_seen += 1
+        if record['debounce']:
+            self._read(record['control'])  # re-arm; the value is judged once it has settled
+            if record['deadline'] is None:
+                record['first_edge'] = (wall, now)  # the event is stamped with the first edge of the burst
+            record['deadline'] = now + record['debounce']  # every edge restarts the settle timer
+            return
+        value = self._read(record['control'])
+        record['value'] = value
+        events.append((record, self._event(record, value, wall, now)))
+
+    def _settle(self, record, events):
+        value = self._read(record['control'])
+        if value == record['value']:
+            return  # bounced back to where it was
+        record['value'] = value
+        if record['edge'] == "rising" and not value or record['edge'] == "falling" and value:
+            return
+        events.append((record, self._event(record, value, *record['first_edge'])))
+
+    @staticmethod
+    def _event(record, value, wall, now):
+        return {'pin': record['control'].gpio_num, 'value': value, 'edge': "rising" if value else "falling",
+                'timestamp': wall, 'monotonic': now}
+
+    def _deliver(self, record, event):
+        self.events_delivered += 1
+        if self.events is not None:
+            self.events.put(event)
+        if record['callback'] is not None:
+            try:
+                record['callback'](event)
+            except Exception as e:
+                self.logger.error(f"GPIO {event['pin']} callback failed: {e}")
+
+
+def benchmark(gpio_num, iterations=10000, gpio_root=GPIO_ROOT):
+    """Seconds per write for open/write/close per call versus a persistent fd with pwrite."""
+    path = f"{gpio_root}/gpio{gpio_num}/value"
+    started = time.perf_counter()
+    for index in range(iterations):
+        with open(path, 'w') as f:
+            f.write("1" if index & 1 else "0")
+    reopen = (time.perf_counter() - started) / iterations
+    control = GPIOControl(gpio_num, "out", gpio_root)
+    started = time.perf_counter()
+    for index in range(iterations):
+        os.pwrite(control.fd, b"1" if index & 1 else b"0", 0)
+    persistent = (time.perf_counter() - started) / iterations
+    control.close()
+    return {'reopen_seconds': reopen, 'pwrite_seconds': persistent, 'speedup': reopen / persistent}
+
 # Usage example
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -60,16 +332,23 @@ if __name__ == "__main__":
         gpio_control.set_high()
         value = gpio_control.read_value()
         logging.info(f"GPIO {gpio_pin} is set to {value}")
+        logging.info(f"Write cost: {benchmark(gpio_pin)}")
     finally:
         gpio_control.cleanup()
 
 
 """
 The GPIO pins are controlled by writing to the filesystem (/sys/class/gpio).
-The initialize_gpio method sets up the GPIO pin for output.
+The initialize_gpio method exports the pin, sets its direction and opens its value file once; the
+descriptor stays open for the lifetime of the object.
 The set_high and set_low methods are used to set the GPIO pin high or low.
-The write_value method abstracts the filesystem write operation, with error handling.
-The read_value method reads the current value of the GPIO pin, with error handling.
-The cleanup method unexports the GPIO pin when it's no longer needed, which is a good practice to avoid leaving the GPIO pins in an unexpected state.
+The write_value and read_value methods use os.pwrite/os.pread at offset 0 on that descriptor, so a toggle
+is a single syscall instead of open, write and close with Python file objects.
+The direction is cached, and set_direction only writes the direction file when it actually changes.
+GPIOBank reads or writes many pins per call over their persistent descriptors.
+For inputs, set_edge configures which transitions raise an interrupt, and GPIOEventDispatcher waits on
+many value descriptors at once with epoll on a single thread, delivering debounced, timestamped events to
+callbacks or a queue without polling.
+The cleanup method closes the descriptor and unexports the GPIO pin when it's no longer needed, which is a good practice to avoid leaving the GPIO pins in an unexpected state.
 Logging is used to report errors, making debugging easier.
 """
@@ -1,9 +1,10 @@
 import logging
 from thingsboard_client import ThingsBoardClient
-from device_manager import DeviceManager
+from device_manager.device_manager import DeviceManager
 from state_manager import StateManager
 from state_manager.config_loader import ConfigLoader
-from handlers import GPSHandler, FlowCalculationHandler
+from state_manager.flow_calculation_handler import FlowCalculationHandler
+from handlers import GPSDecimator, GPSHandler
 from utilities import RuntimeTracker
 
 "Configuration"
@@ -29,8 +30,8 @@ def main():
     "Initialize State Manager"
     state_manager = StateManager(config)
 
-    "Initialize GPS Handler"
-    gps_handler = GPSHandler()
+    "Initialize GPS Handler; only moved, turned or overdue fixes are published"
+    gps_handler = GPSHandler(decimator=GPSDecimator(min_distance=25.0, max_interval=300.0))
 
     "Initialize Flow Calculation Handler"
     flow_handler = FlowCalculationHandler()
@@ -48,7 +49,7 @@ def main():
             device_manager.process_devices()
 
             "Handle GPS data"
-            gps_data = gps_handler.fetch_data()
+            gps_data = gps_handler.fetch_telemetry()
             if gps_data:
                 tb_client.publish_telemetry(gps_data)
 
@@ -0,0 +1,219 @@
+# history_buffer.py
+
+"""The history_buffer.py module keeps recent sensor history in memory, per device and channel.
+Each channel is a fixed-capacity ring buffer over preallocated array.array storage for timestamps,
+values and quality flags, so an append is O(1), creates no per-sample Python objects and memory never
+grows after configuration. Time-range queries bisect the (non-decreasing) timestamps and return zero-copy
+memoryview or NumPy views of at most two contiguous segments, making local smoothing, trends and RPC
+history queries independent of the cloud."""
+
+import logging
+import threading
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # views are plain memoryviews without NumPy
+    np = None
+
+QUALITY_GOOD = 0
+BYTES_PER_SAMPLE = 8 + 8 + 1  # timestamp, value, quality
+
+
+def join_segments(segments):
+    """Joins range_views() segments into single (timestamps, values, quality) arrays.
+    A single segment is returned as is, without copying."""
+    if len(segments) == 1:
+        return segments[0]
+    if np is not None:
+        if not segments:
+            return np.empty(0), np.empty(0), np.empty(0, dtype=np.uint8)
+        return tuple(np.concatenate(parts) for parts in zip(*segments))
+    return tuple(array(typecode, b''.join(bytes(part) for part in parts))
+                 for typecode, parts in zip(('d', 'd', 'B'), zip(*segments) if segments else ([], [], [])))
+
+
+class RingBuffer:
+    """Fixed-capacity (timestamp, value, quality) history for one channel."""
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.quality = array('B', bytes(capacity))
+        self.rejected = 0  # samples older than the newest one
+        self._head = 0  # next physical slot to write
+        self._count = 0
+        self._lock = threading.Lock()
+        if np is not None:
+            self._timestamp_array = np.frombuffer(self.timestamps, dtype=np.float64)
+            self._value_array = np.frombuffer(self.values, dtype=np.float64)
+            self._quality_array = np.frombuffer(self.quality, dtype=np.uint8)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self.capacity * BYTES_PER_SAMPLE
+
+    def append(self, timestamp, value, quality=QUALITY_GOOD):
+        """Appends one sample, overwriting the oldest when full. Returns False for out-of-order samples."""
+        with self._lock:
+            head = self._head
+            if self._count and timestamp < self.timestamps[head - 1]:
+                self.rejected += 1
+                return False
+            self.timestamps[head] = timestamp
+            self.values[head] = value
+            self.quality[head] = quality
+            self._head = head + 1 if head + 1 < self.capacity else 0
+            if self._count < self.capacity:
+                self._count += 1
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._count = 0
+
+    def _start(self):
+        """Physical index of the oldest sample."""
+        return (self._head - self._count) % self.capacity
+
+    def _timestamp_at(self, start, logical):
+        return self.timestamps[(start + logical) % self.capacity]
+
+    def _bisect_left(self, start, timestamp):
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamp_at(start, mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _bisect_right(self, start, timestamp):
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if timestamp < self._timestamp_at(start, mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _segments(self, start, first, last):
+        """Physical [begin, end) slices covering logical samples first..last-1."""
+        if first >= last:
+            return []
+        begin = (start + first) % self.capacity
+        end = begin + (last - first)
+        if end <= self.capacity:
+            return [(begin, end)]
+        return [(begin, self.capacity), (0, end - self.capacity)]
+
+    def _view(self, begin, end):
+        if np is not None:
+            return (self._timestamp_array[begin:end], self._value_array[begin:end], self._quality_array[begin:end])
+        return (memoryview(self.timestamps)[begin:end], memoryview(self.values)[begin:end],
+                memoryview(self.quality)[begin:end])
+
+    def range_views(self, start_time=None, end_time=None):
+        """Zero-copy views [(timestamps, values, quality), ...] of samples with start_time <= t <= end_time.
+
+        At most two segments are returned (two when the range wraps around the end of the storage).
+        The views alias live storage and will be overwritten by later appends; copy what you keep.
+        """
+        with self._lock:
+            start = self._start()
+            first = 0 if start_time is None else self._bisect_left(start, start_time)
+            last = self._count if end_time is None else self._bisect_right(start, end_time)
+            return [self._view(begin, end) for begin, end in self._segments(start, first, last)]
+
+    def range(self, start_time=None, end_time=None):
+        """Returns (timestamps, values, quality) for a time range as arrays, copying only if it wraps."""
+        return join_segments(self.range_views(start_time, end_time))
+
+    def latest(self, count):
+        """Returns the newest count samples as (timestamps, values, quality)."""
+        with self._lock:
+            start = self._start()
+            segments = [self._view(begin, end)
+                        for begin, end in self._segments(start, max(self._count - count, 0), self._count)]
+        return join_segments(segments)
+
+    def last(self):
+        """Returns the newest (timestamp, value, quality) or None."""
+        with self._lock:
+            if not self._count:
+                return None
+            index = self._head - 1
+            return self.timestamps[index], self.values[index], self.quality[index]
+
+
+class HistoryStore:
+    """Ring buffers keyed by (device, channel), each with its own fixed capacity."""
+
+    def __init__(self, default_capacity=3600, capacities=None):
+        """capacities: {(device, channel): capacity} or {'device.channel': capacity}."""
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.default_capacity = default_capacity
+        self.capacities = {}
+        for key, capacity in (capacities or {}).items():
+            self.capacities[self._key(key)] = capacity
+        self.buffers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(key):
+        if isinstance(key, str):
+            device, _, channel = key.partition('.')
+            return device, channel
+        return tuple(key)
+
+    def channel(self, device, channel):
+        """Returns the ring buffer for a channel, allocating it on first use."""
+        key = (device, channel)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            with self._lock:
+                buffer = self.buffers.get(key)
+                if buffer is None:
+                    capacity = self.capacities.get(key, self.default_capacity)
+                    buffer = self.buffers[key] = RingBuffer(capacity)
+                    self.logger.info(f"History for {device}.{channel}: {capacity} samples, {buffer.nbytes} bytes.")
+        return buffer
+
+    def append(self, device, channel, timestamp, value, quality=QUALITY_GOOD):
+        return self.channel(device, channel).append(timestamp, value, quality)
+
+    def query(self, device, channel, start_time=None, end_time=None):
+        """Returns (timestamps, values, quality) for a time range, or empty results for unknown channels."""
+        buffer = self.buffers.get((device, channel))
+        if buffer is None:
+            return join_segments([])
+        return buffer.range(start_time, end_time)
+
+    def channels(self):
+        return sorted(self.buffers)
+
+    def memory_bytes(self):
+        """Total preallocated storage across all channels."""
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+
+# Example usage
+if __name__ == '__main__':
+    import time
+    logging.basicConfig(level=logging.INFO)
+    history = HistoryStore(default_capacity=600, capacities={'radar1.distance': 3600})
+    now = time.time()
+    for second in range(4000):
+        history.append('radar1', 'distance', now + second, 100.0 + second % 10)
+    timestamps, values, quality = history.query('radar1', 'distance', now + 3900)
+    logging.info(f"{len(values)} samples in the last 100 s, mean {sum(values) / len(values):.2f}")
+    logging.info(f"History memory: {history.memory_bytes()} bytes")
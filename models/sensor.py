@@ -2,15 +2,19 @@
 
 # sensor.py
 import logging
+import numbers
+import time
 
 class Sensor:
-    def __init__(self, sensor_id, sensor_type, initial_config=None):
+    def __init__(self, sensor_id, sensor_type, initial_config=None, history=None):
         self.sensor_id = sensor_id
         self.sensor_type = sensor_type
         self.config = initial_config or {}
         self.logger = logging.getLogger(f"{sensor_type}_{sensor_id}")
         self.is_operational = False
         self.last_read_value = None
+        self.history = history  # optional RingBuffer, e.g. HistoryStore.channel(sensor_id, sensor_type), or a HistoryStore
+        self._history_rejecting = False
 
     def read_data(self):
         """
@@ -49,13 +53,42 @@ class Sensor:
             self.is_operational = False
             self.logger.error(f"Sensor {self.sensor_id} is not operational: {e}")
 
-    def update_last_read(self, value):
+    def update_last_read(self, value, timestamp=None):
         """
         Update the internally stored last read value.
+        timestamp: when the value was sampled (default now); pass the acquisition time when it is known.
         """
         self.last_read_value = value
+        if self.history is not None and value is not None:
+            self._record_history(time.time() if timestamp is None else timestamp, value)
         self.logger.info(f"Sensor {self.sensor_id} last read value updated to: {value}")
 
+    def _record_history(self, timestamp, value):
+        """
+        Appends numeric readings to the history. A dict reading is stored field by field
+        (channel sensor_id.field) when the history is a HistoryStore; non-numeric values are skipped.
+        """
+        is_store = hasattr(self.history, 'channel')
+        if isinstance(value, dict):
+            if not is_store:
+                return  # a single ring buffer cannot hold several fields
+            samples = [(field, sample) for field, sample in value.items() if isinstance(sample, numbers.Real)]
+        elif isinstance(value, numbers.Real):
+            samples = [(self.sensor_type, value)]
+        else:
+            return
+        for channel, sample in samples:
+            buffer = self.history.channel(str(self.sensor_id), channel) if is_store else self.history
+            if buffer.append(timestamp, sample):
+                if self._history_rejecting:
+                    self._history_rejecting = False
+                    self.logger.info(f"Sensor {self.sensor_id} history is accepting samples again.")
+            elif not self._history_rejecting:
+                # Usually the wall clock stepped backwards (e.g. NTP on a board without an RTC)
+                self._history_rejecting = True
+                self.logger.warning(f"Sensor {self.sensor_id} history rejected a sample at {timestamp}, "
+                                    f"older than the newest stored sample; the clock may have stepped back.")
+
     def get_last_read(self):
         """
         Get the last read value.
@@ -98,5 +131,6 @@ if __name__ == "__main__":
 A TemperatureSensor class that inherits from Sensor and provides a specific implementation for reading temperature data.
 A configuration mechanism that allows updating the sensor's settings.
 A method to check the sensor's operational status, which should be implemented to include actual communication with the sensor.
-Methods to update and retrieve the last read value from the sensor.
+Methods to update and retrieve the last read value from the sensor; with a history ring buffer every numeric update is also kept in recent history
+(with a HistoryStore, the numeric fields of dict readings go to one channel each).
 A reset functionality to revert the sensor to its initial configuration."""
@@ -1,39 +1,155 @@
 # config_loader.py
 
-"""The config_loader.py script is typically responsible for parsing configuration files and 
+"""The config_loader.py script is typically responsible for parsing configuration files and
 providing an accessible interface for the rest of the application to retrieve configuration settings. """
 
 import yaml
 import os
 import logging
+import threading
+
+from config.compiled_config import compile_config, deep_merge
+from state_manager.file_watcher import FileWatcher, file_signature
+
+
+def flatten_config(config, prefix=''):
+    """Flattens nested config dicts into {dotted.key: value} for key-level diffs."""
+    items = {}
+    for key, value in config.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            items.update(flatten_config(value, path))
+        else:
+            items[path] = value
+    return items
+
 
 class ConfigLoader:
-    def __init__(self, config_files):
+    def __init__(self, config_files=None, watch=False, poll_interval=1.0):
         self.config_data = {}
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.load_configs(config_files)
+        self.config_files = []
+        self._layers = {}  # path -> (file signature, parsed data), so unchanged files are never reparsed
+        self._overrides = {}  # runtime set() values, applied above every file layer
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._watcher = None
+        self.load_configs(config_files or [])
+        if watch:
+            self.start_watching(poll_interval)
 
     def load_configs(self, config_files):
         """Loads configuration data from a list of YAML config files."""
-        for config_file in config_files:
-            if os.path.exists(config_file):
-                with open(config_file, 'r') as file:
-                    try:
-                        config = yaml.safe_load(file)
-                        self.config_data.update(config)
-                        self.logger.info(f"Configuration loaded from {config_file}")
-                    except yaml.YAMLError as e:
-                        self.logger.error(f"Error loading configuration from {config_file}: {e}")
-            else:
-                self.logger.warning(f"Config file {config_file} does not exist.")
+        with self._lock:
+            for config_file in config_files:
+                if config_file not in self.config_files:
+                    self.config_files.append(config_file)
+            return self.reload()
+
+    def load_config(self):
+        """Returns the merged configuration."""
+        return self.config_data
+
+    def compile(self, attributes=None, environ=None):
+        """Compiles the file layers with defaults, environment and ThingsBoard attributes into a
+        validated, frozen AppConfig. Raises ConfigError on invalid configuration."""
+        return compile_config(self.config_data, environ=environ, attributes=attributes)
+
+    def _load_layer(self, config_file):
+        """Returns the parsed layer, reparsing only if the file changed since the last load."""
+        signature = file_signature(config_file)
+        cached = self._layers.get(config_file)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        if signature is None:
+            self.logger.warning(f"Config file {config_file} does not exist.")
+            self._layers[config_file] = (None, {})
+            return {}
+        with open(config_file, 'r') as file:
+            try:
+                config = yaml.safe_load(file) or {}
+                self.logger.info(f"Configuration loaded from {config_file}")
+            except yaml.YAMLError as e:
+                # Keep serving the last good version of this layer
+                self.logger.error(f"Error loading configuration from {config_file}: {e}")
+                return cached[1] if cached is not None else {}
+        self._layers[config_file] = (signature, config)
+        return config
+
+    def reload(self):
+        """Reloads changed layers, re-merges, and notifies subscribers. Returns {key: (old, new)}."""
+        with self._lock:
+            merged = {}
+            for config_file in self.config_files:
+                merged = deep_merge(merged, self._load_layer(config_file))
+            merged = deep_merge(merged, self._overrides)
+            changes = self._diff(self.config_data, merged)
+            self.config_data = merged
+            subscribers = list(self._subscribers)
+        if changes:
+            self._notify(subscribers, changes)
+        return changes
+
+    @staticmethod
+    def _diff(old, new):
+        old_flat = flatten_config(old)
+        new_flat = flatten_config(new)
+        changes = {}
+        for key in old_flat.keys() | new_flat.keys():
+            old_value = old_flat.get(key)
+            new_value = new_flat.get(key)
+            if old_value != new_value or (key in old_flat) != (key in new_flat):
+                changes[key] = (old_value, new_value)
+        return changes
+
+    def _notify(self, subscribers, changes):
+        for prefix, callback in subscribers:
+            matching = {key: change for key, change in changes.items()
+                        if not prefix or key == prefix or key.startswith(prefix + '.')}
+            if matching:
+                try:
+                    callback(matching)
+                except Exception as e:
+                    self.logger.error(f"Config subscriber for '{prefix}' failed: {e}")
+
+    def subscribe(self, prefix, callback):
+        """Registers callback({dotted.key: (old, new)}) for changes at or below a key prefix ('' for all)."""
+        with self._lock:
+            self._subscribers.append((prefix, callback))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [(p, c) for p, c in self._subscribers if c is not callback]
+
+    def start_watching(self, poll_interval=1.0, use_inotify=True):
+        """Reloads automatically when a config file changes (inotify, or mtime polling as a fallback)."""
+        if self._watcher is None:
+            self._watcher = FileWatcher(self.config_files, lambda changed: self.reload(),
+                                        poll_interval=poll_interval, use_inotify=use_inotify)
+            self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
 
     def get(self, key, default=None):
-        """Retrieves a configuration value for a given key."""
-        return self.config_data.get(key, default)
+        """Retrieves a configuration value for a given key, or a dotted key path."""
+        config = self.config_data
+        if key in config:
+            return config[key]
+        node = config
+        for part in key.split('.'):
+            if not isinstance(node, dict) or part not in node:
+                return default
+            node = node[part]
+        return node
 
     def set(self, key, value):
         """Sets a configuration value."""
-        self.config_data[key] = value
+        with self._lock:
+            self._overrides[key] = value
+        self.reload()
 
     def save_config(self, config_file):
         """Saves the current configuration to a YAML file."""
@@ -48,19 +164,25 @@ class ConfigLoader:
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
     config_files = ['default_config.yaml', 'user_config.yaml']
-    config_loader = ConfigLoader(config_files)
+    config_loader = ConfigLoader(config_files, watch=True)
 
     # Get a config value
     database_url = config_loader.get('database_url', 'localhost')
     logging.info(f"Database URL: {database_url}")
 
+    # React to live changes of the sensor intervals
+    config_loader.subscribe('sensor_intervals', lambda changes: logging.info(f"Intervals changed: {changes}"))
+
     # Set a new config value
     config_loader.set('cache_timeout', 3600)
 
     # Save the current configuration
     config_loader.save_config('current_config.yaml')
+    config_loader.stop_watching()
 
-"This ConfigLoader class uses the PyYAML library to parse YAML configuration files. 
-"It provides methods to load configurations from multiple files, allowing for a layered approach where default settings can be overridden by user-specific configurations. 
-"The get method fetches configuration values with an optional default, and the set method allows for runtime configuration changes. 
-"The save_config method persists the current configuration state back to a file.
+"""This ConfigLoader class uses the PyYAML library to parse YAML configuration files.
+It provides methods to load configurations from multiple files, allowing for a layered approach where default settings can be overridden by user-specific configurations.
+The get method fetches configuration values with an optional default, and the set method allows for runtime configuration changes.
+The save_config method persists the current configuration state back to a file.
+Parsed layers are cached by file signature (mtime, size, inode), so reload() only reparses files that changed.
+start_watching (or watch=True) reloads on change through a FileWatcher, and subscribe(prefix, callback) delivers key-level diffs for keys under that prefix."""
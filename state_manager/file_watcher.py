@@ -0,0 +1,153 @@
+# file_watcher.py
+
+"""The file_watcher.py module watches a set of files and reports which ones changed.
+On Linux it uses inotify (through ctypes, no extra dependency) on the parent directories,
+which also catches editors and deploy tools that replace files via rename.
+Elsewhere, or if inotify is unavailable, it falls back to cheap mtime/size polling."""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def file_signature(path):
+    """Returns a cheap change signature for a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class FileWatcher:
+    """Calls callback(changed_paths) from a background thread when watched files change."""
+
+    def __init__(self, paths, callback, poll_interval=1.0, use_inotify=True, settle_time=0.05):
+        self.paths = {os.path.abspath(path) for path in paths}
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.mode = None
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify_fd = None
+        self._watch_dirs = {}
+        self._signatures = {path: file_signature(path) for path in self.paths}
+        if use_inotify:
+            self._init_inotify()
+
+    def _init_inotify(self):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            return
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            self.logger.warning(f"inotify unavailable ({os.strerror(ctypes.get_errno())}), polling instead.")
+            return
+        for directory in {os.path.dirname(path) for path in self.paths}:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                self.logger.warning(f"Cannot watch {directory} ({os.strerror(ctypes.get_errno())}), polling instead.")
+                os.close(fd)
+                self._watch_dirs = {}
+                return
+            self._watch_dirs[wd] = directory
+        self._inotify_fd = fd
+
+    def start(self):
+        self.mode = 'inotify' if self._inotify_fd is not None else 'polling'
+        target = self._inotify_loop if self._inotify_fd is not None else self._poll_loop
+        self._thread = threading.Thread(target=target, name='FileWatcher', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Watching {len(self.paths)} files using {self.mode}.")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def _notify(self, changed):
+        if not changed:
+            return
+        try:
+            self.callback(changed)
+        except Exception as e:
+            self.logger.error(f"File change callback failed: {e}")
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            self._notify(self.check())
+
+    def check(self):
+        """Compares current signatures with the last seen ones and returns the changed paths."""
+        changed = set()
+        for path in self.paths:
+            signature = file_signature(path)
+            if signature != self._signatures.get(path):
+                self._signatures[path] = signature
+                changed.add(path)
+        return changed
+
+    def _inotify_loop(self):
+        fd = self._inotify_fd
+        while not self._stop.is_set():
+            readable, _, _ = select.select([fd], [], [], self.poll_interval)
+            if not readable:
+                continue
+            changed = self._read_events(fd)
+            # Let a burst of writes (truncate, write, close) settle before reloading
+            if changed and not self._stop.wait(self.settle_time):
+                changed |= self._read_events(fd)
+            self._notify({path for path in changed if self._signature_changed(path)})
+
+    def _read_events(self, fd):
+        changed = set()
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return changed
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += EVENT_HEADER.size + length
+                directory = self._watch_dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if path in self.paths:
+                    changed.add(path)
+
+    def _signature_changed(self, path):
+        signature = file_signature(path)
+        if signature == self._signatures.get(path):
+            return False
+        self._signatures[path] = signature
+        return True
@@ -4,20 +4,19 @@ It includes methods for initialization, calculation based on inputs, and some ba
 
 # flow_calculation_handler.py
 import logging
-from scipy.interpolate import interp1d
+from calibration.calibration_curve import CalibrationCurve
 
 class FlowCalculationHandler:
-    def __init__(self, calibration_data):
+    def __init__(self, calibration_data, extrapolation='linear'):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.calibration_data = calibration_data
+        self.extrapolation = extrapolation
         self.interpolator = self.create_interpolator(calibration_data)
 
     def create_interpolator(self, calibration_data):
-        """Create an interpolator function from the calibration data."""
+        """Create a precomputed calibration curve from the calibration data."""
         try:
-            heights = [point['height'] for point in calibration_data]
-            flow_rates = [point['flow_rate'] for point in calibration_data]
-            return interp1d(heights, flow_rates, fill_value="extrapolate")
+            return CalibrationCurve.from_points(calibration_data, 'height', 'flow_rate', self.extrapolation)
         except Exception as e:
             self.logger.error(f"Error creating interpolator: {e}")
             return None
@@ -26,7 +25,7 @@ class FlowCalculationHandler:
         """Calculate the flow rate based on the water level using interpolation."""
         if self.interpolator is not None:
             try:
-                return self.interpolator(water_level).item()  # .item() to convert numpy type to Python scalar
+                return self.interpolator(water_level)
             except Exception as e:
                 self.logger.error(f"Error calculating flow rate: {e}")
                 return None
@@ -34,6 +33,18 @@ class FlowCalculationHandler:
             self.logger.error("Interpolator function is not available.")
             return None
 
+    def calculate_flow_rates(self, water_levels):
+        """Calculate flow rates for a whole buffer of water levels in one vectorized pass."""
+        if self.interpolator is not None:
+            try:
+                return self.interpolator.evaluate(water_levels)
+            except Exception as e:
+                self.logger.error(f"Error calculating flow rates: {e}")
+                return None
+        else:
+            self.logger.error("Interpolator function is not available.")
+            return None
+
 # Example calibration data
 calibration_data = [
     {'height': 0, 'flow_rate': 0},
@@ -51,11 +62,13 @@ if __name__ == '__main__':
     flow_rate = flow_handler.calculate_flow_rate(water_level)
     if flow_rate is not None:
         logging.info(f"Calculated flow rate: {flow_rate} cubic meters per hour")
+    logging.info(f"Flow rates for a buffer: {flow_handler.calculate_flow_rates([2.5, 7.5, 12.5, 17.5])}")
 
 
 """The FlowCalculationHandler class initializes with calibration data for the flow sensor.
-The create_interpolator method creates an interpolating function using the scipy.interpolate.interp1d method, 
+The create_interpolator method builds a CalibrationCurve with precomputed breakpoints and slopes,
 which can be used to estimate flow rates at water levels not explicitly defined in the calibration data.
-The calculate_flow_rate method uses the interpolator to calculate the flow rate based on a given water level.
+The calculate_flow_rate method evaluates one water level with a bisect; calculate_flow_rates evaluates a whole buffer with NumPy.
+The extrapolation argument ('linear', 'clamp', 'nan' or 'error') controls levels outside the calibrated range.
 The calibration_data should be a list of dictionaries where each dictionary contains a height key representing the water level height and a flow_rate key representing the flow rate at that height. 
 This data is used to create a function that interpolates the flow rate for any given water level."""
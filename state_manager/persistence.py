@@ -0,0 +1,41 @@
+# persistence.py
+"""Helpers for crash-safe file persistence shared by the state and calibration modules."""
+
+import os
+
+
+def atomic_write(file_path, data):
+    """Atomically replaces file_path with data (str or bytes).
+
+    The data is written to a temporary file in the same directory, flushed and fsynced,
+    then renamed over the target so readers only ever see the old or the new content.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(file_path))
+    tmp_path = f"{file_path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, file_path)
+    fsync_directory(directory)
+
+
+def fsync_directory(directory):
+    """Flushes a directory entry so a completed rename survives power loss."""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,259 @@
+"""The sqlite_state_store.py module provides an alternative StateManager backend on SQLite in WAL mode.
+The nested state document (systemConfig, deviceStates.*, actuatorStates.*) is stored as flattened
+dotted key paths, one row per leaf, so single values are indexed lookups, subtrees are prefix range
+scans, and several keys can be updated in one transaction. WAL lets other local processes read the
+state concurrently without reparsing a JSON file.
+It also contains a migration tool from the existing state.json file."""
+
+# sqlite_state_store.py
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+SEPARATOR = '.'
+
+
+def flatten(document, prefix=''):
+    """Flattens a nested dict into {dotted.key.path: leaf value}. Empty dicts are kept as leaves."""
+    items = {}
+    for key, value in document.items():
+        path = f"{prefix}{SEPARATOR}{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            items.update(flatten(value, path))
+        else:
+            items[path] = value
+    return items
+
+
+def unflatten(items, prefix=''):
+    """Rebuilds a nested dict from {dotted.key.path: value}, stripping an optional path prefix."""
+    document = {}
+    strip = len(prefix) + 1 if prefix else 0
+    for path, value in items.items():
+        keys = path[strip:].split(SEPARATOR)
+        node = document
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+    return document
+
+
+def load_json_document(file_path):
+    """Loads a JSON state file, ignoring the full-line // comments found in data/state.json."""
+    with open(file_path, 'r') as file:
+        lines = [line for line in file if not line.lstrip().startswith('//')]
+    return json.loads(''.join(lines))
+
+
+def _prefix_bounds(prefix):
+    """Returns the [low, high) key range covering every path below prefix."""
+    prefix = prefix.rstrip('*').rstrip(SEPARATOR)
+    return prefix, prefix + SEPARATOR, prefix + chr(ord(SEPARATOR) + 1)
+
+
+class SQLiteStateStore:
+    """Flattened key-path storage in a single SQLite table keyed (and indexed) by path."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS state (
+            path TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """
+
+    def __init__(self, db_path, timeout=5.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        with connection:
+            connection.execute(self.SCHEMA)
+
+    def _connection(self):
+        """Returns this thread's connection; SQLite connections must not be shared across threads."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def get(self, path, default=None):
+        """Returns the leaf value stored at path."""
+        row = self._connection().execute('SELECT value FROM state WHERE path = ?', (path,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_prefix(self, prefix):
+        """Returns {path: value} for every leaf below prefix, e.g. 'deviceStates.phSensor.*'."""
+        _, low, high = _prefix_bounds(prefix)
+        rows = self._connection().execute(
+            'SELECT path, value FROM state WHERE path >= ? AND path < ? ORDER BY path', (low, high))
+        return {path: json.loads(value) for path, value in rows}
+
+    def get_subtree(self, path, default=None):
+        """Returns the value at path, rebuilding a nested dict when path names a subtree."""
+        base, low, high = _prefix_bounds(path)
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT path, value FROM state WHERE path = ? OR (path >= ? AND path < ?)', (base, low, high)).fetchall()
+        if not rows:
+            return default
+        if len(rows) == 1 and rows[0][0] == base:
+            return json.loads(rows[0][1])
+        return unflatten({p: json.loads(v) for p, v in rows if p != base}, base)
+
+    def get_version(self, path):
+        row = self._connection().execute('SELECT version FROM state WHERE path = ?', (path,)).fetchone()
+        return row[0] if row else 0
+
+    def set_many(self, updates):
+        """Sets several paths in one transaction. A dict value replaces the whole subtree at its path."""
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            for path, value in updates.items():
+                base, low, high = _prefix_bounds(path)
+                if isinstance(value, dict) and value:
+                    leaves = flatten(value, base)
+                else:
+                    leaves = {base: value}
+                # Drop stale leaves of the subtree (and a leaf that is becoming a subtree)
+                connection.execute('DELETE FROM state WHERE (path >= ? AND path < ?) AND path NOT IN (%s)'
+                                   % ','.join('?' * len(leaves)), (low, high, *leaves))
+                if base not in leaves:
+                    connection.execute('DELETE FROM state WHERE path = ?', (base,))
+                # An ancestor that used to be a leaf becomes a subtree
+                parts = base.split(SEPARATOR)
+                ancestors = [SEPARATOR.join(parts[:i]) for i in range(1, len(parts))]
+                if ancestors:
+                    connection.execute('DELETE FROM state WHERE path IN (%s)' % ','.join('?' * len(ancestors)),
+                                       ancestors)
+                connection.executemany(
+                    'INSERT INTO state (path, value, version, updated_at) VALUES (?, ?, 1, ?) '
+                    'ON CONFLICT(path) DO UPDATE SET value = excluded.value, '
+                    'version = state.version + 1, updated_at = excluded.updated_at',
+                    [(leaf, json.dumps(leaf_value), now) for leaf, leaf_value in leaves.items()])
+
+    def delete(self, path):
+        """Deletes a leaf or a whole subtree."""
+        base, low, high = _prefix_bounds(path)
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM state WHERE path = ? OR (path >= ? AND path < ?)', (base, low, high))
+
+    def document(self):
+        """Returns the whole state as a nested dict."""
+        rows = self._connection().execute('SELECT path, value FROM state')
+        return unflatten({path: json.loads(value) for path, value in rows})
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class SQLiteStateManager:
+    """StateManager-compatible facade over SQLiteStateStore with key-path access."""
+
+    def __init__(self, db_path='state.db'):
+        self.db_path = db_path
+        self.store = SQLiteStateStore(db_path)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @property
+    def state(self):
+        return self.store.document()
+
+    def load_state(self):
+        """Returns the full state document; rows are read on demand so nothing is cached."""
+        return self.store.document()
+
+    def save_state(self):
+        """Every update is committed immediately, so there is nothing to save."""
+
+    def get_value(self, key, default=None):
+        """Retrieves a value (or a nested subtree) by top-level key or dotted key path."""
+        return self.store.get_subtree(key, default)
+
+    def get_prefix(self, prefix):
+        """Retrieves every leaf below a key path prefix as {path: value}."""
+        return self.store.get_prefix(prefix)
+
+    def set_value(self, key, value):
+        """Sets a value at a top-level key or dotted key path."""
+        self.store.set_many({key: value})
+
+    def update_state(self, updates):
+        """Updates multiple key paths in a single transaction."""
+        self.store.set_many(updates)
+
+    def remove_value(self, key):
+        self.store.delete(key)
+
+    def sync_with_cloud(self):
+        """Synchronizes the local state with the cloud or database."""
+        # Placeholder for cloud or database synchronization logic
+        pass
+
+    def close(self):
+        self.store.close()
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """Copies a state.json document into a SQLite state store. Returns the number of leaf rows."""
+    document = load_json_document(json_path)
+    store = SQLiteStateStore(db_path)
+    try:
+        store.set_many(document)
+        return len(flatten(document))
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQLite state store tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help="Migrate a state.json file into a SQLite state store")
+    migrate.add_argument('json_path')
+    migrate.add_argument('db_path')
+    dump = subparsers.add_parser('get', help="Print a key path or prefix from a SQLite state store")
+    dump.add_argument('db_path')
+    dump.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        count = migrate_json_to_sqlite(args.json_path, args.db_path)
+        logging.info(f"Migrated {count} key paths from {args.json_path} to {args.db_path}")
+    else:
+        store = SQLiteStateStore(args.db_path)
+        value = store.get_prefix(args.path) if args.path.endswith('*') else store.get_subtree(args.path)
+        print(json.dumps(value, indent=4))
+        store.close()
+
+
+# Example usage
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
+
+
+"""The SQLiteStateStore keeps one row per leaf of the state document, keyed by its dotted path.
+The primary key doubles as the index for exact lookups, and a prefix such as deviceStates.phSensor.*
+is answered with a range scan between 'deviceStates.phSensor.' and 'deviceStates.phSensor/'.
+set_many writes all paths in one transaction and bumps a per-path version counter.
+SQLiteStateManager exposes the StateManager methods on top of it, accepting dotted key paths as keys.
+Run `python -m state_manager.sqlite_state_store migrate data/state.json state.db` to migrate an existing file.
+Keys that themselves contain a '.' cannot be represented unambiguously."""
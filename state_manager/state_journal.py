@@ -0,0 +1,129 @@
+"""The state_journal.py module implements an append-only journal for StateManager.
+Each state update is appended as a compact delta record (sequence number, key path, value),
+so the cost of an update depends on the size of the change rather than the size of the state.
+Periodic compaction writes a full snapshot and truncates the log; recovery loads the snapshot
+and replays only the records that are newer than it."""
+
+# state_journal.py
+import json
+import logging
+import os
+
+from state_manager.persistence import atomic_write
+
+
+def set_path(state, path, value):
+    """Sets value at a key path (list of keys) inside a nested dict, creating parents as needed."""
+    node = state
+    for key in path[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            child = {}
+            node[key] = child
+        node = child
+    node[path[-1]] = value
+
+
+class StateJournal:
+    """Append-only delta log plus snapshot, with crash-safe recovery."""
+
+    def __init__(self, log_path, snapshot_path=None, compact_threshold=10000, fsync_appends=False):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path or f"{log_path}.snapshot"
+        self.compact_threshold = compact_threshold
+        self.fsync_appends = fsync_appends
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.seq = 0
+        self.versions = {}  # StateManager's per-path sync versions, recovered with the state
+        self.snapshot_seq = 0
+        self.records_since_snapshot = 0
+        self._fd = None
+
+    def recover(self):
+        """Rebuilds the state from the snapshot and the log tail. Returns the state dict."""
+        state = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as file:
+                snapshot = json.load(file)
+            state = snapshot.get('state', {})
+            self.versions = snapshot.get('versions', {})
+            self.snapshot_seq = snapshot.get('seq', 0)
+        self.seq = self.snapshot_seq
+        self.records_since_snapshot = 0
+
+        valid_length = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as log:
+                for line in log:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_length += len(line)
+                    if record['s'] <= self.snapshot_seq:
+                        continue  # already contained in the snapshot
+                    set_path(state, record['k'], record['v'])
+                    if record.get('n') is not None:
+                        self.versions['.'.join(record['k'])] = record['n']
+                    self.seq = record['s']
+                    self.records_since_snapshot += 1
+            if valid_length < os.path.getsize(self.log_path):
+                # A crash mid-append left a torn record at the tail; drop it
+                self.logger.warning(f"Discarding torn journal tail in {self.log_path}")
+                os.truncate(self.log_path, valid_length)
+
+        self._open_log()
+        self.logger.info(f"Recovered state at seq {self.seq} "
+                         f"({self.records_since_snapshot} records replayed from the log).")
+        return state
+
+    def is_empty(self):
+        """True if neither a snapshot nor any journal record exists yet."""
+        return self.seq == 0 and not os.path.exists(self.snapshot_path)
+
+    def _open_log(self):
+        if self._fd is None:
+            self._fd = os.open(self.log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def append(self, updates, versions=None):
+        """Appends one delta record per (key path, value) pair, each with its version from the
+        optional parallel versions list. Returns the last sequence number."""
+        self._open_log()
+        lines = []
+        for index, (path, value) in enumerate(updates):
+            self.seq += 1
+            record = {'s': self.seq, 'k': list(path), 'v': value}
+            if versions is not None and versions[index] is not None:
+                record['n'] = versions[index]
+            lines.append(json.dumps(record, separators=(',', ':')))
+        if not lines:
+            return self.seq
+        os.write(self._fd, ('\n'.join(lines) + '\n').encode('utf-8'))
+        if self.fsync_appends:
+            os.fsync(self._fd)
+        self.records_since_snapshot += len(lines)
+        return self.seq
+
+    def needs_compaction(self):
+        return self.records_since_snapshot >= self.compact_threshold
+
+    def compact(self, state, versions=None):
+        """Writes a snapshot of state (and its path versions) at the current sequence number and truncates the log."""
+        snapshot = {'seq': self.seq, 'state': state, 'versions': versions or {}}
+        atomic_write(self.snapshot_path, json.dumps(snapshot, separators=(',', ':')))
+        # Records up to self.seq are now in the snapshot; a crash before the truncate is
+        # harmless because recovery skips records with seq <= snapshot seq.
+        self._open_log()
+        os.ftruncate(self._fd, 0)
+        self.snapshot_seq = self.seq
+        self.records_since_snapshot = 0
+        self.logger.info(f"Journal compacted at seq {self.seq}.")
+
+    def close(self):
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
@@ -2,20 +2,87 @@
 reading and writing state information, and handling synchronization with external systems such as a database or a cloud service. """
 
 # state_manager.py
+import atexit
 import json
 import os
 import logging
-from threading import Lock
+from threading import Condition, Event, Lock, Thread
+from types import MappingProxyType
+
+from state_manager.persistence import atomic_write
+from state_manager.state_journal import StateJournal
+
+# Attribute key prefix carrying per-path versions alongside synced state values ('stateVersions.<path>')
+STATE_VERSIONS_KEY = 'stateVersions'
+_MISSING = object()
+
+
+def _assoc_path(node, keys, value):
+    """Returns a copy of node with value set at keys, copying only the dicts along the path.
+
+    Subtrees off the path are shared with the original, so an update costs O(depth) dict
+    copies and the original (possibly still being read) is never modified.
+    """
+    updated = dict(node) if isinstance(node, dict) else {}
+    if len(keys) == 1:
+        updated[keys[0]] = value
+    else:
+        updated[keys[0]] = _assoc_path(updated.get(keys[0]), keys[1:], value)
+    return updated
+
 
 class StateManager:
-    def __init__(self, file_path='state.json'):
+    def __init__(self, file_path='state.json', write_behind=False, flush_interval=10.0,
+                 journal_path=None, compact_threshold=10000):
         self.file_path = file_path
+        # Per-path versions are kept next to the state file so they survive restarts
+        self.versions_path = f"{file_path}.versions"
         self.state = {}
         self.lock = Lock()
         self.logger = logging.getLogger(self.__class__.__name__)
+
+        # Cloud sync: every changed key path gets a Lamport-style version and stays
+        # dirty until sync_with_cloud pushes it as a client attribute.
+        self.versions = {}
+        self._clock = 0
         if os.path.exists(self.file_path):
             self.load_state()
 
+        # Journaled mode: each update appends a delta record instead of rewriting the file
+        self.journal = None
+        if journal_path is not None:
+            self.journal = StateJournal(journal_path, compact_threshold=compact_threshold)
+            recovered = self.journal.recover()
+            if self.journal.is_empty():
+                # First start with a journal: seed it from the existing state file
+                self.journal.compact(self.state, self.versions)
+            else:
+                self.state = recovered
+                self._set_versions(self.journal.versions)
+
+        # Write-behind mode: mutations only mark the state dirty and a background
+        # flusher coalesces them into at most one atomic write per flush_interval.
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.write_count = 0
+        # Every mutation bumps the generation; a snapshot older than the one on disk is never written
+        self._generation = 0
+        self._written_generation = -1
+        self._dirty = False
+        self._closed = False
+        self._write_lock = Lock()
+        self._flush_condition = Condition(self.lock)
+        self._flusher = None
+        if write_behind:
+            self._flusher = Thread(target=self._flush_loop, name='StateFlusher', daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+
+        self._dirty_paths = set()
+        self.tb_client = None
+        self._sync_stop = Event()
+        self._sync_thread = None
+
     def load_state(self):
         """Loads the system state from the state file."""
         with self.lock:
@@ -26,37 +93,271 @@ class StateManager:
             except Exception as e:
                 self.logger.error(f"Failed to load system state: {e}")
                 self.state = {}
+            if os.path.exists(self.versions_path):
+                try:
+                    with open(self.versions_path, 'r') as file:
+                        self._set_versions(json.load(file))
+                except Exception as e:
+                    self.logger.error(f"Failed to load state versions: {e}")
+
+    def _set_versions(self, versions):
+        """Restores persisted path versions; the clock resumes from the highest one."""
+        self.versions = dict(versions)
+        self._clock = max(self.versions.values(), default=0)
 
     def save_state(self):
         """Saves the system state to the state file."""
         with self.lock:
+            if self.journal is not None:
+                self.journal.compact(self.state, self.versions)
+                return
+            state = self.state
+            versions = dict(self.versions)
+            generation = self._generation
+            self._dirty = False
+        # The published snapshot is immutable, so it can be serialized outside the lock
+        self._write(json.dumps(state, indent=4), versions, generation)
+
+    def _write(self, data, versions, generation):
+        """Atomically writes serialized state and its path versions; writers are serialized by _write_lock.
+
+        A snapshot serialized outside self.lock can reach this point after a newer one; it is
+        skipped if a later generation is already on disk. The versions go first: if a crash
+        separates the two writes, the restored values are never older than their versions claim,
+        so a stale remote value cannot win against them.
+        """
+        with self._write_lock:
+            if generation < self._written_generation:
+                self.logger.debug(f"Skipped writing state generation {generation}; a newer one is saved.")
+                return True
             try:
-                with open(self.file_path, 'w') as file:
-                    json.dump(self.state, file, indent=4)
-                    self.logger.info("System state saved successfully.")
+                atomic_write(self.versions_path, json.dumps(versions, separators=(',', ':')))
+                atomic_write(self.file_path, data)
+                self._written_generation = generation
+                self.write_count += 1
+                self.logger.debug("System state saved successfully.")
+                return True
             except Exception as e:
                 self.logger.error(f"Failed to save system state: {e}")
+                return False
+
+    def _state_changed(self, updates):
+        """Persists a mutation given as (key path, value) pairs. Must be called with self.lock held."""
+        self._generation += 1
+        if self.journal is not None:
+            try:
+                self.journal.append(updates, [self.versions.get('.'.join(keys)) for keys, _ in updates])
+                if self.journal.needs_compaction():
+                    self.journal.compact(self.state, self.versions)
+            except Exception as e:
+                self.logger.error(f"Failed to journal state update: {e}")
+        elif self.write_behind and not self._closed:
+            if not self._dirty:
+                self._dirty = True
+                self._flush_condition.notify()
+        else:
+            # Synchronous mode writes while holding the lock so file order matches update order
+            self._dirty = False
+            self._write(json.dumps(self.state, indent=4), self.versions, self._generation)
+
+    def flush(self):
+        """Writes pending changes now, compactly and atomically. Returns True if a write happened."""
+        with self.lock:
+            if not self._dirty:
+                return False
+            state = self.state
+            versions = dict(self.versions)
+            generation = self._generation
+            self._dirty = False
+        if not self._write(json.dumps(state, separators=(',', ':')), versions, generation):
+            with self.lock:
+                self._dirty = True
+            return False
+        return True
+
+    def _flush_loop(self):
+        while True:
+            with self._flush_condition:
+                while not self._dirty and not self._closed:
+                    self._flush_condition.wait()
+                if self._closed:
+                    return
+                # Debounce: let further updates coalesce into this write
+                self._flush_condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self):
+        """Stops the background flusher and forces a final flush of pending changes."""
+        self.stop_cloud_sync()
+        with self._flush_condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._flush_condition.notify_all()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+            atexit.unregister(self.close)
+        self.flush()
+        if self.journal is not None:
+            self.journal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def snapshot(self):
+        """Returns a consistent, read-only view of the whole state without taking the lock.
+
+        Writers never modify a published state; they build the next version (sharing unchanged
+        subtrees) and swap the self.state reference. Nested values must be treated as read-only.
+        """
+        return MappingProxyType(self.state)
 
     def get_value(self, key, default=None):
         """Retrieves a value from the system state."""
         return self.state.get(key, default)
 
+    def get_values(self, *keys):
+        """Retrieves several top-level values from one snapshot, so they are mutually consistent."""
+        state = self.state
+        return tuple(state.get(key) for key in keys)
+
+    def get_path(self, path, default=None):
+        """Retrieves a nested value by dotted key path, e.g. 'deviceStates.phSensor.isEnabled'."""
+        node = self.state
+        for key in path.split('.'):
+            if not isinstance(node, dict) or key not in node:
+                return default
+            node = node[key]
+        return node
+
     def set_value(self, key, value):
         """Sets a value in the system state and saves the state."""
         with self.lock:
-            self.state[key] = value
-            self.save_state()
+            self.state = {**self.state, key: value}
+            self._mark_dirty([key])
+            self._state_changed([((key,), value)])
+
+    def set_path(self, path, value):
+        """Sets a nested value by dotted key path; only that path is synced to the cloud."""
+        keys = tuple(path.split('.'))
+        with self.lock:
+            self.state = _assoc_path(self.state, keys, value)
+            self._mark_dirty([path])
+            self._state_changed([(keys, value)])
 
     def update_state(self, updates):
         """Updates multiple state values and saves the state."""
         with self.lock:
-            self.state.update(updates)
-            self.save_state()
+            self.state = {**self.state, **updates}
+            self._mark_dirty(updates.keys())
+            self._state_changed([((key,), value) for key, value in updates.items()])
+
+    def _mark_dirty(self, paths):
+        """Bumps the version of each changed path. Must be called with self.lock held."""
+        for path in paths:
+            self._clock += 1
+            self.versions[path] = self._clock
+            self._dirty_paths.add(path)
+
+    def dirty_paths(self):
+        with self.lock:
+            return set(self._dirty_paths)
+
+    def sync_with_cloud(self, tb_client=None):
+        """Pushes the key paths changed since the last sync to ThingsBoard as client attributes.
+
+        All changes made since the previous call are coalesced into one message holding the
+        latest value of each dirty path. Returns the number of paths sent.
+        """
+        tb_client = tb_client or self.tb_client
+        if tb_client is None:
+            return 0
+        with self.lock:
+            if not self._dirty_paths:
+                return 0
+            paths = self._dirty_paths
+            self._dirty_paths = set()
+            attributes = {path: self.get_path(path) for path in paths}
+            # One key per path, so the server keeps every path's version, not only the last batch's
+            attributes.update((f'{STATE_VERSIONS_KEY}.{path}', self.versions[path]) for path in paths)
+        try:
+            info = tb_client.publish_attributes(attributes)
+            if info is not None and info.rc != 0:
+                raise ConnectionError(f"publish returned rc={info.rc}")
+        except Exception as e:
+            self.logger.error(f"State sync failed, will retry: {e}")
+            with self.lock:
+                self._dirty_paths |= paths
+            return 0
+        self.logger.debug(f"Synced {len(paths)} state paths to the cloud.")
+        return len(paths)
+
+    def apply_remote_attributes(self, attributes):
+        """Applies shared attribute changes from ThingsBoard with last-writer-wins on version.
+
+        Attributes are {dotted.path: value} with versions as 'stateVersions.<path>' keys (or a
+        STATE_VERSIONS_KEY map). A remote value without a version counts as version 0: it is older
+        than any local write, including state restored from disk, so it only fills in paths the
+        device has no value for or that were themselves set by unversioned remote values.
+        Returns the applied paths.
+        """
+        attributes = dict(attributes)
+        remote_versions = dict(attributes.pop(STATE_VERSIONS_KEY, None) or {})
+        prefix = STATE_VERSIONS_KEY + '.'
+        for key in [key for key in attributes if key.startswith(prefix)]:
+            remote_versions[key[len(prefix):]] = attributes.pop(key)
+        applied = []
+        with self.lock:
+            state = self.state
+            for path, value in attributes.items():
+                local_version = self.versions.get(path)
+                if path in remote_versions:
+                    remote_version = remote_versions[path]
+                    if remote_version <= (local_version or 0):
+                        continue  # the local write is newer
+                else:
+                    remote_version = 0
+                    if local_version or local_version is None and self.get_path(path, _MISSING) is not _MISSING:
+                        continue  # a local write or restored value beats an unversioned remote one
+                keys = tuple(path.split('.'))
+                state = _assoc_path(state, keys, value)
+                self.versions[path] = remote_version
+                self._clock = max(self._clock, remote_version)
+                self._dirty_paths.discard(path)
+                applied.append((keys, value))
+            if applied:
+                self.state = state  # all remote changes become visible at once
+                self._state_changed(applied)
+        if applied:
+            self.logger.info(f"Applied {len(applied)} remote state changes.")
+        return ['.'.join(keys) for keys, _ in applied]
+
+    def start_cloud_sync(self, tb_client, interval=5.0):
+        """Syncs dirty paths once per interval and applies remote shared-attribute changes."""
+        self.tb_client = tb_client
+        tb_client.add_attribute_listener(self.apply_remote_attributes)
+        tb_client.request_shared_attributes()
+        self._sync_stop.clear()
+        self._sync_thread = Thread(target=self._sync_loop, args=(interval,), name='StateCloudSync', daemon=True)
+        self._sync_thread.start()
 
-    def sync_with_cloud(self):
-        """Synchronizes the local state with the cloud or database."""
-        # Placeholder for cloud or database synchronization logic
-        pass
+    def _sync_loop(self, interval):
+        while not self._sync_stop.wait(interval):
+            self.sync_with_cloud()
+
+    def stop_cloud_sync(self):
+        """Stops the sync thread after a final sync of pending changes."""
+        if self._sync_thread is None:
+            return
+        self._sync_stop.set()
+        self._sync_thread.join(timeout=5)
+        self._sync_thread = None
+        self.sync_with_cloud()
 
 # Example usage
 if __name__ == '__main__':
@@ -80,10 +381,24 @@ if __name__ == '__main__':
     # Synchronize state with the cloud
     state_manager.sync_with_cloud()
 
+    # High-rate updates in write-behind mode are coalesced into a few writes per minute
+    with StateManager('state.json', write_behind=True, flush_interval=10.0) as buffered_state:
+        for i in range(1000):
+            buffered_state.set_value('sample_count', i)
+
 
 """This StateManager class provides methods to load and save the system state as a JSON file. 
 It uses a Lock from the threading module to ensure that read and write operations are thread-safe. 
+Every write goes to a temporary file that is fsynced and renamed over the state file, so a crash never leaves a truncated state.json. 
+With write_behind=True, mutations only mark the state dirty and a background flusher writes it compactly at most once per flush_interval; 
+close() (also registered with atexit) forces the final flush on shutdown.
+With journal_path set, updates are instead appended to a StateJournal as delta records and compacted into a snapshot every compact_threshold records.
 The get_value and set_value methods are used to access and modify individual state variables. 
 The update_state method allows for multiple state variables to be updated at once.
-The sync_with_cloud method is a placeholder where you would add the actual synchronization logic, 
-depending on whether you're using a cloud service API or a database connection."""
+The sync_with_cloud method pushes only the key paths changed since the last sync, coalesced into one client attribute message, 
+and apply_remote_attributes applies shared attribute changes from ThingsBoard using last-writer-wins on per-path versions. 
+The versions are persisted with the state (state.json.versions, or the journal records and snapshot), so after a restart
+a stale remote value cannot beat newer restored local state.
+start_cloud_sync runs both on a fixed interval against a ThingsBoardClient.
+The state dict is copy-on-write: writers build a new version that shares unchanged subtrees and swap the reference, 
+so get_value, get_values, get_path and snapshot read a consistent state without locking."""
@@ -0,0 +1,5 @@
+"""Durable storage for sensor readings."""
+
+from .postgres_sink import PostgresSink
+from .segment_archive import SegmentArchive
+from .rollups import RollupEngine
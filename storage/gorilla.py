@@ -0,0 +1,250 @@
+# gorilla.py
+
+"""The gorilla.py module is a Gorilla-style codec for slow-moving sensor series on the local history store.
+Timestamps are stored as delta-of-deltas and values as the XOR of each float with its predecessor, as in
+Facebook's Gorilla, but bits are laid out per block rather than per sample: each block stores its
+zigzagged delta-of-deltas at one common bit width, a bitmap of unchanged values, and the changed XORs
+shifted by their common trailing zeros at one common width. Regular timestamps and repeated values then
+cost almost nothing, and a block decodes with a few NumPy operations (unpackbits, cumsum,
+bitwise_xor.accumulate) instead of a per-bit Python loop. Blocks are framed with length and CRC32, so
+each one can be located, verified and decoded independently.
+
+The codec is a building block and nothing writes it yet: SegmentArchive keeps fixed-width mapped columns so
+queries can return zero-copy views and bisect the time index, and RollupEngine's tiers are stored the same
+way. Frames carry a single series and no quality flags, so a consumer (for example an export of segments
+before drop_before() deletes them) splits records by channel and stores quality itself.
+
+Usage:
+    python -m storage.gorilla benchmark [--input readings.csv] [--block-size 1024]
+"""
+
+import argparse
+import io
+import json
+import logging
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+FRAME_MAGIC = b'GB'
+# magic, payload length, crc32, count, first timestamp, first delta, first value bits,
+# timestamp width, value shift, value width
+FRAME_HEADER = struct.Struct('<2sIIIqqQBBB')
+DEFAULT_BLOCK_SIZE = 1024
+DEFAULT_RESOLUTION = 1000  # timestamp ticks per second (milliseconds)
+
+
+def _zigzag(values):
+    return ((values << np.int64(1)) ^ (values >> np.int64(63))).view(np.uint64)
+
+
+def _unzigzag(values):
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def _pack(values, width):
+    """Packs unsigned integers at a fixed bit width (MSB first) into bytes."""
+    if width == 0 or len(values) == 0:
+        return b''
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+    bits = ((values[:, None] >> shifts) & np.uint64(1)).astype(np.uint8)
+    return np.packbits(bits).tobytes()
+
+
+def _unpack(data, count, width):
+    if width == 0 or count == 0:
+        return np.zeros(count, dtype=np.uint64)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=count * width).reshape(count, width)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+    return np.bitwise_or.reduce(bits.astype(np.uint64) << shifts, axis=1)
+
+
+def encode_block(timestamps, values, resolution=DEFAULT_RESOLUTION):
+    """Encodes one block of (timestamp seconds, float value) samples into a self-contained frame."""
+    ticks = np.round(np.asarray(timestamps, dtype=np.float64) * resolution).astype(np.int64)
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    count = len(ticks)
+    if count == 0 or count != len(bits):
+        raise ValueError("A block needs the same, non-zero number of timestamps and values")
+
+    deltas = np.diff(ticks)
+    first_delta = int(deltas[0]) if count > 1 else 0
+    zigzagged = _zigzag(np.diff(deltas)) if count > 2 else np.zeros(0, np.uint64)
+    timestamp_width = int(zigzagged.max()).bit_length() if len(zigzagged) else 0
+
+    xors = bits[1:] ^ bits[:-1]
+    changed = xors != 0
+    significant = xors[changed]
+    shift = width = 0
+    if len(significant):
+        combined = int(np.bitwise_or.reduce(significant))
+        shift = (combined & -combined).bit_length() - 1  # common trailing zeros
+        significant = significant >> np.uint64(shift)
+        width = int(significant.max()).bit_length()
+
+    payload = b''.join((_pack(zigzagged, timestamp_width), np.packbits(changed).tobytes(), _pack(significant, width)))
+    header = FRAME_HEADER.pack(FRAME_MAGIC, len(payload), zlib.crc32(payload), count, int(ticks[0]), first_delta,
+                               int(bits[0]), timestamp_width, shift, width)
+    return header + payload
+
+
+def decode_block(frame, offset=0, resolution=DEFAULT_RESOLUTION):
+    """Decodes the frame at offset. Returns (timestamps, values, offset of the next frame)."""
+    (magic, length, crc, count, first_tick, first_delta, first_bits,
+     timestamp_width, shift, width) = FRAME_HEADER.unpack_from(frame, offset)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"No block frame at offset {offset}")
+    start = offset + FRAME_HEADER.size
+    payload = memoryview(frame)[start:start + length]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError(f"Corrupt block frame at offset {offset}")
+
+    dod_count = max(count - 2, 0)
+    dod_bytes = (dod_count * timestamp_width + 7) // 8
+    bitmap_bytes = (max(count - 1, 0) + 7) // 8
+    dods = _unzigzag(_unpack(payload[:dod_bytes], dod_count, timestamp_width))
+    changed = np.unpackbits(np.frombuffer(payload[dod_bytes:dod_bytes + bitmap_bytes], dtype=np.uint8),
+                            count=max(count - 1, 0)).astype(bool)
+    significant = _unpack(payload[dod_bytes + bitmap_bytes:], int(changed.sum()), width)
+
+    ticks = np.empty(count, dtype=np.int64)
+    ticks[0] = first_tick
+    if count > 1:
+        deltas = np.empty(count - 1, dtype=np.int64)
+        deltas[0] = first_delta
+        np.cumsum(dods, out=deltas[1:])
+        deltas[1:] += first_delta
+        ticks[1:] = first_tick + np.cumsum(deltas)
+
+    xors = np.zeros(count, dtype=np.uint64)
+    xors[0] = first_bits
+    xors[1:][changed] = significant << np.uint64(shift)
+    values = np.bitwise_xor.accumulate(xors).view(np.float64)
+    return ticks / resolution, values, start + length
+
+
+def iter_blocks(data, resolution=DEFAULT_RESOLUTION):
+    """Yields (timestamps, values) for each frame in a buffer of concatenated frames."""
+    offset = 0
+    while offset < len(data):
+        timestamps, values, offset = decode_block(data, offset, resolution)
+        yield timestamps, values
+
+
+def decode_all(data, resolution=DEFAULT_RESOLUTION):
+    blocks = list(iter_blocks(data, resolution))
+    if not blocks:
+        return np.empty(0), np.empty(0)
+    return np.concatenate([b[0] for b in blocks]), np.concatenate([b[1] for b in blocks])
+
+
+class GorillaEncoder:
+    """Streaming encoder: append samples one at a time or in blocks; full blocks are written as frames."""
+
+    def __init__(self, stream, block_size=DEFAULT_BLOCK_SIZE, resolution=DEFAULT_RESOLUTION):
+        self.stream = stream
+        self.block_size = block_size
+        self.resolution = resolution
+        self.bytes_written = 0
+        self.samples_written = 0
+        self._timestamps = np.empty(block_size, dtype=np.float64)
+        self._values = np.empty(block_size, dtype=np.float64)
+        self._pending = 0
+
+    def append(self, timestamp, value):
+        self._timestamps[self._pending] = timestamp
+        self._values[self._pending] = value
+        self._pending += 1
+        if self._pending == self.block_size:
+            self.flush()
+
+    def extend(self, timestamps, values):
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        position = 0
+        while position < len(timestamps):
+            n = min(self.block_size - self._pending, len(timestamps) - position)
+            self._timestamps[self._pending:self._pending + n] = timestamps[position:position + n]
+            self._values[self._pending:self._pending + n] = values[position:position + n]
+            self._pending += n
+            position += n
+            if self._pending == self.block_size:
+                self.flush()
+
+    def flush(self):
+        """Writes the pending samples as a (possibly short) block."""
+        if not self._pending:
+            return
+        frame = encode_block(self._timestamps[:self._pending], self._values[:self._pending], self.resolution)
+        self.stream.write(frame)
+        self.bytes_written += len(frame)
+        self.samples_written += self._pending
+        self._pending = 0
+
+
+def synthetic_plant_series(count=1_000_000, interval=5.0, seed=1):
+    """A level-like series: slow drift, sensor quantization to 0.01 and long runs of repeated readings."""
+    rng = np.random.default_rng(seed)
+    timestamps = 1_700_000_000 + np.arange(count) * interval
+    drift = np.cumsum(rng.normal(0, 0.002, count))
+    values = np.round(2.5 + 0.3 * np.sin(np.arange(count) / 5000) + drift, 2)
+    return timestamps, values
+
+
+def benchmark(timestamps, values, block_size=DEFAULT_BLOCK_SIZE, resolution=DEFAULT_RESOLUTION):
+    raw_bytes = len(timestamps) * 16
+    stream = io.BytesIO()
+    started = time.perf_counter()
+    encoder = GorillaEncoder(stream, block_size, resolution)
+    encoder.extend(timestamps, values)
+    encoder.flush()
+    encode_seconds = time.perf_counter() - started
+    data = stream.getvalue()
+    started = time.perf_counter()
+    decoded_timestamps, decoded_values = decode_all(data, resolution)
+    decode_seconds = time.perf_counter() - started
+    lossless = (np.array_equal(decoded_values.view(np.uint64), np.asarray(values, dtype=np.float64).view(np.uint64))
+                and np.allclose(decoded_timestamps, timestamps, rtol=0, atol=0.5 / resolution))
+    return {
+        'samples': len(timestamps),
+        'raw_bytes': raw_bytes,
+        'compressed_bytes': len(data),
+        'compression_ratio': raw_bytes / len(data),
+        'bits_per_sample': len(data) * 8 / len(timestamps),
+        'encode_samples_per_second': len(timestamps) / encode_seconds,
+        'decode_samples_per_second': len(timestamps) / decode_seconds,
+        'lossless': bool(lossless),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gorilla-style codec benchmark.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench = commands.add_parser('benchmark', help="Measure compression ratio and throughput")
+    bench.add_argument('--input', help="CSV with timestamp,value columns (default: synthetic plant series)")
+    bench.add_argument('--samples', type=int, default=1_000_000, help="Synthetic series length")
+    bench.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    bench.add_argument('--resolution', type=int, default=DEFAULT_RESOLUTION, help="Timestamp ticks per second")
+    bench.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        data = np.loadtxt(args.input, delimiter=',', ndmin=2)
+        timestamps, values = data[:, 0], data[:, 1]
+    else:
+        timestamps, values = synthetic_plant_series(args.samples)
+    report = benchmark(timestamps, values, args.block_size, args.resolution)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>28}: {value:,.2f}" if isinstance(value, float) else f"{key:>28}: {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# postgres_sink.py
+
+"""The postgres_sink.py module streams sensor readings into the plant's PostgreSQL database.
+Acquisition code submits batches of rows; a small pool of writer threads sends each batch with one
+COPY FROM STDIN (CSV or binary) into a readings table range-partitioned by month. Every batch carries an
+id that is recorded in ingest_batches in the same transaction, so a batch retried after an ambiguous
+failure (e.g. a connection dropped during commit) is never stored twice. Batches wait in a bounded
+in-memory buffer; when the database is unreachable for long, the oldest batches are dropped and counted."""
+
+import csv
+import io
+import logging
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:  # only needed once a real connection pool is created
+    psycopg2 = None
+    ThreadedConnectionPool = None
+
+READING_COLUMNS = ('time', 'device', 'channel', 'value', 'quality')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    time timestamptz NOT NULL,
+    device text NOT NULL,
+    channel text NOT NULL,
+    value double precision,
+    quality smallint NOT NULL DEFAULT 0
+) PARTITION BY RANGE (time);
+CREATE INDEX IF NOT EXISTS readings_device_channel_time ON readings (device, channel, time);
+CREATE TABLE IF NOT EXISTS ingest_batches (
+    batch_id text PRIMARY KEY,
+    row_count integer NOT NULL,
+    ingested_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc).timestamp()
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+_FIELD_COUNT = struct.Struct('!h')
+_INT8_FIELD = struct.Struct('!iq')
+_FLOAT8_FIELD = struct.Struct('!id')
+_INT2_FIELD = struct.Struct('!ih')
+_NULL_FIELD = struct.pack('!i', -1)
+
+
+def encode_csv(rows):
+    """Encodes (epoch seconds, device, channel, value, quality) rows as COPY CSV."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for timestamp, device, channel, value, quality in rows:
+        moment = datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+        writer.writerow((moment, device, channel, '' if value is None else repr(float(value)), quality))
+    buffer.seek(0)
+    return buffer
+
+
+def encode_binary(rows):
+    """Encodes rows in PostgreSQL's binary COPY format (no text formatting or parsing of numbers)."""
+    parts = [COPY_SIGNATURE, struct.pack('!ii', 0, 0)]
+    field_count = _FIELD_COUNT.pack(len(READING_COLUMNS))
+    for timestamp, device, channel, value, quality in rows:
+        device_bytes = str(device).encode('utf-8')
+        channel_bytes = str(channel).encode('utf-8')
+        parts.append(field_count)
+        parts.append(_INT8_FIELD.pack(8, round((timestamp - PG_EPOCH) * 1_000_000)))
+        parts.append(struct.pack('!i', len(device_bytes)) + device_bytes)
+        parts.append(struct.pack('!i', len(channel_bytes)) + channel_bytes)
+        parts.append(_NULL_FIELD if value is None else _FLOAT8_FIELD.pack(8, value))
+        parts.append(_INT2_FIELD.pack(2, quality))
+    parts.append(struct.pack('!h', -1))
+    return io.BytesIO(b''.join(parts))
+
+
+def month_start(timestamp):
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def partition_ddl(month):
+    """DDL for the monthly partition starting at month (a UTC datetime on the 1st)."""
+    following = datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+    name = f"readings_{month:%Y_%m}"
+    return name, (f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF readings "
+                  f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')")
+
+
+class PostgresSink:
+    def __init__(self, database=None, pool=None, pool_size=2, copy_format='csv', max_buffered_rows=500000,
+                 max_retries=5, retry_interval=1.0):
+        """database: DatabaseSettings (config.compiled_config) or a dict with host/port/name/user/password.
+        pool: an existing psycopg2-style connection pool; created from database if omitted."""
+        if copy_format not in ('csv', 'binary'):
+            raise ValueError("copy_format must be 'csv' or 'binary'")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.pool_size = pool_size
+        self.pool = pool if pool is not None else self._create_pool(database)
+        self.copy_format = copy_format
+        self.max_buffered_rows = max_buffered_rows
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+
+        self.buffer = deque()
+        self.buffered_rows = 0
+        self.rows_written = 0
+        self.batches_written = 0
+        self.duplicate_batches = 0
+        self.dropped_rows = 0
+        self.retries = 0
+        self._in_flight = 0
+        self._partitions = set()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._stopping = threading.Event()  # interrupts retry backoff on close
+        self._workers = []
+        self._schema_ready = False
+
+    def _create_pool(self, database):
+        if ThreadedConnectionPool is None:
+            raise RuntimeError("psycopg2 is required for PostgresSink")
+        settings = database if isinstance(database, dict) else {
+            'host': database.host, 'port': database.port, 'name': database.name,
+            'user': database.user, 'password': database.password}
+        return ThreadedConnectionPool(1, self.pool_size, host=settings['host'], port=settings['port'],
+                                      dbname=settings['name'], user=settings['user'], password=settings['password'])
+
+    # Producer side
+
+    def submit(self, rows, batch_id=None):
+        """Queues a batch of (epoch seconds, device, channel, value, quality) rows. Returns its batch id."""
+        rows = list(rows)
+        batch_id = batch_id or uuid.uuid4().hex
+        if not rows:
+            return batch_id
+        with self._condition:
+            self.buffer.append((batch_id, rows))
+            self.buffered_rows += len(rows)
+            while self.buffered_rows > self.max_buffered_rows and len(self.buffer) > 1:
+                _, dropped = self.buffer.popleft()
+                self.buffered_rows -= len(dropped)
+                self.dropped_rows += len(dropped)
+                self.logger.warning(f"Buffer full, dropped a batch of {len(dropped)} rows.")
+            self._condition.notify()
+        return batch_id
+
+    # Writer side
+
+    def start(self):
+        """Starts one writer thread per pooled connection."""
+        for index in range(self.pool_size):
+            worker = threading.Thread(target=self._worker_loop, name=f'PostgresSink-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                while not self.buffer and not self._closed:
+                    self._condition.wait()
+                if not self.buffer:
+                    return
+                batch_id, rows = self.buffer.popleft()
+                self.buffered_rows -= len(rows)
+                self._in_flight += 1
+            try:
+                written = self._write_with_retries(batch_id, rows)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    if not written and not self._closed:
+                        # Keep the batch; its id makes the later retry safe
+                        self.buffer.appendleft((batch_id, rows))
+                        self.buffered_rows += len(rows)
+                    elif not written:
+                        self.dropped_rows += len(rows)
+                        self.logger.error(f"Sink closed, batch {batch_id} of {len(rows)} rows was not written.")
+                    self._condition.notify_all()
+            if not written:
+                self._stopping.wait(self.retry_interval)
+
+    def _write_with_retries(self, batch_id, rows):
+        for attempt in range(self.max_retries):
+            try:
+                self.write_batch(batch_id, rows)
+                return True
+            except Exception as e:
+                self.retries += 1
+                self.logger.error(f"Error writing batch {batch_id}, attempt {attempt + 1}: {e}")
+                if self._stopping.wait(self.retry_interval * (2 ** attempt)):
+                    break  # closing: give up instead of retrying against a pool about to be closed
+        return False
+
+    def write_batch(self, batch_id, rows):
+        """Writes one batch in a single transaction. Returns False if the batch id was already ingested."""
+        connection = self.pool.getconn()
+        broken = False
+        try:
+            with connection.cursor() as cursor:
+                if not self._schema_ready:
+                    cursor.execute(SCHEMA)
+                    self._schema_ready = True
+                for month in {month_start(row[0]) for row in rows} - self._partitions:
+                    cursor.execute(partition_ddl(month)[1])
+                cursor.execute("INSERT INTO ingest_batches (batch_id, row_count) VALUES (%s, %s) "
+                               "ON CONFLICT (batch_id) DO NOTHING", (batch_id, len(rows)))
+                if cursor.rowcount == 0:
+                    connection.rollback()
+                    self.duplicate_batches += 1
+                    self.logger.info(f"Batch {batch_id} was already ingested, skipping.")
+                    return False
+                columns = ', '.join(READING_COLUMNS)
+                if self.copy_format == 'binary':
+                    cursor.copy_expert(f"COPY readings ({columns}) FROM STDIN WITH (FORMAT binary)", encode_binary(rows))
+                else:
+                    cursor.copy_expert(f"COPY readings ({columns}) FROM STDIN WITH (FORMAT csv)", encode_csv(rows))
+            connection.commit()
+            self._partitions.update(month_start(row[0]) for row in rows)
+            self.rows_written += len(rows)
+            self.batches_written += 1
+            return True
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+            self._schema_ready = False
+            raise
+        finally:
+            self.pool.putconn(connection, close=broken)
+
+    def flush(self, timeout=30.0):
+        """Waits until every buffered batch is written. Returns True if the buffer drained in time."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.buffer or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout=30.0):
+        """Drains the buffer (up to timeout seconds), stops the writers, interrupting any retry backoff,
+        waits for them to exit and then closes the pool."""
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._stopping.set()
+        # No writer may still hold or request a connection once the pool is closed
+        for worker in self._workers:
+            worker.join()
+        self.pool.closeall()
+
+    def stats(self):
+        return {'rows_written': self.rows_written, 'batches_written': self.batches_written,
+                'buffered_rows': self.buffered_rows, 'dropped_rows': self.dropped_rows,
+                'duplicate_batches': self.duplicate_batches, 'retries': self.retries}
+
+
+# Example usage
+if __name__ == '__main__':
+    from config import compile_config
+    logging.basicConfig(level=logging.INFO)
+    sink = PostgresSink(compile_config().database, copy_format='binary')
+    sink.start()
+    now = time.time()
+    sink.submit([(now + i, 'radar1', 'distance', 100.0 + i % 7, 0) for i in range(10000)])
+    sink.close()
+    logging.info(f"Sink stats: {sink.stats()}")
+
+"""Rows are (epoch seconds, device, channel, value, quality); one submit() call is one batch and one COPY.
+Monthly partitions of readings are created on demand the first time a batch touches that month.
+A batch that still fails after max_retries is put back at the head of the buffer and retried later,
+which is safe because its id is committed to ingest_batches in the same transaction as its rows."""
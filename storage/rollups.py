@@ -0,0 +1,307 @@
+# rollups.py
+
+"""The rollups.py module keeps 1-minute and 1-hour min/max/mean/count rollups of the local history.
+Raw readings go to a SegmentArchive; every appended block is aggregated with NumPy (sort + reduceat) into
+per-channel buckets, merged into the open bucket of each channel, and buckets are closed once the data
+watermark has passed their end. Closed minute buckets are written to the minute tier and feed the hour
+tier, so each sample is aggregated once. Each tier is its own SegmentArchive with its own retention,
+enforced by a background compaction thread that drops whole expired segments. Queries pick the coarsest
+tier whose bucket width still satisfies the requested resolution, or the finest one whose point count
+fits max_points (merging buckets if even hourly ones are too many), so a year-long trend reads thousands
+of hourly points instead of millions of raw samples."""
+
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+
+from storage.segment_archive import SegmentArchive
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+DEFAULT_RETENTION = {'raw': 7 * DAY, 'minute': 90 * DAY, 'hour': 5 * 365 * DAY}
+
+# Rollup archives store each bucket as four records with channel id 4 * channel + statistic
+STAT_MIN, STAT_MAX, STAT_MEAN, STAT_COUNT = range(4)
+STATS = 4
+
+
+def aggregate(width, timestamps, channels, minimums, maximums, sums, counts):
+    """Groups (already partial) aggregates into width-second buckets per channel.
+    Returns (starts, channels, minimums, maximums, sums, counts) sorted by bucket start, then channel."""
+    starts = np.floor(timestamps / width) * width
+    order = np.lexsort((channels, starts))
+    starts, channels = starts[order], channels[order]
+    boundaries = np.flatnonzero(np.r_[True, (np.diff(starts) != 0) | (np.diff(channels) != 0)])
+    return (starts[boundaries], channels[boundaries],
+            np.minimum.reduceat(minimums[order], boundaries), np.maximum.reduceat(maximums[order], boundaries),
+            np.add.reduceat(sums[order], boundaries), np.add.reduceat(counts[order], boundaries))
+
+
+def downsample(result, max_points):
+    """Merges runs of adjacent buckets so at most max_points remain (count-weighted mean)."""
+    n = len(result['timestamps'])
+    if n <= max_points:
+        return result
+    starts = np.arange(0, n, -(-n // max_points))
+    counts = result['count']
+    merged_counts = np.add.reduceat(counts, starts)
+    return dict(result, timestamps=result['timestamps'][starts],
+                min=np.minimum.reduceat(result['min'], starts), max=np.maximum.reduceat(result['max'], starts),
+                mean=np.add.reduceat(result['mean'] * counts, starts) / merged_counts, count=merged_counts)
+
+
+class RollupTier:
+    def __init__(self, name, width, archive, retention):
+        self.name = name
+        self.width = width
+        self.archive = archive
+        self.retention = retention
+        self.source = None  # the finer tier feeding this one
+        self.open = {}  # channel -> [start, min, max, sum, count]
+
+    def add(self, batch, watermark):
+        """Merges an aggregate batch and closes buckets that ended at or before watermark.
+        Returns the closed buckets in the same batch layout, for the next tier."""
+        closed = []
+        if batch is not None and len(batch[0]):
+            for start, channel, minimum, maximum, total, count in zip(*aggregate(self.width, *batch)):
+                channel = int(channel)
+                bucket = self.open.get(channel)
+                if bucket is not None and bucket[0] == start:
+                    bucket[1] = min(bucket[1], minimum)
+                    bucket[2] = max(bucket[2], maximum)
+                    bucket[3] += total
+                    bucket[4] += count
+                    continue
+                if bucket is not None:
+                    closed.append((bucket[0], channel, *bucket[1:]))
+                self.open[channel] = [start, minimum, maximum, total, count]
+        for channel, bucket in list(self.open.items()):
+            if bucket[0] + self.width <= watermark:
+                closed.append((bucket[0], channel, *bucket[1:]))
+                del self.open[channel]
+        if not closed:
+            return None
+        closed.sort(key=lambda bucket: (bucket[0], bucket[1]))
+        columns = [np.array(column, dtype=np.float64) for column in zip(*closed)]
+        self._write(*columns)
+        return columns[0] + self.width / 2, columns[1], columns[2], columns[3], columns[4], columns[5]
+
+    def _write(self, starts, channels, minimums, maximums, sums, counts):
+        n = len(starts)
+        timestamps = np.repeat(starts, STATS)
+        ids = (np.repeat(channels.astype(np.uint32), STATS) * STATS + np.tile(np.arange(STATS, dtype=np.uint32), n))
+        values = np.column_stack([minimums, maximums, sums / counts, counts]).ravel()
+        self.archive.append_many(timestamps, ids, values)
+
+    def read(self, channel, start_time=None, end_time=None):
+        """Returns {'timestamps', 'min', 'max', 'mean', 'count'} for closed and open buckets of a channel."""
+        records = self.archive.query(start_time, end_time)
+        mine = (records['channels'] // STATS) == channel
+        stats = records['channels'][mine] % STATS
+        values = records['values'][mine]
+        result = {'timestamps': records['timestamps'][mine][stats == STAT_MIN]}
+        for key, stat in (('min', STAT_MIN), ('max', STAT_MAX), ('mean', STAT_MEAN), ('count', STAT_COUNT)):
+            result[key] = values[stats == stat]
+        bucket = self.open_bucket(channel)
+        if bucket is not None and (start_time is None or bucket[0] >= start_time) and \
+                (end_time is None or bucket[0] <= end_time):
+            for key, value in zip(('timestamps', 'min', 'max', 'mean', 'count'),
+                                  (bucket[0], bucket[1], bucket[2], bucket[3] / bucket[4], bucket[4])):
+                result[key] = np.append(result[key], value)
+        return result
+
+    def open_bucket(self, channel):
+        """The channel's open bucket including the still open buckets of finer tiers."""
+        bucket = self.open.get(channel)
+        partial = self.source.open_bucket(channel) if self.source is not None else None
+        if partial is None:
+            return bucket
+        start = math.floor(partial[0] / self.width) * self.width
+        if bucket is None:
+            return [start] + partial[1:]
+        if bucket[0] != start:
+            return bucket
+        return [start, min(bucket[1], partial[1]), max(bucket[2], partial[2]), bucket[3] + partial[3],
+                bucket[4] + partial[4]]
+
+    def batch_from_archive(self, start_time):
+        """Reads closed buckets back as an aggregate batch (for recovering the next tier)."""
+        records = self.archive.query(start_time)
+        stats = records['channels'] % STATS
+        first = stats == STAT_MIN
+        counts = records['values'][stats == STAT_COUNT]
+        return (records['timestamps'][first] + self.width / 2, (records['channels'][first] // STATS).astype(float),
+                records['values'][first], records['values'][stats == STAT_MAX],
+                records['values'][stats == STAT_MEAN] * counts, counts)
+
+
+class RollupEngine:
+    def __init__(self, directory, retention=None, segment_capacity=1 << 20, index_stride=1024):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self.raw = SegmentArchive(os.path.join(directory, 'raw'), segment_capacity, index_stride)
+        self.tiers = [
+            RollupTier('minute', MINUTE, SegmentArchive(os.path.join(directory, 'minute'), segment_capacity,
+                                                        index_stride), self.retention['minute']),
+            RollupTier('hour', HOUR, SegmentArchive(os.path.join(directory, 'hour'), segment_capacity,
+                                                    index_stride), self.retention['hour']),
+        ]
+        self.tiers[1].source = self.tiers[0]
+        self.watermark = self.raw.last_timestamp()
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._compactor = None
+        self._recover()
+
+    def _recover(self):
+        """Rebuilds the open buckets lost at shutdown from the tier below."""
+        if self.watermark == -math.inf:
+            return
+        minute, hour = self.tiers
+        hour_start = hour.archive.last_timestamp() + HOUR
+        hour.add(minute.batch_from_archive(hour_start if hour_start > -math.inf else None), self.watermark)
+        minute_start = minute.archive.last_timestamp() + MINUTE
+        raw = self.raw.query(minute_start if minute_start > -math.inf else None)
+        values = raw['values']
+        closed = minute.add((raw['timestamps'], raw['channels'].astype(float), values, values, values,
+                             np.ones(len(values))), self.watermark)
+        hour.add(closed, self.watermark)
+        self.logger.info(f"Rollups recovered up to {self.watermark}.")
+
+    def channel_id(self, device, channel):
+        return self.raw.channel_id(device, channel)
+
+    def append_many(self, timestamps, channel_ids, values, quality=None):
+        """Stores raw readings and updates the rollups incrementally."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        channels = np.asarray(channel_ids, dtype=np.float64)
+        with self._lock:
+            written = self.raw.append_many(timestamps, channel_ids, values, quality)
+            if written:
+                self.watermark = max(self.watermark, float(timestamps.max()))
+                batch = (timestamps, channels, values, values, values, np.ones(len(values)))
+                for tier in self.tiers:
+                    batch = tier.add(batch, self.watermark)
+            return written
+
+    def append(self, timestamp, channel_id, value, quality=0):
+        return self.append_many([timestamp], [channel_id], [value], [quality])
+
+    def oldest_timestamp(self):
+        """Oldest retained timestamp in any tier (the hour tier outlives raw data)."""
+        oldest = math.inf
+        for archive in [self.raw] + [tier.archive for tier in self.tiers]:
+            for _, segment in archive.segments:
+                count, min_time, _ = segment.header()
+                if count:
+                    oldest = min(oldest, min_time)
+                    break
+        return oldest if oldest < math.inf else 0.0
+
+    def select_tier(self, resolution):
+        """The coarsest tier whose bucket width is at most resolution seconds; None means raw."""
+        chosen = None
+        for tier in self.tiers:
+            if tier.width <= resolution:
+                chosen = tier
+        return chosen
+
+    def tier_for_points(self, start_time, end_time, max_points):
+        """The finest tier with at most max_points buckets over the span, else the coarsest tier."""
+        for tier in self.tiers:
+            buckets = math.floor(end_time / tier.width) - math.floor(start_time / tier.width) + 1
+            if buckets <= max_points:
+                return tier
+        return self.tiers[-1]
+
+    def query(self, channel_id, start_time=None, end_time=None, resolution=None, max_points=None):
+        """Returns {'tier', 'timestamps', 'min', 'max', 'mean', 'count'} for one channel.
+
+        resolution is the coarsest acceptable spacing in seconds. max_points caps the number of points:
+        raw data is returned if it fits, else the finest tier that fits, and if even the hour tier has
+        too many buckets they are merged down to max_points. Without either, raw data is returned.
+        """
+        with self._lock:
+            if resolution is None and max_points:
+                start = self.oldest_timestamp() if start_time is None else start_time
+                end = self.watermark if end_time is None else end_time
+                tier = self.tier_for_points(start, end, max_points)
+                if tier is self.tiers[0]:
+                    # Raw data is only read when the span is short enough for the minute tier to fit
+                    result = self._read_raw(channel_id, start_time, end_time)
+                    if len(result['timestamps']) <= max_points:
+                        return result
+                return downsample(dict(tier.read(channel_id, start_time, end_time), tier=tier.name), max_points)
+            tier = self.select_tier(resolution) if resolution else None
+            if tier is not None:
+                return dict(tier.read(channel_id, start_time, end_time), tier=tier.name)
+            return self._read_raw(channel_id, start_time, end_time)
+
+    def _read_raw(self, channel_id, start_time, end_time):
+        raw = self.raw.query(start_time, end_time, channel_id=channel_id)
+        values = raw['values']
+        return {'tier': 'raw', 'timestamps': raw['timestamps'], 'min': values, 'max': values, 'mean': values,
+                'count': np.ones(len(values))}
+
+    def compact(self):
+        """Applies each tier's retention relative to the newest data."""
+        if self.watermark == -math.inf:
+            return 0
+        with self._lock:
+            dropped = self.raw.drop_before(self.watermark - self.retention['raw'])
+            for tier in self.tiers:
+                dropped += tier.archive.drop_before(self.watermark - tier.retention)
+            self.raw.flush()
+            for tier in self.tiers:
+                tier.archive.flush()
+        return dropped
+
+    def start_compaction(self, interval=3600.0):
+        """Runs compact() every interval seconds in a background thread."""
+        if self._compactor is None:
+            self._stop.clear()
+            self._compactor = threading.Thread(target=self._compaction_loop, args=(interval,),
+                                               name='RollupCompaction', daemon=True)
+            self._compactor.start()
+
+    def _compaction_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                self.logger.error(f"Rollup compaction failed: {e}")
+
+    def stop_compaction(self):
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=5)
+            self._compactor = None
+
+    def close(self):
+        self.stop_compaction()
+        with self._lock:
+            self.raw.close()
+            for tier in self.tiers:
+                tier.archive.close()
+
+
+# Example usage
+if __name__ == '__main__':
+    import tempfile
+    import time
+    logging.basicConfig(level=logging.INFO)
+    engine = RollupEngine(tempfile.mkdtemp(), segment_capacity=1 << 16)
+    level = engine.channel_id('radar1', 'level')
+    start = time.time() - 30 * DAY
+    for day in range(30):
+        timestamps = start + day * DAY + np.arange(0, DAY, 5.0)
+        engine.append_many(timestamps, np.full(len(timestamps), level), np.sin(timestamps / 7200))
+    result = engine.query(level, start, start + 30 * DAY, max_points=1000)
+    logging.info(f"30 days from the {result['tier']} tier: {len(result['mean'])} points")
+    engine.close()
@@ -0,0 +1,287 @@
+# segment_archive.py
+
+"""The segment_archive.py module is a local history of readings in memory-mapped columnar files.
+Each segment is a preallocated file with a fixed header and four fixed-width columns (timestamps,
+channel ids, values, quality) plus a sparse time index holding every index_stride-th timestamp.
+Appends write straight into the mapped columns and then bump the record count in the header, so a
+concurrent reader, or a restart after the process dies, only ever sees fully written records.
+Appends are not synced: the mapping reaches the disk when flush() msyncs it, which happens when a
+segment is sealed, on flush() and on close() (RollupEngine.compact() flushes every archive). After a
+power loss, records since the last flush may be lost, and since the kernel writes dirty pages back in
+any order, the header may count records whose pages never reached the disk; callers that need
+power-loss durability call flush() at their commit points. Range queries bisect the small sparse index,
+then one index block of timestamps, and return zero-copy NumPy views of the mapped columns; the OS pages
+in only what is touched, so month-long queries never load whole files."""
+
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+
+import numpy as np
+
+from state_manager.persistence import atomic_write, fsync_directory
+
+MAGIC = b'SEGA'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIQQdd')  # magic, version, reserved, index stride, capacity, count, min/max time
+HEADER_SIZE = 64
+SEGMENT_NAME = re.compile(r'segment_(\d{8})\.seg$')
+COLUMNS = (('timestamps', np.float64), ('channels', np.uint32), ('values', np.float64), ('quality', np.uint8))
+
+
+def segment_size(capacity, index_stride):
+    return HEADER_SIZE + capacity * (8 + 4 + 8 + 1) + math.ceil(capacity / index_stride) * 8
+
+
+class Segment:
+    """One mapped segment file. Writable segments are appended to; sealed ones are mapped read-only."""
+
+    def __init__(self, path, capacity=None, index_stride=None, writable=False):
+        self.path = path
+        self.writable = writable
+        create = capacity is not None and not os.path.exists(path)
+        fd = os.open(path, (os.O_RDWR | os.O_CREAT) if writable else os.O_RDONLY, 0o644)
+        try:
+            if create:
+                os.ftruncate(fd, segment_size(capacity, index_stride))  # sparse until written
+                os.pwrite(fd, HEADER.pack(MAGIC, FORMAT_VERSION, 0, index_stride, capacity, 0, math.inf, -math.inf), 0)
+            self.mm = mmap.mmap(fd, 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        magic, version, _, self.index_stride, self.capacity, _, _, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a segment file")
+        offset = HEADER_SIZE
+        self.columns = {}
+        for name, dtype in COLUMNS:
+            self.columns[name] = np.frombuffer(self.mm, dtype=dtype, count=self.capacity, offset=offset)
+            offset += self.capacity * np.dtype(dtype).itemsize
+        self.index = np.frombuffer(self.mm, dtype=np.float64, count=math.ceil(self.capacity / self.index_stride),
+                                   offset=offset)
+
+    def header(self):
+        """Returns (count, min time, max time) as last committed."""
+        return HEADER.unpack_from(self.mm, 0)[5:8]
+
+    @property
+    def count(self):
+        return self.header()[0]
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, timestamps, channels, values, quality):
+        """Writes up to the free space of sorted arrays; returns how many records were written."""
+        count, min_time, max_time = self.header()
+        n = min(len(timestamps), self.capacity - count)
+        if n <= 0:
+            return 0
+        end = count + n
+        self.columns['timestamps'][count:end] = timestamps[:n]
+        self.columns['channels'][count:end] = channels[:n]
+        self.columns['values'][count:end] = values[:n]
+        self.columns['quality'][count:end] = quality[:n]
+        stride = self.index_stride
+        first_entry = -(-count // stride)  # index entries for records at multiples of the stride
+        last_entry = -(-end // stride)
+        if last_entry > first_entry:
+            self.index[first_entry:last_entry] = self.columns['timestamps'][first_entry * stride:end:stride]
+        # Commit point: the count is written only after the records it covers
+        HEADER.pack_into(self.mm, 0, MAGIC, FORMAT_VERSION, 0, stride, self.capacity, end,
+                         min(min_time, float(timestamps[0])), max(max_time, float(timestamps[n - 1])))
+        return n
+
+    def locate(self, timestamp, side='left'):
+        """Record position for timestamp (as numpy.searchsorted) via the sparse index and one block."""
+        count = self.count
+        entries = -(-count // self.index_stride)
+        block = int(np.searchsorted(self.index[:entries], timestamp, side)) - 1
+        if block < 0:
+            return 0
+        begin = block * self.index_stride
+        end = min(begin + self.index_stride, count)
+        return begin + int(np.searchsorted(self.columns['timestamps'][begin:end], timestamp, side))
+
+    def view(self, begin, end):
+        return {name: column[begin:end] for name, column in self.columns.items()}
+
+    def flush(self):
+        """msyncs the mapping: every record counted in the header is on disk when this returns."""
+        self.mm.flush()
+
+    def close(self):
+        self.columns = {}
+        self.index = None
+        try:
+            self.mm.close()
+        except BufferError:
+            pass  # a caller still holds views; the mapping is released with them
+
+
+class SegmentArchive:
+    def __init__(self, directory, segment_capacity=1 << 20, index_stride=1024):
+        if segment_capacity % index_stride or index_stride % 8:
+            raise ValueError("segment_capacity must be a multiple of index_stride, and index_stride of 8")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.directory = directory
+        self.segment_capacity = segment_capacity
+        self.index_stride = index_stride
+        self.segments = []  # (sequence, Segment), oldest first
+        self._lock = threading.RLock()
+        self._channels_path = os.path.join(directory, 'channels.json')
+        self.channel_ids = {}
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        if os.path.exists(self._channels_path):
+            with open(self._channels_path) as file:
+                self.channel_ids = {tuple(key.split('/', 1)): value for key, value in json.load(file).items()}
+        names = sorted(name for name in os.listdir(self.directory) if SEGMENT_NAME.match(name))
+        for position, name in enumerate(names):
+            writable = position == len(names) - 1
+            segment = Segment(os.path.join(self.directory, name), writable=writable)
+            if writable and segment.full:
+                segment.close()
+                segment = Segment(segment.path)
+            self.segments.append((int(SEGMENT_NAME.match(name).group(1)), segment))
+        self.logger.info(f"Archive {self.directory} opened with {len(self.segments)} segments.")
+
+    def channel_id(self, device, channel):
+        """Returns the numeric id for a device channel, registering it on first use."""
+        key = (device, channel)
+        with self._lock:
+            if key not in self.channel_ids:
+                self.channel_ids[key] = len(self.channel_ids)
+                atomic_write(self._channels_path, json.dumps({f"{d}/{c}": i for (d, c), i in self.channel_ids.items()}))
+            return self.channel_ids[key]
+
+    def channel_names(self):
+        return {value: key for key, value in self.channel_ids.items()}
+
+    def _active(self):
+        if self.segments and self.segments[-1][1].writable and not self.segments[-1][1].full:
+            return self.segments[-1][1]
+        if self.segments and self.segments[-1][1].writable:
+            sequence, sealed = self.segments[-1]
+            sealed.flush()
+            sealed.close()
+            self.segments[-1] = (sequence, Segment(sealed.path))
+        sequence = self.segments[-1][0] + 1 if self.segments else 1
+        segment = Segment(os.path.join(self.directory, f"segment_{sequence:08d}.seg"),
+                          self.segment_capacity, self.index_stride, writable=True)
+        fsync_directory(self.directory)
+        self.segments.append((sequence, segment))
+        return segment
+
+    def last_timestamp(self):
+        for _, segment in reversed(self.segments):
+            count, _, max_time = segment.header()
+            if count:
+                return max_time
+        return -math.inf
+
+    def append(self, timestamp, channel_id, value, quality=0):
+        return self.append_many([timestamp], [channel_id], [value], [quality])
+
+    def append_many(self, timestamps, channel_ids, values, quality=None):
+        """Appends a block of records in time order. Returns the number written (older records are refused)."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        channel_ids = np.asarray(channel_ids, dtype=np.uint32)
+        values = np.asarray(values, dtype=np.float64)
+        quality = np.zeros(len(timestamps), np.uint8) if quality is None else np.asarray(quality, dtype=np.uint8)
+        if len(timestamps) == 0:
+            return 0
+        if np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, channel_ids, values, quality = (timestamps[order], channel_ids[order], values[order],
+                                                        quality[order])
+        with self._lock:
+            if timestamps[0] < self.last_timestamp():
+                raise ValueError("Records must not be older than the newest archived record")
+            written = 0
+            while written < len(timestamps):
+                written += self._active().append(timestamps[written:], channel_ids[written:], values[written:],
+                                                 quality[written:])
+            return written
+
+    def query_views(self, start_time=None, end_time=None):
+        """Zero-copy column views {'timestamps', 'channels', 'values', 'quality'} per overlapping segment,
+        for start_time <= t <= end_time. Views alias the mapped files."""
+        start_time = -math.inf if start_time is None else start_time
+        end_time = math.inf if end_time is None else end_time
+        views = []
+        with self._lock:
+            segments = [segment for _, segment in self.segments]
+        for segment in segments:
+            count, min_time, max_time = segment.header()
+            if not count or max_time < start_time or min_time > end_time:
+                continue
+            begin = segment.locate(start_time, 'left')
+            end = segment.locate(end_time, 'right')
+            if end > begin:
+                views.append(segment.view(begin, end))
+        return views
+
+    def query(self, start_time=None, end_time=None, channel_id=None):
+        """Returns the columns for a time range (optionally one channel) as arrays.
+        A single-segment, all-channel result is returned without copying."""
+        views = self.query_views(start_time, end_time)
+        if channel_id is not None:
+            views = [{name: column[view['channels'] == channel_id] for name, column in view.items()} for view in views]
+        if len(views) == 1:
+            return views[0]
+        if not views:
+            return {name: np.empty(0, dtype) for name, dtype in COLUMNS}
+        return {name: np.concatenate([view[name] for view in views]) for name, _ in COLUMNS}
+
+    def drop_before(self, timestamp):
+        """Deletes whole segments whose newest record is older than timestamp. Returns the number dropped."""
+        dropped = 0
+        with self._lock:
+            keep = []
+            for sequence, segment in self.segments:
+                count, _, max_time = segment.header()
+                if count and max_time < timestamp and segment is not self.segments[-1][1]:
+                    segment.close()
+                    os.remove(segment.path)
+                    dropped += 1
+                else:
+                    keep.append((sequence, segment))
+            self.segments = keep
+        if dropped:
+            fsync_directory(self.directory)
+            self.logger.info(f"Dropped {dropped} segments older than {timestamp}.")
+        return dropped
+
+    def flush(self):
+        with self._lock:
+            if self.segments and self.segments[-1][1].writable:
+                self.segments[-1][1].flush()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            for _, segment in self.segments:
+                segment.close()
+            self.segments = []
+
+
+# Example usage
+if __name__ == '__main__':
+    import tempfile
+    import time
+    logging.basicConfig(level=logging.INFO)
+    archive = SegmentArchive(tempfile.mkdtemp(), segment_capacity=1 << 16)
+    level = archive.channel_id('radar1', 'level')
+    start = time.time()
+    archive.append_many(start + np.arange(200000), np.full(200000, level), np.sin(np.arange(200000) / 1000))
+    result = archive.query(start + 1000, start + 87400, channel_id=level)
+    logging.info(f"One day of 1 Hz level data: {len(result['values'])} samples, mean {result['values'].mean():.4f}")
+    archive.close()
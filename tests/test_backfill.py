@@ -0,0 +1,119 @@
+"""Tests for the historical backfill against the local HTTP and MQTT stand-ins."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from storage import SegmentArchive
+from thingsboard_client import ThingsBoardClient
+from thingsboard_client.backfill import Backfill, HTTPTelemetryTransport, MQTTTelemetryTransport, TokenBucket
+from thingsboard_client.broker_stub import ThingsBoardBrokerStub
+from thingsboard_client.http_stub import ThingsBoardHTTPStub
+from thingsboard_client.load_generator import wait_for_connection
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_is_enforced_after_the_burst(self):
+        now = [0.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(100.0, burst=50.0, clock=lambda: now[0], sleep=sleep)
+        bucket.acquire(50)
+        self.assertEqual(waits, [])
+        bucket.acquire(100)
+        self.assertAlmostEqual(waits[-1], 1.0)
+        now[0] += 0.5
+        self.assertEqual(bucket.acquire(25), 0.0)
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = SegmentArchive(os.path.join(self.directory, 'history'), segment_capacity=1024,
+                                      index_stride=64)
+        self.level = self.archive.channel_id('radar1', 'level')
+        self.ph = self.archive.channel_id('ph1', 'pH')
+        seconds = 1500
+        self.archive.append_many(np.repeat(np.arange(seconds, dtype=float), 2), np.tile([self.level, self.ph], seconds),
+                                 np.arange(2 * seconds, dtype=float))
+        self.http = ThingsBoardHTTPStub(access_tokens=['TOKEN'])
+        self.port = self.http.start()
+        self.checkpoint = os.path.join(self.directory, 'backfill.json')
+
+    def tearDown(self):
+        self.http.stop()
+        self.archive.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _backfill(self, transport, start=100, end=1099, **kwargs):
+        kwargs.setdefault('rate', 0)
+        kwargs.setdefault('window', 300.0)
+        return Backfill(self.archive, transport, start, end, self.checkpoint, batch_size=99, **kwargs)
+
+    def test_http_backfill_sends_every_point_on_keep_alive_connections(self):
+        transport = HTTPTelemetryTransport('127.0.0.1', 'TOKEN', self.port, pool_size=2)
+        progress = []
+        report = self._backfill(transport, concurrency=2, on_progress=progress.append).run()
+        transport.close()
+        self.assertTrue(report['done'])
+        self.assertEqual(report['points_sent'], 2000)
+        self.assertEqual(progress[-1]['total_points'], 2000)
+        timestamps = sorted(entry['ts'] for entry in self.http.entries)
+        self.assertEqual(timestamps, list(range(100000, 1100000, 1000)))
+        first = min(self.http.entries, key=lambda entry: entry['ts'])
+        self.assertEqual(first['values'], {'radar1_level': 200.0, 'ph1_pH': 201.0})
+        self.assertLessEqual(self.http.stats()['connections'], 2)
+        self.assertEqual(self.http.stats()['telemetry_messages'], report['messages_sent'])
+        with open(self.checkpoint) as file:
+            self.assertTrue(json.load(file)['done'])
+
+    def test_resumes_from_checkpoint_after_failure(self):
+        transport = HTTPTelemetryTransport('127.0.0.1', 'TOKEN', self.port, pool_size=1)
+        self.http.fail_next(1000, status=503, after=4)
+        with self.assertRaises(ConnectionError):
+            self._backfill(transport, concurrency=1, max_retries=2, retry_interval=0.0).run()
+        with open(self.checkpoint) as file:
+            checkpoint = json.load(file)
+        self.assertFalse(checkpoint['done'])
+        self.assertEqual(checkpoint['delivered_until'], 299.0)  # four batches of 50 timestamps
+        self.assertEqual(checkpoint['points_sent'], 400)
+
+        self.http.clear_failures()
+        report = self._backfill(transport, concurrency=1).run()
+        transport.close()
+        self.assertEqual(report['points_sent'], 2000)
+        self.assertEqual(len(self.http.entries), 1000)  # nothing was sent twice
+
+    def test_partial_checkpoint_is_not_resent(self):
+        transport = HTTPTelemetryTransport('127.0.0.1', 'TOKEN', self.port, pool_size=1)
+        with open(self.checkpoint, 'w') as file:
+            json.dump({'start_time': 100, 'end_time': 1099, 'delivered_until': 599.0, 'points_sent': 1000,
+                       'messages_sent': 10, 'done': False}, file)
+        report = self._backfill(transport, concurrency=1, channels=[('radar1', 'level')]).run()
+        transport.close()
+        self.assertEqual(min(entry['ts'] for entry in self.http.entries), 600000)
+        self.assertEqual(report['points_sent'], 1500)
+        self.assertTrue(all(list(entry['values']) == ['radar1_level'] for entry in self.http.entries))
+
+    def test_mqtt_backfill(self):
+        with ThingsBoardBrokerStub(access_tokens=['TOKEN']) as broker:
+            tb_client = ThingsBoardClient('127.0.0.1', 'TOKEN', port=broker.port)
+            tb_client.connect()
+            wait_for_connection(tb_client)
+            try:
+                report = self._backfill(MQTTTelemetryTransport(tb_client), start=0, end=199, concurrency=1).run()
+            finally:
+                tb_client.disconnect()
+            self.assertEqual(report['points_sent'], 400)
+            self.assertEqual(broker.stats()['telemetry_messages'], report['messages_sent'])
+            self.assertEqual(broker.last_telemetry[-1]['ts'], 199000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Integration tests that drive the real ThingsBoardClient against the in-process broker stub."""
+
+import time
+import unittest
+from thingsboard_client import ThingsBoardClient
+from thingsboard_client.broker_stub import ThingsBoardBrokerStub, topic_matches
+from thingsboard_client.load_generator import run_load_test, wait_for_connection
+
+
+class TestThingsBoardBrokerStub(unittest.TestCase):
+    def setUp(self):
+        self.broker = ThingsBoardBrokerStub(access_tokens=['TEST_TOKEN'])
+        port = self.broker.start()
+        self.tb_client = ThingsBoardClient('127.0.0.1', 'TEST_TOKEN', port=port)
+        self.tb_client.connect()
+        wait_for_connection(self.tb_client)
+
+    def tearDown(self):
+        self.tb_client.disconnect()
+        self.broker.stop()
+
+    def test_topic_matches(self):
+        self.assertTrue(topic_matches('v1/devices/me/rpc/request/+', 'v1/devices/me/rpc/request/7'))
+        self.assertTrue(topic_matches('v1/#', 'v1/devices/me/attributes'))
+        self.assertFalse(topic_matches('v1/devices/me/attributes', 'v1/devices/me/attributes/response/1'))
+
+    def test_telemetry_is_acknowledged(self):
+        info = self.tb_client.publish_telemetry({'pH': 7.1})
+        info.wait_for_publish()
+        self.assertTrue(self.broker.wait_for_telemetry(1))
+        self.assertEqual(self.broker.last_telemetry, {'pH': 7.1})
+
+    def test_server_side_rpc(self):
+        # Wait until the RPC subscription from on_connect is active
+        self.assertTrue(self._wait_until(lambda: self.broker.stats()['connections'] == 1))
+        response = None
+        for _ in range(20):
+            response = self.broker.send_rpc('getTelemetry', timeout=0.5)
+            if response is not None:
+                break
+        self.assertEqual(response, {'temperature': 25.5, 'humidity': 60})
+
+    def test_load_generator_reports_throughput(self):
+        report = run_load_test(rate=200, duration=0.5, payload_size=128)
+        self.assertGreater(report['acked'], 0)
+        self.assertEqual(report['unacked'], 0)
+        self.assertEqual(report['broker']['telemetry_messages'], report['sent'])
+        self.assertIsNotNone(report['latency_ms']['p99'])
+
+    def _wait_until(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests for the piecewise-linear CalibrationCurve and the FlowCalculationHandler built on it."""
+
+import math
+import unittest
+import numpy as np
+from calibration import CalibrationCurve
+from state_manager.flow_calculation_handler import FlowCalculationHandler, calibration_data
+
+
+class TestCalibrationCurve(unittest.TestCase):
+    def setUp(self):
+        self.levels = [-5, 0, 2.5, 10, 12.5, 20, 30]
+
+    def test_scalar_and_batch_agree_with_numpy_interp(self):
+        curve = CalibrationCurve([20, 0, 10], [15, 0, 5])
+        expected = np.interp([0, 2.5, 10, 12.5, 20], [0, 10, 20], [0, 5, 15])
+        np.testing.assert_allclose([curve(x) for x in [0, 2.5, 10, 12.5, 20]], expected)
+        np.testing.assert_allclose(curve.evaluate([0, 2.5, 10, 12.5, 20]), expected)
+
+    def test_extrapolation_policies(self):
+        expected = {
+            'linear': [-2.5, 0, 1.25, 5, 7.5, 15, 25],
+            'clamp': [0, 0, 1.25, 5, 7.5, 15, 15],
+        }
+        for policy, values in expected.items():
+            curve = CalibrationCurve([0, 10, 20], [0, 5, 15], extrapolation=policy)
+            self.assertEqual([curve(x) for x in self.levels], values)
+            np.testing.assert_allclose(curve.evaluate(self.levels), values)
+
+        curve = CalibrationCurve([0, 10, 20], [0, 5, 15], extrapolation='nan')
+        self.assertTrue(math.isnan(curve(30)))
+        self.assertEqual(np.isnan(curve.evaluate(self.levels)).tolist(), [True, False, False, False, False, False, True])
+
+        curve = CalibrationCurve([0, 10, 20], [0, 5, 15], extrapolation='error')
+        self.assertEqual(curve(20), 15)
+        with self.assertRaises(ValueError):
+            curve(-5)
+        with self.assertRaises(ValueError):
+            curve.evaluate(self.levels)
+
+    def test_invalid_points(self):
+        with self.assertRaises(ValueError):
+            CalibrationCurve([1], [1])
+        with self.assertRaises(ValueError):
+            CalibrationCurve([0, 0, 1], [0, 1, 2])
+        with self.assertRaises(ValueError):
+            CalibrationCurve([0, 1], [0, 1], extrapolation='cubic')
+
+    def test_flow_handler_scalar_and_batch(self):
+        handler = FlowCalculationHandler(calibration_data)
+        self.assertEqual(handler.calculate_flow_rate(15), 10)
+        self.assertIsInstance(handler.calculate_flow_rate(15), float)
+        np.testing.assert_allclose(handler.calculate_flow_rates([0, 5, 15, 25]), [0, 2.5, 10, 20])
+
+        clamped = FlowCalculationHandler(calibration_data, extrapolation='clamp')
+        self.assertEqual(clamped.calculate_flow_rate(25), 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Tests for the least-squares calibration fitting tool."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from calibration import CalibrationManager
+from calibration.calibration_fit import (apply_fits, fit_all, fit_piecewise, main, read_document,
+                                         recalibrate_history, write_versioned)
+from calibration.calibration_pipeline import load_calibration_file
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(__file__), '..', 'calibration', 'calibration_data.json')
+
+
+class TestCalibrationFit(unittest.TestCase):
+    def setUp(self):
+        self.data = load_calibration_file(CALIBRATION_FILE)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_linear_fit_of_all_sections(self):
+        results = fit_all(self.data, 'linear')
+        self.assertEqual(set(results), {'pH', 'turbidity', 'radar_level', 'flow_rate'})
+        slope, intercept = results['flow_rate'].fit['coefficients']
+        self.assertAlmostEqual(slope, 0.1)
+        self.assertAlmostEqual(intercept, -50.0)
+        self.assertAlmostEqual(results['flow_rate'].r_squared, 1.0)
+        self.assertLess(results['flow_rate'].rmse, 1e-9)
+
+        ph = results['pH']
+        expected_slope, expected_intercept = np.polyfit(ph.x, ph.y, 1)
+        np.testing.assert_allclose(ph.fit['coefficients'], [expected_slope, expected_intercept])
+        np.testing.assert_allclose(ph.residuals, ph.y - (expected_slope * ph.x + expected_intercept), atol=1e-12)
+        self.assertLess(ph.r_squared, 1.0)
+
+    def test_piecewise_and_polynomial(self):
+        x = np.linspace(0, 10, 41)
+        y = np.where(x < 4, 2 * x, 8 + 0.5 * (x - 4))
+        fit = fit_piecewise(x, y, knots=[4.0])
+        np.testing.assert_allclose(fit['knots'], [0, 4, 10])
+        np.testing.assert_allclose(fit['values'], [0, 8, 11], atol=1e-9)
+
+        results = fit_all(self.data, 'polynomial', degree=2, models={'flow_rate': 'linear'})
+        self.assertEqual(results['flow_rate'].model, 'linear')
+        self.assertEqual(len(results['pH'].fit['coefficients']), 3)
+        self.assertAlmostEqual(results['pH'].r_squared, 1.0)
+
+    def test_versioned_write_is_compiled_and_reapplied(self):
+        output = os.path.join(self.directory, 'calibration_data.json')
+        results = fit_all(self.data, 'linear')
+        first = write_versioned(apply_fits(self.data, results), output)
+        second = write_versioned(apply_fits(self.data, results), output)
+        self.assertTrue(first.endswith('calibration_data.v1.json'))
+        self.assertTrue(second.endswith('calibration_data.v2.json'))
+        with open(output) as file:
+            self.assertEqual(json.load(file)['_version'], 2)
+
+        manager = CalibrationManager(output)
+        slope, intercept = results['pH'].fit['coefficients']
+        self.assertAlmostEqual(manager.apply('pH', 3.0), slope * 3.0 + intercept)
+
+        raw = np.array([600.0, 650.0, 725.0])
+        np.testing.assert_allclose(recalibrate_history(raw, load_calibration_file(output), 'flow_rate'), [10, 15, 22.5])
+
+    def test_write_keeps_comments_and_unknown_keys(self):
+        output = os.path.join(self.directory, 'calibration_data.json')
+        shutil.copy(CALIBRATION_FILE, output)
+        original = read_document(output)
+        self.assertEqual(main(['fit', output, '--write']), 0)
+        rewritten = read_document(output)
+        self.assertEqual([key for key, _ in rewritten], [key for key, _ in original] + ['_version', '_fitted_at'])
+        comments = [value for key, value in original if key == '_comment']
+        self.assertEqual(len(comments), 2)
+        self.assertEqual([value for key, value in rewritten if key == '_comment'], comments)
+        self.assertIn('fit', dict(rewritten)['pH'])
+        self.assertEqual(main(['fit', output, '--write']), 0)
+        self.assertEqual(dict(read_document(output))['_version'], 2)
+        self.assertEqual(len(read_document(output)), len(rewritten))
+
+    def test_cli(self):
+        history = os.path.join(self.directory, 'history.csv')
+        converted = os.path.join(self.directory, 'converted.csv')
+        np.savetxt(history, [[1.0, 600], [2.0, 700]], delimiter=',')
+        self.assertEqual(main(['reapply', CALIBRATION_FILE, '--pipeline', 'flow_rate',
+                               '--history', history, '--output', converted]), 0)
+        np.testing.assert_allclose(np.loadtxt(converted, delimiter=',', skiprows=1), [[1, 600, 10], [2, 700, 20]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Tests for the calibration pipelines compiled from calibration_data.json."""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+from calibration import CalibrationManager, compile_calibration
+from calibration.calibration_pipeline import (LinearStage, LookupTableStage, PolynomialStage,
+                                              load_calibration_file)
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(__file__), '..', 'calibration', 'calibration_data.json')
+
+
+class TestCalibrationPipeline(unittest.TestCase):
+    def setUp(self):
+        self.pipelines = compile_calibration(load_calibration_file(CALIBRATION_FILE))
+
+    def test_repository_file_compiles(self):
+        self.assertEqual(set(self.pipelines), {'pH', 'turbidity', 'turbidity_mg_l', 'radar_level', 'flow_rate'})
+        self.assertAlmostEqual(self.pipelines['pH'](2.5), 7.0)
+        self.assertAlmostEqual(self.pipelines['pH'](4.2), 10.0)
+        self.assertAlmostEqual(self.pipelines['turbidity'](2.5), 100.0)
+        self.assertAlmostEqual(self.pipelines['turbidity_mg_l'](3.5), 200 * 0.45)
+        self.assertAlmostEqual(self.pipelines['radar_level'](195), 200 * 1.05 + 0.3)
+        self.assertAlmostEqual(self.pipelines['flow_rate'](650), 15.0)
+
+    def test_block_matches_scalar(self):
+        for name, pipeline in self.pipelines.items():
+            block = np.linspace(0, 800, 97)
+            np.testing.assert_allclose(pipeline.apply(block), [pipeline(x) for x in block], err_msg=name)
+
+    def test_stages(self):
+        self.assertEqual(PolynomialStage([2, 0, 1])(3), 19)
+        np.testing.assert_allclose(PolynomialStage([2, 0, 1]).apply([0, 1, 3]), [1, 3, 19])
+        lut = LookupTableStage.from_function(LinearStage(0.5, 1), size=10)
+        self.assertEqual(lut(4), 3.0)
+        np.testing.assert_allclose(lut.apply([0, 9, 20, -1]), [1, 5.5, 5.5, 1])
+
+        tabulated = self.pipelines['flow_rate'].tabulate(1024)
+        codes = np.arange(500, 900, 7)
+        np.testing.assert_allclose(tabulated.apply(codes), self.pipelines['flow_rate'].apply(codes))
+
+    def test_fallback_to_coefficients(self):
+        pipelines = compile_calibration({'pH': {'slope': 2.0, 'intercept': 1.0, 'calibration_points': []},
+                                         'flow_rate': {'flow_conversion': {'k_factor': 5.0, 'zero_flow_adc': 500}}})
+        self.assertEqual(pipelines['pH'](3), 7.0)
+        self.assertEqual(pipelines['flow_rate'](600), 20.0)
+
+
+class TestCalibrationManager(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'calibration_data.json')
+        shutil.copy(CALIBRATION_FILE, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _rewrite(self, update):
+        data = load_calibration_file(self.path)
+        update(data)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.path)
+
+    def test_bound_pipeline_follows_reload_and_bad_file_is_ignored(self):
+        manager = CalibrationManager(self.path)
+        ph = manager.bind('pH')
+        self.assertAlmostEqual(ph(2.5), 7.0)
+
+        self._rewrite(lambda data: data['pH']['calibration_points'][0].update(standard_value=6.5))
+        self.assertTrue(manager.reload())
+        self.assertAlmostEqual(ph(2.5), 6.5)
+        self.assertEqual(manager.version, 2)
+
+        with open(self.path, 'w') as file:
+            file.write('{"pH": ')
+        self.assertFalse(manager.reload())
+        self.assertAlmostEqual(ph(2.5), 6.5)
+
+    def test_watch_reloads_on_change(self):
+        manager = CalibrationManager(self.path, watch=True, poll_interval=0.05)
+        try:
+            self._rewrite(lambda data: data['turbidity'].update(ntu_to_mg_l_conversion=1.0))
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and manager.version < 2:
+                time.sleep(0.01)
+        finally:
+            manager.stop_watching()
+        self.assertAlmostEqual(manager.apply('turbidity_mg_l', 2.5), 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
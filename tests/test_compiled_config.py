@@ -0,0 +1,60 @@
+"""Tests for the schema-driven configuration compiler."""
+
+import dataclasses
+import os
+import subprocess
+import sys
+import unittest
+from config import ConfigError, compile_config
+
+
+class TestCompiledConfig(unittest.TestCase):
+    def test_layer_precedence_and_deep_merge(self):
+        config = compile_config(
+            file_config={'thingsboard': {'host': 'tb.local'}, 'sensor_intervals': {'radar': 2}},
+            environ={'THINGSBOARD_PORT': '8883', 'RADAR_INTERVAL': '3'},
+            attributes={'sensor_intervals.radar': 1})
+        self.assertEqual(config.thingsboard.host, 'tb.local')
+        self.assertEqual(config.thingsboard.port, 8883)
+        self.assertEqual(config.thingsboard.token, 'YourDefaultAccessToken')
+        self.assertEqual(config.sensor_intervals.radar, 1)
+        self.assertEqual(config.sensor_intervals.turbidity, 10)
+
+    def test_flat_index(self):
+        config = compile_config(environ={})
+        self.assertEqual(config.get('database.port'), 5432)
+        self.assertIs(config.get('database'), config.database)
+        self.assertIsNone(config.get('database.missing'))
+
+    def test_frozen_and_slotted(self):
+        config = compile_config(environ={})
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            config.database.port = 1
+        self.assertFalse(hasattr(config.database, '__dict__'))
+
+    def test_invalid_config_fails_fast_with_all_problems(self):
+        with self.assertRaises(ConfigError) as context:
+            compile_config(file_config={'DATABASE_PORT': 'abc', 'thingsboard': {'prot': 1}},
+                           environ={'PH_INTERVAL': '0'})
+        self.assertEqual(len(context.exception.problems), 3)
+
+    def test_bad_environment_is_a_config_error_not_an_import_error(self):
+        code = ("import config, state_manager\n"
+                "try:\n    config.compile_config()\nexcept config.ConfigError as e:\n    print(e.problems)")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.join(os.path.dirname(__file__), '..'),
+                                env=dict(os.environ, DATABASE_PORT='abc'))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('database.port', result.stdout)
+
+    def test_default_config_uses_the_compiled_defaults(self):
+        from config.default_config import DefaultConfig
+        config = compile_config(environ={})
+        if not any(name in os.environ for name in ('THINGSBOARD_PORT', 'DATABASE_NAME', 'TURBIDITY_INTERVAL')):
+            self.assertEqual(DefaultConfig.THINGSBOARD_PORT, config.thingsboard.port)
+            self.assertEqual(DefaultConfig.DATABASE_NAME, config.database.name)
+            self.assertEqual(DefaultConfig.SENSOR_READING_INTERVALS['turbidity'], config.sensor_intervals.turbidity)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Tests for ConfigLoader layering, cached reloads and change subscriptions."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from state_manager.config_loader import ConfigLoader
+
+
+class TestConfigLoader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.defaults = os.path.join(self.directory, 'default_config.yaml')
+        self.site = os.path.join(self.directory, 'site_config.yaml')
+        self._write(self.defaults, "sensor_intervals:\n  radar: 5\n  ph: 5\nlog_level: INFO\n")
+        self._write(self.site, "log_level: DEBUG\nsensor_intervals:\n  ph: 10\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _write(self, path, text):
+        with open(path, 'w') as file:
+            file.write(text)
+        # Make sure the mtime moves even on coarse-grained filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    def test_layers_and_dotted_get(self):
+        config_loader = ConfigLoader([self.defaults, self.site])
+        self.assertEqual(config_loader.get('log_level'), 'DEBUG')
+        # Layers are deep-merged, so the site file only overrides the ph interval
+        self.assertEqual(config_loader.get('sensor_intervals'), {'radar': 5, 'ph': 10})
+        self.assertIs(config_loader.load_config(), config_loader.config_data)
+
+    def test_unchanged_reload_does_not_reparse(self):
+        config_loader = ConfigLoader([self.defaults, self.site])
+        with patch('state_manager.config_loader.yaml.safe_load') as safe_load:
+            self.assertEqual(config_loader.reload(), {})
+            safe_load.assert_not_called()
+
+    def test_subscribers_receive_key_level_diff(self):
+        config_loader = ConfigLoader([self.defaults, self.site])
+        received = []
+        config_loader.subscribe('sensor_intervals', received.append)
+        self._write(self.defaults, "sensor_intervals:\n  radar: 2\n  ph: 7\nlog_level: INFO\n")
+        config_loader.reload()
+        self.assertEqual(received, [{'sensor_intervals.radar': (5, 2)}])
+
+    def test_watching_reloads_on_change(self):
+        for use_inotify in (True, False):
+            config_loader = ConfigLoader([self.defaults, self.site])
+            received = []
+            config_loader.subscribe('log_level', received.append)
+            config_loader.start_watching(poll_interval=0.02, use_inotify=use_inotify)
+            self._write(self.site, f"log_level: WARNING{int(use_inotify)}\n")
+            deadline = time.monotonic() + 3
+            while not received and time.monotonic() < deadline:
+                time.sleep(0.01)
+            config_loader.stop_watching()
+            self.assertEqual(config_loader.get('log_level'), f'WARNING{int(use_inotify)}')
+
+
+if __name__ == '__main__':
+    unittest.main()
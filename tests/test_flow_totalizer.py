@@ -0,0 +1,96 @@
+"""Tests for the trapezoidal flow totalizer and its checkpointing."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from state_manager import StateManager
+from state_manager.flow_totalizer import FlowTotalizer
+
+SHIFTS = [('A', 6), ('B', 14), ('C', 22)]
+
+
+class FakeClock:
+    def __init__(self, wall_start):
+        self.monotonic = 1000.0
+        self.wall_start = wall_start
+
+    def clock(self):
+        return self.monotonic
+
+    def wall(self):
+        return self.wall_start + self.monotonic - 1000.0
+
+
+class TestFlowTotalizer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.directory, 'state.json')
+        self.fake = FakeClock(datetime(2024, 3, 5, 13, 30).timestamp())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _totalizer(self, state_manager=None, **kwargs):
+        return FlowTotalizer(state_manager, shifts=SHIFTS, clock=self.fake.clock, wall_clock=self.fake.wall, **kwargs)
+
+    def test_trapezoidal_integration_with_variable_dt(self):
+        totalizer = self._totalizer()
+        # Flow ramps 0 -> 360 m^3/h over 100 s with uneven sampling: exact volume 5 m^3
+        for t in (0, 3, 10, 11, 40, 77, 100):
+            totalizer.add_sample(3.6 * t, 1000.0 + t)
+        self.assertAlmostEqual(totalizer.total, 5.0)
+        totalizer.add_sample(100.0, 1050.0)  # not monotonic
+        self.assertEqual(totalizer.rejected_samples, 1)
+
+    def test_gap_policies(self):
+        results = {}
+        for policy in ('hold', 'skip', 'interpolate'):
+            totalizer = self._totalizer(gap_policy=policy, max_gap=60)
+            totalizer.add_sample(36.0, 1000.0)
+            totalizer.add_sample(72.0, 1000.0 + 600)
+            results[policy] = totalizer
+        self.assertAlmostEqual(results['hold'].total, 6.0)
+        self.assertAlmostEqual(results['skip'].total, 0.0)
+        self.assertAlmostEqual(results['skip'].unaccounted_seconds, 600)
+        self.assertAlmostEqual(results['interpolate'].total, 9.0)
+        self.assertEqual(results['hold'].gap_count, 1)
+
+    def test_shift_rollover_splits_volume(self):
+        closed = []
+        totalizer = self._totalizer(on_period_closed=lambda kind, period, volume: closed.append((kind, period, volume)))
+        # 13:30 .. 14:30 at constant 36 m^3/h, sampled every 45 s so one interval straddles 14:00
+        for t in range(0, 3601, 45):
+            totalizer.add_sample(36.0, 1000.0 + t)
+        self.assertEqual(closed, [('shift', '2024-03-05-A', closed[0][2])])
+        self.assertAlmostEqual(closed[0][2], 18.0)
+        self.assertEqual(totalizer.shift, '2024-03-05-B')
+        self.assertAlmostEqual(totalizer.shift_volume, 18.0)
+        self.assertAlmostEqual(totalizer.day_volume, 36.0)
+
+    def test_periodic_checkpoint_and_resume(self):
+        state_manager = StateManager(self.state_file, write_behind=True)
+        totalizer = self._totalizer(state_manager, checkpoint_interval=60)
+        for t in range(0, 301):
+            self.fake.monotonic = 1000.0 + t
+            totalizer.add_sample(36.0)
+        self.assertEqual(totalizer.checkpoint_count, 5)
+        state_manager.close()
+
+        # Crash 30 s after the last sample; the checkpoint holds the total at t = 300
+        self.fake.monotonic += 30
+        state_manager = StateManager(self.state_file)
+        state_manager.load_state()
+        resumed = self._totalizer(state_manager, max_gap=60)
+        self.assertAlmostEqual(resumed.total, 3.0 + 0.3)  # 300 s measured + 30 s held at the last flow
+        self.assertEqual(resumed.shift, '2024-03-05-A')
+
+        skipped = self._totalizer(state_manager, max_gap=10)
+        self.assertAlmostEqual(skipped.total, 3.0)
+        self.assertAlmostEqual(skipped.unaccounted_seconds, 30)
+        self.assertAlmostEqual(skipped.estimated_unaccounted_volume, 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
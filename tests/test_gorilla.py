@@ -0,0 +1,58 @@
+"""Tests for the block-framed Gorilla-style codec."""
+
+import io
+import unittest
+import numpy as np
+from storage.gorilla import (FRAME_HEADER, GorillaEncoder, benchmark, decode_all, decode_block, encode_block,
+                             synthetic_plant_series)
+
+
+class TestGorillaCodec(unittest.TestCase):
+    def assertRoundTrip(self, timestamps, values):
+        decoded_timestamps, decoded_values, end = decode_block(encode_block(timestamps, values))
+        np.testing.assert_allclose(decoded_timestamps, timestamps, atol=5e-4, rtol=0)
+        np.testing.assert_array_equal(decoded_values.view(np.uint64), np.asarray(values, dtype=float).view(np.uint64))
+
+    def test_round_trip_edge_cases(self):
+        self.assertRoundTrip([10.0], [1.5])
+        self.assertRoundTrip([10.0, 15.0], [1.5, -2.25])
+        rng = np.random.default_rng(3)
+        irregular = np.cumsum(rng.integers(1, 100000, 500)) / 1000.0
+        self.assertRoundTrip(irregular, rng.normal(size=500))
+        self.assertRoundTrip(np.arange(100.0), [np.nan, np.inf, -0.0, 0.0, 1e308] * 20)
+
+    def test_regular_repeated_series_is_tiny(self):
+        frame = encode_block(np.arange(1024) * 5.0, np.full(1024, 7.25))
+        self.assertEqual(len(frame), FRAME_HEADER.size + 128)  # only the unchanged-value bitmap
+
+    def test_streaming_frames_decode_independently(self):
+        timestamps, values = synthetic_plant_series(5000)
+        stream = io.BytesIO()
+        encoder = GorillaEncoder(stream, block_size=1024)
+        for t, v in zip(timestamps[:100], values[:100]):
+            encoder.append(t, v)
+        encoder.extend(timestamps[100:], values[100:])
+        encoder.flush()
+        data = stream.getvalue()
+        decoded_timestamps, decoded_values = decode_all(data)
+        np.testing.assert_array_equal(decoded_values, values)
+        np.testing.assert_allclose(decoded_timestamps, timestamps)
+
+        _, _, second = decode_block(data)
+        block_timestamps, _, _ = decode_block(data, second)
+        np.testing.assert_allclose(block_timestamps, timestamps[1024:2048])
+
+        corrupted = bytearray(data)
+        corrupted[second + FRAME_HEADER.size + 3] ^= 0xFF
+        decode_block(bytes(corrupted))  # first block is unaffected
+        with self.assertRaises(ValueError):
+            decode_block(bytes(corrupted), second)
+
+    def test_benchmark_report(self):
+        report = benchmark(*synthetic_plant_series(20000))
+        self.assertTrue(report['lossless'])
+        self.assertGreater(report['compression_ratio'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""Tests for edge-triggered GPIO inputs dispatched with epoll."""
+
+import queue
+import socket
+import time
+import unittest
+from unittest import mock
+from hardware_interface import GPIOEventDispatcher
+from hardware_interface.gpiocontrol import GPIOControl
+from tests.test_gpiocontrol import make_sysfs, read
+
+
+class FakeInput:
+    """Stands in for a sysfs value fd: urgent TCP data raises EPOLLPRI like a GPIO interrupt."""
+
+    def __init__(self, gpio_num):
+        listener = socket.create_server(('127.0.0.1', 0))
+        self.sender = socket.create_connection(listener.getsockname())
+        self.receiver, _ = listener.accept()
+        listener.close()
+        self.gpio_num = gpio_num
+        self.fd = self.receiver.fileno()
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+        self.sender.send(b'!', socket.MSG_OOB)
+
+    def read_value(self):
+        try:
+            self.receiver.recv(1, socket.MSG_OOB)
+        except OSError:
+            pass
+        return str(self.value)
+
+    def close(self):
+        self.sender.close()
+        self.receiver.close()
+
+
+class TestGPIOEventDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.events = queue.Queue()
+        self.dispatcher = GPIOEventDispatcher(events=self.events)
+        self.inputs = [FakeInput(17), FakeInput(27)]
+
+    def tearDown(self):
+        self.dispatcher.close()
+        for fake in self.inputs:
+            fake.close()
+
+    def test_edges_are_delivered_to_queue_and_callback(self):
+        received = []
+        self.dispatcher.add_input(self.inputs[0], callback=received.append)
+        self.dispatcher.add_input(self.inputs[1])
+        self.dispatcher.start()
+        self.inputs[0].set(1)
+        first = self.events.get(timeout=2)
+        self.assertEqual((first['pin'], first['value'], first['edge']), (17, 1, 'rising'))
+        self.inputs[1].set(1)
+        self.assertEqual(self.events.get(timeout=2)['pin'], 27)
+        self.inputs[1].set(0)
+        self.assertEqual(self.events.get(timeout=2)['edge'], 'falling')
+        self.assertEqual(len(received), 1)
+        self.assertLess(time.monotonic() - first['monotonic'], 2)
+
+    def test_bounces_collapse_into_one_event(self):
+        self.dispatcher.add_input(self.inputs[0], debounce=0.05)
+        self.dispatcher.start()
+        for value in (1, 0, 1, 0, 1):
+            self.inputs[0].set(value)
+            time.sleep(0.002)
+        event = self.events.get(timeout=2)
+        self.assertEqual(event['value'], 1)
+        time.sleep(0.1)
+        self.assertTrue(self.events.empty())
+        self.inputs[0].set(0)
+        self.inputs[0].set(1)  # bounced back to the delivered value
+        time.sleep(0.1)
+        self.assertTrue(self.events.empty())
+        self.assertGreaterEqual(self.dispatcher.edges_seen, 2)
+
+    def test_every_edge_restarts_the_settle_timer(self):
+        self.dispatcher.add_input(self.inputs[0], debounce=0.1)
+        self.dispatcher.start()
+        # A glitch still bouncing when the first settle deadline passes ends where it started
+        for value in (1, 1, 0):
+            self.inputs[0].set(value)
+            time.sleep(0.06)
+        time.sleep(0.15)
+        self.assertTrue(self.events.empty())
+
+        first_edge = time.monotonic()
+        self.inputs[0].set(1)
+        time.sleep(0.03)
+        second_edge = time.monotonic()
+        self.inputs[0].set(0)
+        time.sleep(0.03)
+        self.inputs[0].set(1)
+        event = self.events.get(timeout=2)
+        self.assertEqual(event['value'], 1)
+        self.assertTrue(first_edge <= event['monotonic'] < second_edge)
+
+    def test_callback_may_remove_its_input(self):
+        removed = []
+
+        def one_shot(event):
+            removed.append(self.dispatcher.remove_input(event['pin']))
+
+        self.dispatcher.add_input(self.inputs[0], callback=one_shot)
+        self.dispatcher.add_input(self.inputs[1])
+        self.dispatcher.start()
+        self.inputs[0].set(1)
+        self.assertEqual(self.events.get(timeout=2)['pin'], 17)
+        self.inputs[1].set(1)
+        self.assertEqual(self.events.get(timeout=2)['pin'], 27)  # the dispatcher is still running
+        self.assertEqual(removed, [self.inputs[0]])
+        self.assertEqual([record['control'] for record in self.dispatcher.inputs.values()], [self.inputs[1]])
+
+    def test_removed_input_is_ignored(self):
+        self.dispatcher.add_input(self.inputs[0])
+        self.dispatcher.start()
+        self.assertIs(self.dispatcher.remove_input(17), self.inputs[0])
+        self.inputs[0].set(1)
+        time.sleep(0.05)
+        self.assertTrue(self.events.empty())
+
+    def test_controls_created_by_the_dispatcher_are_closed(self):
+        dispatcher = GPIOEventDispatcher()
+        created = {}
+
+        def make_control(gpio_num, *args):
+            created[gpio_num] = FakeInput(gpio_num)
+            self.addCleanup(created[gpio_num].close)
+            return created[gpio_num]
+
+        with mock.patch('hardware_interface.gpiocontrol.GPIOControl', side_effect=make_control):
+            dispatcher.add_input(5)
+            dispatcher.add_input(6)
+        dispatcher.add_input(self.inputs[0])
+        dispatcher.remove_input(5)
+        self.assertEqual(created[5].receiver.fileno(), -1)
+        self.assertNotEqual(created[6].receiver.fileno(), -1)
+        dispatcher.close()
+        self.assertEqual(created[6].receiver.fileno(), -1)
+        self.assertNotEqual(self.inputs[0].receiver.fileno(), -1)  # passed in, so the caller closes it
+
+    def test_unopened_pin_is_rejected(self):
+        root = make_sysfs([])
+        with self.assertLogs(level='ERROR'), self.assertRaisesRegex(OSError, 'GPIO 23 has no open value file'):
+            self.dispatcher.add_input(23, gpio_root=root)
+        self.assertEqual(self.dispatcher.inputs, {})
+
+
+class TestEdgeConfiguration(unittest.TestCase):
+    def test_edge_attribute_is_written_once(self):
+        root = make_sysfs([22])
+        control = GPIOControl(22, 'in', root, edge='falling')
+        self.assertEqual(read(root, 22, 'edge'), 'falling')
+        control.set_edge('falling')
+        with self.assertRaises(ValueError):
+            control.set_edge('sometimes')
+        control.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
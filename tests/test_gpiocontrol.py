@@ -0,0 +1,75 @@
+"""Tests for GPIOControl and GPIOBank against a fake sysfs GPIO tree."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from hardware_interface import GPIOBank, GPIOControl
+from hardware_interface.gpiocontrol import benchmark
+
+
+def make_sysfs(pins):
+    root = tempfile.mkdtemp()
+    for name in ('export', 'unexport'):
+        open(os.path.join(root, name), 'w').close()
+    for pin in pins:
+        os.makedirs(os.path.join(root, f'gpio{pin}'))
+        for name, content in (('direction', 'in\n'), ('value', '0\n'), ('edge', 'none\n')):
+            with open(os.path.join(root, f'gpio{pin}', name), 'w') as f:
+                f.write(content)
+    return root
+
+
+def read(root, pin, name):
+    with open(os.path.join(root, f'gpio{pin}', name)) as f:
+        return f.read()
+
+
+class TestGPIOControl(unittest.TestCase):
+    def setUp(self):
+        self.root = make_sysfs([4, 5, 6])
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_persistent_descriptor(self):
+        control = GPIOControl(4, gpio_root=self.root)
+        fd = control.fd
+        self.assertEqual(read(self.root, 4, 'direction'), 'out')
+        control.set_high()
+        self.assertEqual(read(self.root, 4, 'value')[0], '1')
+        self.assertEqual(control.read_value(), '1')
+        control.write_value(0)
+        self.assertEqual(control.read_value(), '0')
+        self.assertEqual(control.fd, fd)
+        control.cleanup()
+        self.assertIsNone(control.fd)
+        with open(os.path.join(self.root, 'unexport')) as f:
+            self.assertEqual(f.read(), '4')
+
+    def test_direction_is_cached(self):
+        control = GPIOControl(5, direction='in', gpio_root=self.root)
+        os.remove(os.path.join(self.root, 'gpio5', 'direction'))  # a rewrite would now fail
+        control.set_direction('in')
+        with self.assertRaises(ValueError):
+            control.set_direction('sideways')
+        control.close()
+
+    def test_bank_reads_and_writes_many_pins(self):
+        bank = GPIOBank([4, 5, 6], direction={4: 'out', 5: 'out', 6: 'in'}, gpio_root=self.root)
+        self.assertEqual(bank.directions, {4: 'out', 5: 'out', 6: 'in'})
+        bank.write({4: 1, 5: True})
+        self.assertEqual(bank.read(), {4: 1, 5: 1, 6: 0})
+        bank.write_all(0)
+        self.assertEqual(bank.read([4, 5]), {4: 0, 5: 0})
+        bank.set_directions({6: 'out'})
+        self.assertEqual(read(self.root, 6, 'direction'), 'out')
+        bank.close()
+
+    def test_benchmark_reports_speedup(self):
+        result = benchmark(4, iterations=200, gpio_root=self.root)
+        self.assertGreater(result['speedup'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Tests for GPS publish decimation and track simplification."""
+
+import json
+import math
+import random
+import unittest
+from handlers import GPSHandler
+from handlers.gps_decimator import GPSDecimator, douglas_peucker, haversine, local_metres, simplify_fixes
+
+
+def fix(second, latitude, longitude=5.0, speed=0.0, track=0.0):
+    return {'latitude': latitude, 'longitude': longitude, 'speed': speed, 'track': track,
+            'timestamp': 1_700_000_000 + second}
+
+
+class TestGPSDecimator(unittest.TestCase):
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine(52.0, 5.0, 53.0, 5.0), 111195, delta=5)
+        self.assertAlmostEqual(haversine(0.0, 0.0, 0.0, 1.0), 111195, delta=5)
+
+    def test_stationary_station_sends_heartbeats_only(self):
+        random.seed(3)
+        decimator = GPSDecimator(min_distance=25, max_interval=300)
+        published = [second for second in range(3600)
+                     if decimator.filter(fix(second, 52.0 + random.gauss(0, 2e-5), speed=random.uniform(0, 0.3),
+                                             track=random.uniform(0, 360)))]
+        self.assertEqual(published, list(range(0, 3600, 300)))
+        self.assertGreater(decimator.reduction(), 0.99)
+
+    def test_moving_unit_publishes_on_distance_speed_and_heading(self):
+        decimator = GPSDecimator(min_distance=25, heading_change=20, speed_change=2, max_interval=300)
+        self.assertEqual(decimator.reason(fix(0, 52.0, speed=5.0)), 'first')
+        decimator.filter(fix(0, 52.0, speed=5.0))
+        self.assertIsNone(decimator.reason(fix(1, 52.0001, speed=5.0)))
+        self.assertEqual(decimator.reason(fix(5, 52.00025, speed=5.0)), 'distance')
+        self.assertEqual(decimator.reason(fix(1, 52.0001, speed=8.0)), 'speed')
+        self.assertEqual(decimator.reason(fix(1, 52.0001, speed=5.0, track=45.0)), 'heading')
+        self.assertEqual(decimator.reason(fix(300, 52.0001, speed=5.0)), 'interval')
+
+    def test_live_fixes_use_the_monotonic_receive_time(self):
+        decimator = GPSDecimator(min_distance=25, max_interval=300)
+        decimator.filter(dict(fix(0, 52.0), monotonic=1000.0))
+        # The wall clock stepped back an hour, but 300 s really passed
+        self.assertEqual(decimator.reason(dict(fix(-3300, 52.0), monotonic=1300.0)), 'interval')
+        self.assertIsNone(decimator.reason(dict(fix(3600, 52.0), monotonic=1010.0)))
+
+    def test_handler_publishes_decimated_fixes(self):
+        handler = GPSHandler(decimator=GPSDecimator(min_distance=25, max_interval=300), autostart=False)
+        report = {'class': 'TPV', 'mode': 2, 'lat': 52.0, 'lon': 5.0, 'speed': 0.1}
+        handler.handle_line(json.dumps(report))
+        self.assertEqual(handler.fetch_telemetry(),
+                         {'latitude': 52.0, 'longitude': 5.0, 'altitude': None, 'speed': 0.1, 'track': None})
+        handler.handle_line(json.dumps(dict(report, lat=52.00001)))
+        self.assertIsNone(handler.fetch_telemetry())
+        self.assertIsNotNone(handler.fetch_data())
+        handler.handle_line(json.dumps(dict(report, lat=52.001)))
+        self.assertEqual(handler.fetch_telemetry()['latitude'], 52.001)
+
+    def test_douglas_peucker_keeps_corners_only(self):
+        # An L-shaped track sampled every metre with 0.5 m of noise
+        random.seed(5)
+        points = [(i, random.uniform(-0.5, 0.5)) for i in range(100)] + [(100 + random.uniform(-0.5, 0.5), i)
+                                                                          for i in range(100)]
+        x, y = zip(*points)
+        keep = douglas_peucker(list(x), list(y), tolerance=2.0)
+        self.assertLessEqual(keep.sum(), 5)
+        self.assertTrue(keep[0] and keep[-1])
+
+    def test_simplified_track_stays_within_tolerance(self):
+        track = [fix(second, 52.0 + second * 2e-5, 5.0 + 1e-4 * math.sin(second / 60)) for second in range(1800)]
+        simplified = simplify_fixes(track, tolerance=5.0)
+        self.assertLess(len(simplified), len(track) * 0.1)
+        x, y = local_metres([f['latitude'] for f in track], [f['longitude'] for f in track])
+        kept = [track.index(f) for f in simplified]
+        for first, last in zip(kept, kept[1:]):
+            dx, dy = x[last] - x[first], y[last] - y[first]
+            for index in range(first + 1, last):
+                distance = abs((x[index] - x[first]) * dy - (y[index] - y[first]) * dx) / math.hypot(dx, dy)
+                self.assertLessEqual(distance, 5.0)
+        with_interval = simplify_fixes(track, tolerance=5.0, max_interval=60)
+        gaps = [b['timestamp'] - a['timestamp'] for a, b in zip(with_interval, with_interval[1:])]
+        self.assertLessEqual(max(gaps), 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
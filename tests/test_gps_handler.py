@@ -0,0 +1,108 @@
+"""Tests for the background gpsd reader in GPSHandler."""
+
+import json
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+from handlers import GPSHandler
+
+
+class FakeGpsd:
+    """Accepts connections and sends whatever lines the test queues."""
+
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+        self.connections = []
+        self.commands = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            self.commands.append(connection.recv(1024))
+            self.connections.append(connection)
+
+    def send(self, *reports):
+        payload = b''.join((r if isinstance(r, bytes) else json.dumps(r).encode()) + b'\n' for r in reports)
+        self.connections[-1].sendall(payload)
+
+    def close(self):
+        self.server.close()
+        for connection in self.connections:
+            connection.close()
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+TPV = {'class': 'TPV', 'mode': 3, 'time': '2026-10-19T10:00:00.000Z', 'lat': 52.1, 'lon': 5.2, 'altMSL': 3.5,
+       'speed': 0.4, 'track': 90.0, 'eph': 2.1}
+
+
+class TestGPSHandler(unittest.TestCase):
+    def setUp(self):
+        self.gpsd = FakeGpsd()
+        self.handler = GPSHandler(port=self.gpsd.port, read_timeout=0.5, reconnect_delay=0.05)
+
+    def tearDown(self):
+        self.handler.cleanup()
+        self.gpsd.close()
+
+    def test_latest_fix_is_cached(self):
+        self.assertTrue(wait_until(lambda: self.gpsd.connections))
+        self.assertIsNone(self.handler.fetch_data())
+        self.assertIn(b'?WATCH=', self.gpsd.commands[0])
+        self.gpsd.send({'class': 'VERSION'}, {'class': 'SKY', 'satellites': []}, TPV)
+        self.assertTrue(wait_until(lambda: self.handler.fetch_data() is not None))
+        fix = self.handler.fetch_data()
+        self.assertEqual((fix['latitude'], fix['longitude'], fix['altitude'], fix['mode']), (52.1, 5.2, 3.5, 3))
+        self.assertIsNone(self.handler.fetch_data(max_age=1e-9))
+        self.gpsd.send(b'{"class": "TPV", broken', {'class': 'SKY', 'satellites': []})
+        self.assertTrue(wait_until(lambda: self.handler.malformed_reports == 1))
+        self.assertEqual(self.handler.fetch_data()['latitude'], 52.1)  # other reports keep the fix
+        self.gpsd.send(dict(TPV, mode=1, lat=None))
+        self.assertTrue(wait_until(lambda: self.handler.fix_mode == 1))
+        self.assertIsNone(self.handler.fetch_data())  # a lost fix is not reported as current
+
+    def test_freshness_ignores_wall_clock_steps(self):
+        self.handler.handle_line(json.dumps(TPV))
+        with mock.patch('handlers.gps_handler.time.time', return_value=time.time() + 86400):
+            self.assertIsNotNone(self.handler.fetch_data())
+        with mock.patch('handlers.gps_handler.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertIsNone(self.handler.fetch_data())
+
+    def test_silent_gpsd_is_reconnected(self):
+        self.assertTrue(wait_until(lambda: self.gpsd.connections))
+        started = time.monotonic()
+        self.assertIsNone(self.handler.fetch_data())
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertTrue(wait_until(lambda: self.handler.connects >= 2))
+
+    def test_unreachable_gpsd_does_not_block(self):
+        self.gpsd.close()
+        self.handler.cleanup()
+        handler = GPSHandler(port=self.gpsd.port, connect_timeout=0.2, reconnect_delay=0.05)
+        try:
+            time.sleep(0.2)
+            self.assertFalse(handler.connected)
+            self.assertIsNone(handler.fetch_data())
+        finally:
+            handler.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
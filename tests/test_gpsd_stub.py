@@ -0,0 +1,96 @@
+"""Tests for the gpsd stand-in and its log replay."""
+
+import time
+import unittest
+from handlers import GPSHandler
+from handlers.gpsd_stub import GpsdStub, parse_gpsd_json, parse_nmea, synthetic_reports
+
+
+def sentence(body):
+    checksum = 0
+    for char in body:
+        checksum ^= ord(char)
+    return f"${body}*{checksum:02X}"
+
+
+NMEA_LOG = [
+    sentence('GPGGA,120000.00,5206.0000,N,00512.0000,E,1,08,0.9,3.5,M,46.9,M,,'),
+    sentence('GPRMC,120000.00,A,5206.0000,N,00512.0000,E,1.944,90.0,191026,,,A'),
+    sentence('GPGGA,120001.00,5206.0010,N,00512.0000,E,0,00,,,M,,M,,'),
+    sentence('GPRMC,120001.00,V,,,,,,,191026,,,N'),
+    '$GPRMC,120002.00,A,5206.0020,N,00512.0000,E,1.944,90.0,191026,,,A*00',  # bad checksum
+]
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestGpsdStub(unittest.TestCase):
+    def test_nmea_becomes_tpv(self):
+        reports = parse_nmea(NMEA_LOG)
+        self.assertEqual([offset for offset, _ in reports], [0.0, 1.0])
+        first = reports[0][1]
+        self.assertEqual((first['mode'], first['lat'], first['lon'], first['altMSL']), (3, 52.1, 5.2, 3.5))
+        self.assertAlmostEqual(first['speed'], 1.0, places=2)
+        self.assertEqual(first['time'], '2026-10-19T12:00:00.000Z')
+        self.assertEqual(reports[1][1]['mode'], 1)
+        self.assertNotIn('lat', reports[1][1])
+
+    def test_gpsd_json_log_is_timed_by_tpv(self):
+        lines = ['{"class":"SKY","satellites":[]}', '{"class":"TPV","mode":3,"time":"2026-10-19T12:00:00Z"}',
+                 'garbage', '{"class":"TPV","mode":3,"time":"2026-10-19T12:00:02.5Z"}']
+        self.assertEqual([offset for offset, _ in parse_gpsd_json(lines)], [0.0, 0.0, 2.5])
+
+    def test_replay_with_fix_loss_and_malformed_reports(self):
+        reports = synthetic_reports(200, rate=10.0)
+        with GpsdStub(reports, speed=1000, fix_loss=[(5.0, 10.0)], malformed_rate=0.1, seed=2) as stub:
+            handler = GPSHandler(port=stub.port, reconnect_delay=60.0)
+            try:
+                self.assertTrue(wait_until(lambda: stub.stats()['reports_sent'] == 200))
+                self.assertTrue(wait_until(lambda: handler.reports_parsed + handler.malformed_reports == 203))
+                stats = stub.stats()
+                self.assertEqual(stats['fixes_lost'], 50)
+                self.assertEqual(handler.malformed_reports, stats['malformed_sent'])
+                self.assertGreater(stats['malformed_sent'], 0)
+                fix = handler.fetch_data()
+                self.assertIsNotNone(fix)
+                self.assertAlmostEqual(fix['latitude'], reports[-1][1]['lat'], delta=1e-3)
+            finally:
+                handler.cleanup()
+
+    def test_fix_loss_clears_the_current_fix(self):
+        reports = synthetic_reports(200, rate=10.0)
+        with GpsdStub(reports, speed=1000, fix_loss=[(15.0, 25.0)]) as stub:
+            handler = GPSHandler(port=stub.port, reconnect_delay=60.0)
+            seen = []
+            handle_line = handler.handle_line
+            handler.handle_line = lambda line: seen.append(handle_line(line) is not None)
+            try:
+                self.assertTrue(wait_until(lambda: handler.reports_parsed == 203))
+                self.assertIn(True, seen)
+                self.assertEqual(handler.fix_mode, 1)
+                self.assertIsNone(handler.fetch_data())
+                self.assertIsNone(handler.fetch_telemetry())
+            finally:
+                handler.cleanup()
+
+    def test_bursts_and_dropped_connections(self):
+        with GpsdStub(synthetic_reports(100, rate=10.0), speed=1000, burst_every=20, burst_size=5,
+                      disconnect_after=5.0) as stub:
+            handler = GPSHandler(port=stub.port, reconnect_delay=0.05)
+            try:
+                self.assertTrue(wait_until(lambda: handler.connects >= 2))
+                self.assertGreaterEqual(stub.stats()['bursts'], 2)
+                self.assertIsNotNone(handler.fetch_data())
+            finally:
+                handler.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
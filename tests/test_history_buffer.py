@@ -0,0 +1,88 @@
+"""Tests for the per-channel ring buffer history."""
+
+import unittest
+import numpy as np
+from models import HistoryStore, RingBuffer
+from models.sensor import TemperatureSensor
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_wraparound_and_time_range(self):
+        buffer = RingBuffer(10)
+        for t in range(25):
+            buffer.append(float(t), t * 2.0, t % 2)
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual(buffer.last(), (24.0, 48.0, 0))
+
+        timestamps, values, quality = buffer.range()
+        np.testing.assert_array_equal(timestamps, np.arange(15, 25))
+        np.testing.assert_array_equal(values, np.arange(15, 25) * 2)
+        np.testing.assert_array_equal(quality, np.arange(15, 25) % 2)
+
+        timestamps, values, _ = buffer.range(17.5, 22)
+        np.testing.assert_array_equal(timestamps, [18, 19, 20, 21, 22])
+        np.testing.assert_array_equal(buffer.latest(3)[1], [44, 46, 48])
+        self.assertEqual(len(buffer.range(100)[0]), 0)
+
+    def test_views_are_zero_copy(self):
+        buffer = RingBuffer(8)
+        for t in range(6):
+            buffer.append(float(t), float(t))
+        (timestamps, values, _), = buffer.range_views(1, 4)
+        self.assertTrue(np.shares_memory(values, np.frombuffer(buffer.values)))
+        np.testing.assert_array_equal(values, [1, 2, 3, 4])
+
+        for t in range(6, 10):  # wraps: samples 2..9 live in two segments
+            buffer.append(float(t), float(t))
+        self.assertEqual(len(buffer.range_views()), 2)
+        np.testing.assert_array_equal(buffer.range(5, 8)[0], [5, 6, 7, 8])
+
+    def test_out_of_order_samples_are_rejected(self):
+        buffer = RingBuffer(4)
+        self.assertTrue(buffer.append(10.0, 1.0))
+        self.assertFalse(buffer.append(9.0, 2.0))
+        self.assertEqual(buffer.rejected, 1)
+        self.assertEqual(len(buffer), 1)
+
+
+class TestHistoryStore(unittest.TestCase):
+    def test_per_channel_capacity_and_sensor_hook(self):
+        history = HistoryStore(default_capacity=5, capacities={'1.Temperature': 100})
+        sensor = TemperatureSensor(1, 'Temperature', history=history.channel('1', 'Temperature'))
+        for _ in range(3):
+            sensor.read_data()
+        self.assertEqual(history.channel('1', 'Temperature').capacity, 100)
+        np.testing.assert_array_equal(history.query('1', 'Temperature')[1], [25, 25, 25])
+        history.append('radar1', 'distance', 1.0, 2.0)
+        self.assertEqual(history.memory_bytes(), (100 + 5) * 17)
+        self.assertEqual(len(history.query('missing', 'channel')[0]), 0)
+
+    def test_sensor_history_takes_numeric_values_and_dict_fields(self):
+        history = HistoryStore(default_capacity=10)
+        sensor = TemperatureSensor('ph1', 'pH', history=history)
+        sensor.update_last_read({'pH': 7.1, 'pH_raw': 7.3, 'unit': 'pH'}, timestamp=100.0)
+        sensor.update_last_read(7.2, timestamp=101.0)
+        self.assertEqual(history.channels(), [('ph1', 'pH'), ('ph1', 'pH_raw')])
+        np.testing.assert_array_equal(history.query('ph1', 'pH_raw')[1], [7.3])
+
+        buffer = RingBuffer(4)
+        sensor = TemperatureSensor('ph2', 'pH', history=buffer)
+        sensor.update_last_read({'pH': 7.1}, timestamp=100.0)
+        sensor.update_last_read('offline', timestamp=100.0)
+        self.assertEqual(len(buffer), 0)
+
+    def test_sensor_logs_samples_rejected_after_a_clock_step(self):
+        buffer = RingBuffer(4)
+        sensor = TemperatureSensor(1, 'Temperature', history=buffer)
+        sensor.update_last_read(25.0, timestamp=1000.0)
+        with self.assertLogs(sensor.logger, 'WARNING') as logs:
+            sensor.update_last_read(25.5, timestamp=10.0)
+            sensor.update_last_read(26.0, timestamp=11.0)
+        self.assertEqual(len(logs.records), 1)  # once per run of rejected samples
+        self.assertEqual(buffer.rejected, 2)
+        sensor.update_last_read(26.5, timestamp=1001.0)
+        self.assertEqual(buffer.last()[:2], (1001.0, 26.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
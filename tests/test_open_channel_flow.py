@@ -0,0 +1,63 @@
+"""Tests for the open-channel flow engine and its hydraulic models."""
+
+import math
+import os
+import unittest
+import numpy as np
+from calibration import CalibrationManager
+from state_manager.open_channel_flow import (GRAVITY, ManningChannel, OpenChannelFlowEngine, ParshallFlume,
+                                             RectangularWeir, VNotchWeir, build_model)
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(__file__), '..', 'calibration', 'calibration_data.json')
+
+
+class TestHydraulicModels(unittest.TestCase):
+    def test_closed_form_values(self):
+        self.assertAlmostEqual(float(VNotchWeir(90, 0.58).flow(0.1)),
+                               8 / 15 * 0.58 * math.sqrt(2 * GRAVITY) * 0.1 ** 2.5)
+        self.assertAlmostEqual(float(RectangularWeir(1.0, 0.62, end_contractions=2).flow(0.2)),
+                               2 / 3 * 0.62 * math.sqrt(2 * GRAVITY) * (1.0 - 0.04) * 0.2 ** 1.5)
+        self.assertAlmostEqual(float(ParshallFlume(0.3048).flow(0.3)), 0.6909 * 0.3 ** 1.522)
+        diameter, slope, roughness = 0.6, 0.002, 0.013
+        full = 1 / roughness * math.pi * diameter ** 2 / 4 * (diameter / 4) ** (2 / 3) * math.sqrt(slope)
+        pipe = ManningChannel(slope, roughness, diameter=diameter)
+        self.assertAlmostEqual(float(pipe.flow(diameter)), full, places=6)
+        self.assertEqual(float(pipe.flow(0.0)), 0.0)
+        channel = ManningChannel(0.001, 0.015, bottom_width=2.0)
+        self.assertAlmostEqual(float(channel.flow(0.5)), 1 / 0.015 * 1.0 * (1.0 / 3.0) ** (2 / 3) * math.sqrt(0.001))
+
+    def test_invalid_specs(self):
+        with self.assertRaises(ValueError):
+            build_model({'model': 'orifice'})
+        with self.assertRaises(ValueError):
+            ParshallFlume(0.5)
+        with self.assertRaises(ValueError):
+            ManningChannel(0.001, bottom_width=1.0, diameter=0.5)
+
+
+class TestOpenChannelFlowEngine(unittest.TestCase):
+    def test_rating_table_matches_model(self):
+        for spec in ({'model': 'v_notch', 'angle': 60}, {'model': 'rectangular_weir', 'crest_width': 0.5},
+                     {'model': 'parshall', 'throat_width': 0.1524},
+                     {'model': 'manning', 'slope': 0.002, 'diameter': 0.8}):
+            engine = OpenChannelFlowEngine(spec, max_level=0.8)
+            levels = np.linspace(0.01, 0.8, 500)
+            exact = engine.model.flow(levels) * 3600
+            np.testing.assert_allclose(engine.flows(levels), exact, rtol=1e-4, err_msg=spec['model'])
+
+    def test_radar_distance_to_flow(self):
+        manager = CalibrationManager(CALIBRATION_FILE)
+        engine = OpenChannelFlowEngine.from_config(
+            {'model': {'model': 'v_notch', 'angle': 90}, 'max_level': 1.0, 'sensor_height': 300.0,
+             'units_per_meter': 100.0}, calibration_manager=manager)
+        # 195 measured -> 200 actual -> 200 * 1.05 + 0.3 = 210.3 -> level (300 - 210.3) / 100 m
+        result = engine.calculate_flow(195)
+        self.assertAlmostEqual(result['water_level'], 0.897)
+        self.assertAlmostEqual(result['flow_rate'], float(engine.model.flow(0.897)) * 3600, delta=1e-3)
+        np.testing.assert_allclose(engine.flows([195, 195]), [result['flow_rate']] * 2)
+        self.assertEqual(engine.calculate_flow(400)['flow_rate'], 0.0)
+        self.assertIsNone(engine.calculate_flow(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+"""Tests for the Nernst-slope pH temperature compensation."""
+
+import math
+import os
+import unittest
+import numpy as np
+from calibration import CalibrationManager, PHTemperatureCompensation, compensate_ph
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(__file__), '..', 'calibration', 'calibration_data.json')
+
+
+class TestPHCompensation(unittest.TestCase):
+    def test_scalar(self):
+        self.assertAlmostEqual(compensate_ph(9.0, 25.0), 9.0)
+        self.assertAlmostEqual(compensate_ph(7.0, 60.0), 7.0)
+        self.assertAlmostEqual(compensate_ph(9.0, 50.0), 7 + 2 * 298.15 / 323.15)
+        self.assertAlmostEqual(compensate_ph(4.0, 0.0), 7 - 3 * 298.15 / 273.15)
+        self.assertIsNone(compensate_ph(9.0, None))
+
+    def test_block_matches_scalar(self):
+        compensation = PHTemperatureCompensation(reference_temperature=25)
+        ph = np.array([4.0, 6.5, 7.0, 9.2, 10.0])
+        temperature = np.array([5.0, 15.0, 30.0, 40.0, -300.0])
+        result = compensation.apply(ph, temperature)
+        np.testing.assert_allclose(result[:4], [compensation(p, t) for p, t in zip(ph[:4], temperature[:4])])
+        self.assertTrue(math.isnan(result[4]))
+        with self.assertRaises(ValueError):
+            compensation.apply([7.0, 8.0], [25.0])
+
+    def test_reference_temperature_from_calibration_file(self):
+        compensation = CalibrationManager(CALIBRATION_FILE).ph_compensation()
+        self.assertEqual(compensation.reference_temperature, 25.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
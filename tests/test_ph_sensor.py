@@ -0,0 +1,53 @@
+"""Tests for the pH sensor's single-transaction block read and temperature compensation."""
+
+import os
+import unittest
+from unittest import mock
+import numpy as np
+from calibration import CalibrationManager, PHTemperatureCompensation
+from tests.test_sensor_calibration import StubModbusDevice, import_sensor_module
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(__file__), '..', 'calibration', 'calibration_data.json')
+
+
+class TestPHSensor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ph_sensor = import_sensor_module('ph_sensor')
+
+    def setUp(self):
+        calibration = CalibrationManager(CALIBRATION_FILE)
+        self.compensation = mock.Mock(wraps=PHTemperatureCompensation(reference_temperature=25.0))
+        self.sensor = self.ph_sensor.PHSensor('/dev/null', 1, calibration=calibration.bind('pH'),
+                                              compensation=self.compensation)
+        registers = {self.sensor.PH_VALUE_REGISTER: 4.2, self.sensor.PH_TEMPERATURE_REGISTER: 50.0}
+        patcher = mock.patch.dict(StubModbusDevice.registers, registers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_block_uses_one_register_read(self):
+        telemetry = self.sensor.read_block()
+        self.assertEqual(self.sensor.modbus_device.reads, [(self.sensor.PH_VALUE_REGISTER, self.sensor.BLOCK_COUNT)])
+        self.assertEqual(set(telemetry), {'pH', 'pH_raw', 'temperature'})
+        self.assertAlmostEqual(telemetry['pH_raw'], 10.0)
+        self.assertEqual(telemetry['temperature'], 50.0)
+        self.assertAlmostEqual(telemetry['pH'], 7 + 3 * 298.15 / 323.15)
+        self.assertEqual(self.sensor.read_data(), telemetry)
+
+    def test_read_block_without_compensation_returns_raw_ph(self):
+        self.sensor.compensation = None
+        telemetry = self.sensor.read_block()
+        self.assertEqual(telemetry['pH'], telemetry['pH_raw'])
+
+    def test_compensate_samples_applies_compensation(self):
+        ph = np.array([4.0, 7.0, 10.0])
+        temperature = np.array([10.0, 25.0, 50.0])
+        result = self.sensor.compensate_samples(ph, temperature)
+        self.compensation.apply.assert_called_once_with(ph, temperature)
+        np.testing.assert_allclose(result, [self.compensation(p, t) for p, t in zip(ph, temperature)])
+        self.sensor.compensation = None
+        self.assertIs(self.sensor.compensate_samples(ph, temperature), ph)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""Tests for the PostgreSQL COPY sink, using an in-memory stand-in for the connection pool."""
+
+import struct
+import time
+import unittest
+from datetime import datetime, timezone
+from storage import PostgresSink
+from storage.postgres_sink import COPY_SIGNATURE, encode_binary, encode_csv, partition_ddl
+
+
+class FakeDatabase:
+    """Records what a sink does over its pool; ingest_batches is honoured so idempotency can be checked."""
+
+    def __init__(self, fail_copies=0):
+        self.batch_ids = set()
+        self.rows = []
+        self.statements = []
+        self.fail_copies = fail_copies
+        self.closed = False
+        self.used_after_close = 0
+
+    def getconn(self):
+        if self.closed:
+            self.used_after_close += 1
+        return FakeConnection(self)
+
+    def putconn(self, connection, close=False):
+        if self.closed:
+            self.used_after_close += 1
+
+    def closeall(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+        self.pending_ids = set()
+        self.pending_rows = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.database.batch_ids |= self.pending_ids
+        self.database.rows.extend(self.pending_rows)
+        self.pending_ids, self.pending_rows = set(), []
+
+    def rollback(self):
+        self.pending_ids, self.pending_rows = set(), []
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        self.connection.database.statements.append(sql)
+        if sql.startswith('INSERT INTO ingest_batches'):
+            batch_id = params[0]
+            new = batch_id not in self.connection.database.batch_ids
+            self.rowcount = 1 if new else 0
+            if new:
+                self.connection.pending_ids.add(batch_id)
+
+    def copy_expert(self, sql, file):
+        database = self.connection.database
+        if database.fail_copies:
+            database.fail_copies -= 1
+            raise ConnectionError("server closed the connection unexpectedly")
+        self.connection.pending_rows.extend(file.read().splitlines())
+
+
+class TestPostgresSink(unittest.TestCase):
+    def setUp(self):
+        self.rows = [(1709251200.5, 'radar1', 'distance', 101.25, 0), (1709251201.5, 'ph1', 'pH', None, 2)]
+
+    def test_encoders(self):
+        self.assertEqual(encode_csv(self.rows).read().splitlines(),
+                         ['2024-03-01T00:00:00.500000+00:00,radar1,distance,101.25,0',
+                          '2024-03-01T00:00:01.500000+00:00,ph1,pH,,2'])
+        data = encode_binary(self.rows[:1]).read()
+        self.assertTrue(data.startswith(COPY_SIGNATURE))
+        self.assertTrue(data.endswith(struct.pack('!h', -1)))
+        offset = len(COPY_SIGNATURE) + 8
+        self.assertEqual(struct.unpack_from('!h', data, offset)[0], 5)
+        length, microseconds = struct.unpack_from('!iq', data, offset + 2)
+        self.assertEqual(microseconds, (1709251200.5 - datetime(2000, 1, 1, tzinfo=timezone.utc).timestamp()) * 1e6)
+
+    def test_partition_ddl(self):
+        name, ddl = partition_ddl(datetime(2024, 12, 1, tzinfo=timezone.utc))
+        self.assertEqual(name, 'readings_2024_12')
+        self.assertIn("TO ('2025-01-01T00:00:00+00:00')", ddl)
+
+    def test_retried_batch_is_stored_once(self):
+        database = FakeDatabase(fail_copies=1)
+        sink = PostgresSink(pool=database, retry_interval=0.001)
+        sink.start()
+        batch_id = sink.submit(self.rows)
+        self.assertTrue(sink.flush(5))
+        self.assertEqual(len(database.rows), 2)
+        self.assertEqual(sink.retries, 1)
+        partition_statements = sum('PARTITION OF readings' in sql for sql in database.statements)
+
+        self.assertIs(sink.write_batch(batch_id, self.rows), False)
+        self.assertEqual(len(database.rows), 2)
+        self.assertEqual(sink.duplicate_batches, 1)
+        # The partition is known to exist after the committed batch, so it is not created again
+        self.assertEqual(sum('PARTITION OF readings' in sql for sql in database.statements), partition_statements)
+        sink.close()
+
+    def test_buffer_is_bounded(self):
+        sink = PostgresSink(pool=FakeDatabase(), max_buffered_rows=3)
+        for _ in range(3):
+            sink.submit(self.rows)
+        self.assertEqual(sink.buffered_rows, 2)
+        self.assertEqual(sink.dropped_rows, 4)
+
+    def test_close_interrupts_retries_before_closing_the_pool(self):
+        database = FakeDatabase(fail_copies=100)
+        sink = PostgresSink(pool=database, pool_size=1, retry_interval=2.0)
+        sink.start()
+        sink.submit(self.rows)
+        deadline = time.monotonic() + 5
+        while sink.retries == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        started = time.monotonic()
+        sink.close(timeout=0)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertTrue(database.closed)
+        self.assertEqual(database.used_after_close, 0)
+        self.assertEqual(sink.retries, 1)
+        self.assertEqual(sink.dropped_rows, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
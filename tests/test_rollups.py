@@ -0,0 +1,103 @@
+"""Tests for the multi-tier rollup engine."""
+
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from storage import RollupEngine
+from storage.rollups import DAY, HOUR
+
+
+class TestRollupEngine(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engine = RollupEngine(self.directory, segment_capacity=4096, index_stride=64)
+        self.level = self.engine.channel_id('radar1', 'level')
+        self.ph = self.engine.channel_id('ph1', 'pH')
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _fill(self, seconds=3 * HOUR, chunk=997):
+        timestamps = np.repeat(np.arange(seconds, dtype=float), 2)
+        channels = np.tile([self.level, self.ph], seconds)
+        values = np.where(channels == self.level, timestamps, 7.0)
+        for begin in range(0, len(timestamps), chunk):
+            self.engine.append_many(timestamps[begin:begin + chunk], channels[begin:begin + chunk],
+                                    values[begin:begin + chunk])
+        return timestamps, values
+
+    def test_minute_and_hour_statistics(self):
+        self._fill()
+        minutes = self.engine.query(self.level, resolution=60)
+        self.assertEqual(minutes['tier'], 'minute')
+        self.assertEqual(len(minutes['timestamps']), 180)  # including the open last minute
+        np.testing.assert_array_equal(minutes['timestamps'][:3], [0, 60, 120])
+        np.testing.assert_array_equal(minutes['min'][:2], [0, 60])
+        np.testing.assert_array_equal(minutes['max'][:2], [59, 119])
+        np.testing.assert_allclose(minutes['mean'][:2], [29.5, 89.5])
+        np.testing.assert_array_equal(minutes['count'], 60)
+        hours = self.engine.query(self.level, resolution=4 * HOUR)
+        self.assertEqual(hours['tier'], 'hour')
+        np.testing.assert_array_equal(hours['timestamps'], [0, HOUR, 2 * HOUR])
+        np.testing.assert_allclose(hours['mean'], [1799.5, 5399.5, 8999.5])
+        np.testing.assert_array_equal(hours['count'], 3600)
+        ph_hours = self.engine.query(self.ph, resolution=HOUR)
+        np.testing.assert_array_equal(ph_hours['min'], 7.0)
+
+    def test_tier_selection(self):
+        self._fill(600)
+        self.assertEqual(self.engine.query(self.level, resolution=10)['tier'], 'raw')
+        self.assertEqual(self.engine.query(self.level, resolution=300)['tier'], 'minute')
+        self.assertEqual(self.engine.query(self.level, 0, 365 * DAY, max_points=1000)['tier'], 'hour')
+        raw = self.engine.query(self.level, 100, 109)
+        np.testing.assert_array_equal(raw['mean'], np.arange(100, 110))
+
+    def test_max_points_is_a_cap(self):
+        seconds = 2 * DAY + HOUR
+        timestamps = np.arange(0, seconds, 30.0)
+        self.engine.append_many(timestamps, np.full(len(timestamps), self.level), timestamps)
+        for start, end, max_points, tier in ((0, 2 * DAY, 1000, 'hour'), (0, 2 * DAY, 3000, 'minute'),
+                                             (0, 1000, 100, 'raw'), (0, 2 * DAY, 10, 'hour')):
+            result = self.engine.query(self.level, start, end, max_points=max_points)
+            self.assertLessEqual(len(result['timestamps']), max_points)
+            self.assertEqual(result['tier'], tier)
+        merged = self.engine.query(self.level, 0, 2 * DAY, max_points=10)
+        covered = timestamps[timestamps < 2 * DAY + HOUR]  # 49 hourly buckets start inside the span
+        self.assertEqual(merged['count'].sum(), len(covered))
+        np.testing.assert_allclose((merged['mean'] * merged['count']).sum(), covered.sum())
+        self.assertEqual((merged['min'][0], merged['max'][-1]), (0, covered[-1]))
+
+    def test_restart_recovers_open_buckets(self):
+        self._fill(HOUR + 90)
+        self.engine.close()
+        self.engine = RollupEngine(self.directory, segment_capacity=4096, index_stride=64)
+        timestamps = np.arange(HOUR + 90, 2 * HOUR + 30, dtype=float)
+        self.engine.append_many(timestamps, np.full(len(timestamps), self.level), timestamps)
+        minutes = self.engine.query(self.level, HOUR, HOUR + 120, resolution=60)
+        np.testing.assert_array_equal(minutes['count'], [60, 60, 60])
+        hours = self.engine.query(self.level, resolution=HOUR)
+        np.testing.assert_array_equal(hours['count'], [3600, 3600, 30])
+        np.testing.assert_allclose(hours['mean'][1], 5399.5)
+
+    def test_compaction_applies_retention(self):
+        engine = RollupEngine(tempfile.mkdtemp(dir=self.directory), retention={'raw': HOUR, 'minute': 2 * HOUR},
+                              segment_capacity=512, index_stride=64)
+        timestamps = np.arange(0, 6 * HOUR, 5.0)
+        engine.append_many(timestamps, np.zeros(len(timestamps)), np.ones(len(timestamps)))
+        self.assertGreater(engine.compact(), 0)
+        self.assertGreaterEqual(engine.query(0)['timestamps'][0], 4 * HOUR)
+        self.assertGreater(engine.query(0, resolution=60)['timestamps'][0], 0)
+        hours = engine.query(0, resolution=HOUR)
+        np.testing.assert_array_equal(hours['timestamps'], np.arange(6) * HOUR)
+        engine.close()
+
+    def test_out_of_order_batches_are_refused(self):
+        self._fill(120)
+        with self.assertRaises(ValueError):
+            self.engine.append(10, self.level, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests for the memory-mapped columnar segment archive."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from storage import SegmentArchive
+
+
+class TestSegmentArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = SegmentArchive(self.directory, segment_capacity=4096, index_stride=64)
+
+    def tearDown(self):
+        self.archive.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _fill(self, count=10000):
+        level = self.archive.channel_id('radar1', 'level')
+        ph = self.archive.channel_id('ph1', 'pH')
+        timestamps = np.repeat(np.arange(count // 2, dtype=float), 2)
+        channels = np.tile([level, ph], count // 2)
+        values = np.arange(count, dtype=float)
+        self.assertEqual(self.archive.append_many(timestamps, channels, values), count)
+        return level, ph
+
+    def test_range_query_across_segments(self):
+        level, ph = self._fill()
+        self.assertEqual(len(self.archive.segments), 3)
+        result = self.archive.query(1000, 3000)
+        np.testing.assert_array_equal(result['timestamps'], np.repeat(np.arange(1000, 3001, dtype=float), 2))
+        ph_only = self.archive.query(1000.5, 1002, channel_id=ph)
+        np.testing.assert_array_equal(ph_only['values'], [2003, 2005])
+        self.assertEqual(len(self.archive.query(6000)['values']), 0)
+
+    def test_single_segment_result_is_a_view_of_the_mapping(self):
+        self._fill()
+        result = self.archive.query(10, 20)
+        segment = self.archive.segments[0][1]
+        self.assertTrue(np.shares_memory(result['values'], segment.columns['values']))
+        self.assertFalse(result['values'].flags.owndata)
+
+    def test_locate_matches_searchsorted(self):
+        self._fill(4000)
+        segment = self.archive.segments[0][1]
+        timestamps = segment.columns['timestamps'][:segment.count]
+        for t in (-1, 0, 0.5, 63, 64, 127.5, 1999, 2000):
+            for side in ('left', 'right'):
+                self.assertEqual(segment.locate(t, side), np.searchsorted(timestamps, t, side), (t, side))
+
+    def test_reopen_and_retention(self):
+        level, _ = self._fill()
+        self.archive.close()
+        self.archive = SegmentArchive(self.directory, segment_capacity=4096, index_stride=64)
+        self.assertEqual(self.archive.channel_id('radar1', 'level'), level)
+        self.assertEqual(len(self.archive.query()['values']), 10000)
+        self.archive.append(5000, level, 1.0)
+        with self.assertRaises(ValueError):
+            self.archive.append(10, level, 1.0)
+
+        self.assertEqual(self.archive.drop_before(4200), 2)
+        self.assertEqual(len([name for name in os.listdir(self.directory) if name.endswith('.seg')]), 1)
+        self.assertEqual(self.archive.query()['timestamps'][0], 4096)
+
+
+if __name__ == '__main__':
+    unittest.main()
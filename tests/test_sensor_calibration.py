@@ -0,0 +1,74 @@
+"""Tests that the radar and turbidity sensors apply their calibration pipelines to register reads."""
+
+import importlib
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+import numpy as np
+from calibration import CalibrationManager
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(__file__), '..', 'calibration', 'calibration_data.json')
+
+
+class StubModbusDevice:
+    """Stands in for ModbusDevice: serves fixed register values and records every read."""
+
+    registers = {}
+
+    def __init__(self, port, slave_id, baudrate=9600):
+        self.reads = []
+        self.closed = False
+
+    def read_registers(self, address, count, unit=1):
+        self.reads.append((address, count))
+        return [self.registers.get(address + offset, 0) for offset in range(count)]
+
+    def close(self):
+        self.closed = True
+
+
+def import_sensor_module(name):
+    """Imports a device_manager sensor module with ModbusDevice replaced by StubModbusDevice,
+    so no serial port or pymodbus installation is needed."""
+    modbus_lib = types.ModuleType('device_manager.modbus_lib')
+    modbus_lib.ModbusDevice = StubModbusDevice
+    with mock.patch.dict(sys.modules, {'device_manager.modbus_lib': modbus_lib}):
+        sys.modules.pop(f'device_manager.{name}', None)
+        return importlib.import_module(f'device_manager.{name}')
+
+
+class TestSensorCalibration(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.radar_sensor = import_sensor_module('radar_sensor')
+        cls.turbidity_sensor = import_sensor_module('turbidity_sensor')
+
+    def setUp(self):
+        self.calibration = CalibrationManager(CALIBRATION_FILE)
+
+    def test_radar_distance_is_calibrated(self):
+        sensor = self.radar_sensor.RadarSensor('/dev/null', 1, calibration=self.calibration.bind('radar_level'))
+        with mock.patch.dict(StubModbusDevice.registers, {sensor.RADAR_DISTANCE_REGISTER: 195}):
+            self.assertAlmostEqual(sensor.read_distance(), 200 * 1.05 + 0.3)
+        self.assertEqual(sensor.modbus_device.reads, [(sensor.RADAR_DISTANCE_REGISTER, 1)])
+        block = np.array([98.0, 195.0, 294.0])
+        np.testing.assert_allclose(sensor.convert(block), self.calibration.apply('radar_level', block))
+        sensor.close()
+        self.assertTrue(sensor.modbus_device.closed)
+
+    def test_turbidity_is_calibrated(self):
+        sensor = self.turbidity_sensor.TurbiditySensor('/dev/null', 2, calibration=self.calibration.bind('turbidity'))
+        with mock.patch.dict(StubModbusDevice.registers, {sensor.TURBIDITY_REGISTER: 2.5}):
+            self.assertAlmostEqual(sensor.read_turbidity(), 100.0)
+        self.assertEqual(sensor.modbus_device.reads, [(sensor.TURBIDITY_REGISTER, 1)])
+
+    def test_uncalibrated_sensor_returns_raw_register(self):
+        sensor = self.radar_sensor.RadarSensor('/dev/null', 1)
+        with mock.patch.dict(StubModbusDevice.registers, {sensor.RADAR_DISTANCE_REGISTER: 195}):
+            self.assertEqual(sensor.read_distance(), 195)
+
+
+if __name__ == '__main__':
+    unittest.main()
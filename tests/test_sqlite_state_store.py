@@ -0,0 +1,68 @@
+"""Tests for the SQLite-backed state store and its JSON migration tool."""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from state_manager.sqlite_state_store import SQLiteStateManager, migrate_json_to_sqlite
+
+STATE_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'state.json')
+
+
+class TestSQLiteStateStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'state.db')
+        migrate_json_to_sqlite(STATE_JSON, self.db_path)
+        self.state_manager = SQLiteStateManager(self.db_path)
+
+    def tearDown(self):
+        self.state_manager.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_key_path_lookup(self):
+        self.assertEqual(self.state_manager.get_value('systemConfig.operationMode'), 'automatic')
+        self.assertEqual(self.state_manager.get_value('deviceStates.phSensor.lastCalibration'),
+                         {'highValue': 10.0, 'lowValue': 7.0})
+        self.assertIsNone(self.state_manager.get_value('deviceStates.missing'))
+
+    def test_prefix_query(self):
+        leaves = self.state_manager.get_prefix('deviceStates.phSensor.*')
+        self.assertEqual(set(leaves), {
+            'deviceStates.phSensor.isEnabled',
+            'deviceStates.phSensor.lastCalibration.highValue',
+            'deviceStates.phSensor.lastCalibration.lowValue',
+            'deviceStates.phSensor.lastReadTime',
+        })
+
+    def test_transactional_update_replaces_subtree(self):
+        self.state_manager.update_state({
+            'actuatorStates.pump.isRunning': True,
+            'deviceStates.phSensor.lastCalibration': {'highValue': 9.0},
+        })
+        self.assertTrue(self.state_manager.get_value('actuatorStates.pump.isRunning'))
+        self.assertEqual(self.state_manager.get_value('deviceStates.phSensor.lastCalibration'), {'highValue': 9.0})
+        self.assertEqual(self.state_manager.store.get_version('actuatorStates.pump.isRunning'), 2)
+
+    def test_leaf_becomes_subtree(self):
+        self.state_manager.set_value('userPreferences.uiTheme.name', 'light')
+        self.assertEqual(self.state_manager.get_value('userPreferences'),
+                         {'uiTheme': {'name': 'light'}, 'notificationsEnabled': True})
+
+    def test_concurrent_readers(self):
+        results = []
+
+        def reader():
+            results.append(self.state_manager.get_value('deviceStates.radarSensor.isEnabled'))
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [True] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Tests for StateManager dirty-path tracking and incremental cloud sync."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+from state_manager import StateManager
+from state_manager.state_manager import STATE_VERSIONS_KEY
+from thingsboard_client import ThingsBoardClient
+from thingsboard_client.broker_stub import ThingsBoardBrokerStub
+from thingsboard_client.load_generator import wait_for_connection
+
+
+class TestStateCloudSync(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.state_manager = StateManager(os.path.join(self.directory, 'state.json'), write_behind=True)
+        self.tb_client = MagicMock()
+        self.tb_client.publish_attributes.return_value.rc = 0
+
+    def tearDown(self):
+        self.state_manager.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_burst_is_coalesced_into_one_message(self):
+        for i in range(100):
+            self.state_manager.set_path('deviceStates.radarSensor.lastReadValue', i)
+        self.state_manager.set_value('systemStatus', 'running')
+
+        self.assertEqual(self.state_manager.sync_with_cloud(self.tb_client), 2)
+        self.tb_client.publish_attributes.assert_called_once()
+        attributes = self.tb_client.publish_attributes.call_args[0][0]
+        self.assertEqual(attributes['deviceStates.radarSensor.lastReadValue'], 99)
+        self.assertEqual(attributes['systemStatus'], 'running')
+        self.assertEqual(attributes[f'{STATE_VERSIONS_KEY}.deviceStates.radarSensor.lastReadValue'],
+                         self.state_manager.versions['deviceStates.radarSensor.lastReadValue'])
+        self.assertEqual(attributes[f'{STATE_VERSIONS_KEY}.systemStatus'], self.state_manager.versions['systemStatus'])
+        self.assertNotIn(STATE_VERSIONS_KEY, attributes)
+
+        # Nothing changed since, so nothing is sent
+        self.assertEqual(self.state_manager.sync_with_cloud(self.tb_client), 0)
+        self.assertEqual(self.tb_client.publish_attributes.call_count, 1)
+
+    def test_failed_publish_keeps_paths_dirty(self):
+        self.tb_client.publish_attributes.side_effect = ConnectionError("offline")
+        self.state_manager.set_path('actuatorStates.pump.isRunning', True)
+        self.assertEqual(self.state_manager.sync_with_cloud(self.tb_client), 0)
+        self.assertEqual(self.state_manager.dirty_paths(), {'actuatorStates.pump.isRunning'})
+
+    def test_remote_changes_last_writer_wins(self):
+        self.state_manager.set_path('systemConfig.operationMode', 'manual')
+        local_version = self.state_manager.versions['systemConfig.operationMode']
+
+        stale = {'systemConfig.operationMode': 'automatic', STATE_VERSIONS_KEY: {'systemConfig.operationMode': local_version}}
+        self.assertEqual(self.state_manager.apply_remote_attributes(stale), [])
+        self.assertEqual(self.state_manager.get_path('systemConfig.operationMode'), 'manual')
+
+        newer = {'systemConfig.operationMode': 'automatic',
+                 f'{STATE_VERSIONS_KEY}.systemConfig.operationMode': local_version + 1}
+        self.assertEqual(self.state_manager.apply_remote_attributes(newer), ['systemConfig.operationMode'])
+        self.assertEqual(self.state_manager.get_path('systemConfig.operationMode'), 'automatic')
+        self.assertEqual(self.state_manager.dirty_paths(), set())
+
+        # An unversioned value is version 0, older than any local write
+        self.state_manager.set_path('systemConfig.operationMode', 'manual')
+        self.assertEqual(self.state_manager.apply_remote_attributes({'systemConfig.operationMode': 'automatic'}), [])
+        self.assertEqual(self.state_manager.get_path('systemConfig.operationMode'), 'manual')
+
+    def test_unversioned_remote_values_do_not_override_restored_state(self):
+        self.state_manager.set_path('systemConfig.operationMode', 'manual')
+        self.state_manager.close()
+        os.remove(os.path.join(self.directory, 'state.json.versions'))  # a state file without versions
+        self.state_manager = StateManager(os.path.join(self.directory, 'state.json'))
+        self.assertEqual(self.state_manager.versions, {})
+
+        remote = {'systemConfig.operationMode': 'automatic', 'systemConfig.syncEnabled': False}
+        self.assertEqual(self.state_manager.apply_remote_attributes(remote), ['systemConfig.syncEnabled'])
+        self.assertEqual(self.state_manager.get_path('systemConfig.operationMode'), 'manual')
+        # A path the device only knows from unversioned remote values keeps following them
+        self.assertEqual(self.state_manager.apply_remote_attributes({'systemConfig.syncEnabled': True}),
+                         ['systemConfig.syncEnabled'])
+
+    def test_versions_survive_restart(self):
+        for journal_path in (None, os.path.join(self.directory, 'state.journal')):
+            state_file = os.path.join(self.directory, f'state-{bool(journal_path)}.json')
+            state_manager = StateManager(state_file, journal_path=journal_path)
+            for i in range(53):
+                state_manager.set_path('systemConfig.operationMode', f'manual-{i}')
+            state_manager.close()
+
+            restarted = StateManager(state_file, journal_path=journal_path)
+            self.assertEqual(restarted.versions['systemConfig.operationMode'], 53)
+            stale = {'systemConfig.operationMode': 'automatic', f'{STATE_VERSIONS_KEY}.systemConfig.operationMode': 3}
+            self.assertEqual(restarted.apply_remote_attributes(stale), [])
+            self.assertEqual(restarted.get_path('systemConfig.operationMode'), 'manual-52')
+            restarted.set_value('systemStatus', 'running')
+            self.assertEqual(restarted.versions['systemStatus'], 54)  # the clock resumes after the restored versions
+            restarted.close()
+
+    def test_end_to_end_with_broker_stub(self):
+        with ThingsBoardBrokerStub() as broker:
+            tb_client = ThingsBoardClient('127.0.0.1', 'TOKEN', port=broker.port)
+            tb_client.connect()
+            wait_for_connection(tb_client)
+            broker.shared_attributes['systemConfig.syncEnabled'] = False
+            self.state_manager.start_cloud_sync(tb_client, interval=0.05)
+            self.state_manager.set_path('deviceStates.phSensor.isEnabled', False)
+
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and (
+                    'deviceStates.phSensor.isEnabled' not in broker.client_attributes
+                    or self.state_manager.get_path('systemConfig.syncEnabled') is None):
+                time.sleep(0.01)
+            self.state_manager.stop_cloud_sync()
+            tb_client.disconnect()
+
+        self.assertIs(broker.client_attributes['deviceStates.phSensor.isEnabled'], False)
+        self.assertIs(self.state_manager.get_path('systemConfig.syncEnabled'), False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Tests for the append-only StateJournal and StateManager's journaled mode."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from state_manager import StateManager
+from state_manager.state_journal import StateJournal
+
+
+class TestStateJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.directory, 'state.json')
+        self.journal_file = os.path.join(self.directory, 'state.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_recovery_replays_log_tail(self):
+        state_manager = StateManager(self.state_file, journal_path=self.journal_file)
+        state_manager.set_value('powerButton', True)
+        state_manager.update_state({'autoSwitch': True, 'powerButton': False})
+        state_manager.close()
+
+        recovered = StateManager(self.state_file, journal_path=self.journal_file)
+        self.assertEqual(recovered.state, {'powerButton': False, 'autoSwitch': True})
+        self.assertEqual(recovered.journal.seq, 3)
+        recovered.close()
+
+    def test_compaction_truncates_log(self):
+        state_manager = StateManager(self.state_file, journal_path=self.journal_file, compact_threshold=10)
+        for i in range(25):
+            state_manager.set_value('counter', i)
+        state_manager.close()
+        self.assertEqual(state_manager.journal.records_since_snapshot, 5)
+        with open(self.journal_file, 'rb') as log:
+            self.assertEqual(len(log.readlines()), 5)
+
+        recovered = StateManager(self.state_file, journal_path=self.journal_file)
+        self.assertEqual(recovered.get_value('counter'), 24)
+        recovered.close()
+
+    def test_seeds_journal_from_existing_state_file(self):
+        with open(self.state_file, 'w') as file:
+            json.dump({'mode': 'automatic'}, file)
+        state_manager = StateManager(self.state_file, journal_path=self.journal_file)
+        state_manager.close()
+        self.assertEqual(StateManager(self.state_file, journal_path=self.journal_file).state, {'mode': 'automatic'})
+
+    def test_torn_tail_is_discarded(self):
+        journal = StateJournal(self.journal_file)
+        journal.recover()
+        journal.append([(('deviceStates', 'phSensor', 'isEnabled'), True)])
+        journal.close()
+        with open(self.journal_file, 'ab') as log:
+            log.write(b'{"s":2,"k":["x"],"v"')
+
+        journal = StateJournal(self.journal_file)
+        state = journal.recover()
+        self.assertEqual(state, {'deviceStates': {'phSensor': {'isEnabled': True}}})
+        self.assertEqual(journal.seq, 1)
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
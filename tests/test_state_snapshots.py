@@ -0,0 +1,91 @@
+"""Tests for StateManager copy-on-write snapshots."""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from state_manager import StateManager
+
+
+class TestStateSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.state_manager = StateManager(os.path.join(self.directory, 'state.json'), write_behind=True)
+
+    def tearDown(self):
+        self.state_manager.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_snapshot_is_unaffected_by_later_writes(self):
+        self.state_manager.set_path('deviceStates.phSensor.isEnabled', True)
+        self.state_manager.set_path('deviceStates.radarSensor.isEnabled', True)
+        snapshot = self.state_manager.snapshot()
+        radar_before = snapshot['deviceStates']['radarSensor']
+
+        self.state_manager.set_path('deviceStates.phSensor.isEnabled', False)
+
+        self.assertTrue(snapshot['deviceStates']['phSensor']['isEnabled'])
+        self.assertFalse(self.state_manager.get_path('deviceStates.phSensor.isEnabled'))
+        # Untouched subtrees are shared rather than copied
+        self.assertIs(self.state_manager.snapshot()['deviceStates']['radarSensor'], radar_before)
+        with self.assertRaises(TypeError):
+            snapshot['new'] = 1
+
+    def test_multi_key_updates_are_never_torn(self):
+        stop = threading.Event()
+        torn = []
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                i += 1
+                self.state_manager.update_state({'a': i, 'b': i})
+
+        def reader():
+            for _ in range(20000):
+                a, b = self.state_manager.get_values('a', 'b')
+                if a != b:
+                    torn.append((a, b))
+
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        readers = [threading.Thread(target=reader) for _ in range(3)]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        stop.set()
+        writer_thread.join()
+        self.assertEqual(torn, [])
+
+
+    def test_late_save_never_replaces_a_newer_state(self):
+        path = os.path.join(self.directory, 'sync.json')
+        state_manager = StateManager(path)
+        state_manager.set_value('counter', 1)
+        serializing, release = threading.Event(), threading.Event()
+        dumps = json.dumps
+
+        def slow_dumps(obj, **kwargs):
+            if threading.current_thread().name == 'saver':
+                serializing.set()
+                release.wait(5)
+            return dumps(obj, **kwargs)
+
+        with mock.patch('state_manager.state_manager.json.dumps', slow_dumps):
+            saver = threading.Thread(target=state_manager.save_state, name='saver')
+            saver.start()
+            self.assertTrue(serializing.wait(5))  # the saver holds a snapshot with counter == 1
+            state_manager.set_value('counter', 2)
+            release.set()
+            saver.join()
+        with open(path) as file:
+            self.assertEqual(json.load(file)['counter'], 2)
+        state_manager.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
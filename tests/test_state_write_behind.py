@@ -0,0 +1,54 @@
+"""Tests for StateManager persistence: synchronous atomic writes and the write-behind flusher."""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from state_manager import StateManager
+
+
+class TestStateManagerPersistence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.directory, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _read_file(self):
+        with open(self.state_file, 'r') as file:
+            return json.load(file)
+
+    def test_set_value_does_not_deadlock(self):
+        state_manager = StateManager(self.state_file)
+        state_manager.set_value('powerButton', True)
+        state_manager.update_state({'autoSwitch': False})
+        self.assertEqual(self._read_file(), {'powerButton': True, 'autoSwitch': False})
+        self.assertFalse(os.path.exists(self.state_file + '.tmp'))
+
+    def test_write_behind_coalesces_updates(self):
+        state_manager = StateManager(self.state_file, write_behind=True, flush_interval=60)
+        for i in range(500):
+            state_manager.set_value('counter', i)
+        self.assertEqual(state_manager.write_count, 0)
+        self.assertFalse(os.path.exists(self.state_file))
+
+        state_manager.close()
+        self.assertEqual(state_manager.write_count, 1)
+        self.assertEqual(self._read_file(), {'counter': 499})
+
+    def test_background_flush_after_interval(self):
+        state_manager = StateManager(self.state_file, write_behind=True, flush_interval=0.05)
+        state_manager.update_state({'mode': 'automatic'})
+        deadline = time.monotonic() + 2.0
+        while state_manager.write_count == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self._read_file(), {'mode': 'automatic'})
+        state_manager.close()
+        self.assertEqual(state_manager.write_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,367 @@
+"""The backfill.py script re-publishes a time range of locally archived readings to ThingsBoard, e.g. after
+an outage or when a new dashboard needs history. Readings are read from the SegmentArchive one time
+window at a time and grouped into ts-stamped telemetry arrays ([{"ts": ms, "values": {...}}, ...]) of
+batch_size points, so one message carries hundreds of readings instead of one. Batches go out over
+ThingsBoard's HTTP device API on a pool of keep-alive connections, or over MQTT through ThingsBoardClient,
+with a few in flight at once. A token bucket caps the point rate so live traffic keeps its share of the
+link and the server, and a checkpoint of the last fully delivered timestamp is written atomically so an
+interrupted backfill resumes where it stopped.
+
+Usage:
+    python -m thingsboard_client.backfill --archive /var/lib/plant/history --start 2026-10-01T00:00 \\
+        --end 2026-10-03T00:00 --host thingsboard.local --token DEVICE_TOKEN --checkpoint backfill.json
+"""
+
+# backfill.py
+import argparse
+import http.client
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+import numpy as np
+
+from state_manager.persistence import atomic_write
+from thingsboard_client.thingsboard_client import ThingsBoardClient
+
+
+class TokenBucket:
+    """Allows `rate` units per second on average with bursts of up to `burst` units."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1.0):
+        """Blocks until amount units are available. Amounts above burst are let through on debt."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait_seconds = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait_seconds:
+            self.sleep(wait_seconds)
+        return wait_seconds
+
+
+class HTTPTelemetryTransport:
+    """Posts telemetry arrays to /api/v1/{token}/telemetry over pooled keep-alive connections."""
+
+    def __init__(self, host, access_token, port=None, use_tls=False, pool_size=4, timeout=10.0):
+        self.host = host
+        self.port = port or (443 if use_tls else 80)
+        self.path = f'/api/v1/{access_token}/telemetry'
+        self.connection_class = http.client.HTTPSConnection if use_tls else http.client.HTTPConnection
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(None)  # connections are opened lazily
+
+    def send(self, entries):
+        body = json.dumps(entries, separators=(',', ':')).encode('utf-8')
+        connection = self._pool.get()
+        try:
+            for attempt in range(2):
+                if connection is None:
+                    connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+                    self.connections_opened += 1
+                try:
+                    connection.request('POST', self.path, body, {'Content-Type': 'application/json'})
+                    response = connection.getresponse()
+                    response.read()
+                    break
+                except (http.client.HTTPException, OSError):
+                    connection.close()
+                    connection = None
+                    if attempt:  # a stale keep-alive connection gets one fresh retry
+                        raise
+            if response.status != 200:
+                raise ConnectionError(f"Telemetry POST returned HTTP {response.status}")
+            if response.will_close:
+                connection.close()
+                connection = None
+        finally:
+            self._pool.put(connection)
+
+    def close(self):
+        while not self._pool.empty():
+            connection = self._pool.get_nowait()
+            if connection is not None:
+                connection.close()
+
+
+class MQTTTelemetryTransport:
+    """Publishes telemetry arrays through a connected ThingsBoardClient and waits for the broker ack."""
+
+    def __init__(self, tb_client, timeout=10.0):
+        self.tb_client = tb_client
+        self.timeout = timeout
+
+    def send(self, entries):
+        info = self.tb_client.publish_telemetry(entries)
+        if info.rc != 0:
+            raise ConnectionError(f"publish returned rc={info.rc}")
+        info.wait_for_publish(self.timeout)
+        if not info.is_published():
+            raise ConnectionError("Telemetry publish was not acknowledged in time")
+
+    def close(self):
+        pass
+
+
+class Backfill:
+    def __init__(self, archive, transport, start_time, end_time, checkpoint_path=None, channels=None,
+                 key_format='{device}_{channel}', batch_size=500, rate=2000.0, concurrency=4, window=3600.0,
+                 max_retries=5, retry_interval=1.0, progress_interval=5.0, on_progress=None):
+        """archive: a SegmentArchive; channels: optional [(device, channel)] to send (default all).
+        rate: points per second across all connections, 0 for unthrottled."""
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.archive = archive
+        self.transport = transport
+        self.start_time = start_time
+        self.end_time = end_time
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.limiter = TokenBucket(rate, burst=max(rate, batch_size)) if rate else None
+        self.concurrency = concurrency
+        self.window = window
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress
+
+        names = archive.channel_names()
+        wanted = set(channels) if channels is not None else None
+        self.keys = {channel_id: key_format.format(device=device, channel=channel)
+                     for channel_id, (device, channel) in names.items() if wanted is None or (device, channel) in wanted}
+
+        self.resume_time = None  # readings at or before this timestamp were delivered earlier
+        self.points_sent = 0
+        self.messages_sent = 0
+        self.retries = 0
+        self.total_points = None
+
+    # Checkpoints
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as file:
+            checkpoint = json.load(file)
+        if checkpoint.get('start_time') != self.start_time or checkpoint.get('end_time') != self.end_time:
+            self.logger.warning(f"Checkpoint {self.checkpoint_path} is for another range, starting over.")
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, delivered_until, done=False):
+        if self.checkpoint_path:
+            atomic_write(self.checkpoint_path, json.dumps({
+                'start_time': self.start_time, 'end_time': self.end_time, 'delivered_until': delivered_until,
+                'points_sent': self.points_sent, 'messages_sent': self.messages_sent, 'done': done}))
+
+    # Batching
+
+    def _selected(self, records):
+        channels = records['channels']
+        if len(self.keys) != len(self.archive.channel_ids):
+            mask = np.isin(channels, np.fromiter(self.keys, dtype=np.uint32, count=len(self.keys)))
+            return records['timestamps'][mask], channels[mask], records['values'][mask]
+        return records['timestamps'], channels, records['values']
+
+    def count_points(self, start_time):
+        total = 0
+        for view in self.archive.query_views(start_time, self.end_time):
+            timestamps = self._selected(view)[0]
+            total += len(timestamps) if self.resume_time is None else int(np.count_nonzero(timestamps > self.resume_time))
+        return total
+
+    def batches(self, start_time):
+        """Yields (last timestamp, point count, telemetry entries); batches split only between timestamps."""
+        window_start = start_time
+        while window_start <= self.end_time:
+            window_end = min(window_start + self.window, self.end_time)
+            upper = window_end if window_end == self.end_time else np.nextafter(window_end, -np.inf)
+            timestamps, channels, values = self._selected(self.archive.query(window_start, upper))
+            if self.resume_time is not None and window_start == self.resume_time:
+                keep = timestamps > self.resume_time
+                timestamps, channels, values = timestamps[keep], channels[keep], values[keep]
+            position = 0
+            while position < len(timestamps):
+                end = min(position + self.batch_size, len(timestamps))
+                if end < len(timestamps):
+                    # Extend to the end of the last timestamp so a checkpoint never splits one
+                    end = int(np.searchsorted(timestamps, timestamps[end - 1], 'right'))
+                yield (float(timestamps[end - 1]), end - position,
+                       self._entries(timestamps[position:end], channels[position:end], values[position:end]))
+                position = end
+            if window_end == self.end_time:
+                break
+            window_start = window_end
+
+    def _entries(self, timestamps, channels, values):
+        keys = self.keys
+        entries = []
+        current_ts = None
+        for timestamp, channel, value in zip((timestamps * 1000).round().astype(np.int64).tolist(),
+                                             channels.tolist(), values.tolist()):
+            if timestamp != current_ts:
+                current_ts = timestamp
+                current = {}
+                entries.append({'ts': timestamp, 'values': current})
+            current[keys[channel]] = None if value != value else value  # NaN is not valid JSON
+        return entries
+
+    # Sending
+
+    def _send(self, entries):
+        for attempt in range(self.max_retries):
+            try:
+                self.transport.send(entries)
+                return
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                self.retries += 1
+                self.logger.warning(f"Telemetry batch failed (attempt {attempt + 1}): {e}")
+                time.sleep(self.retry_interval * (2 ** attempt))
+
+    def progress(self, started):
+        elapsed = time.monotonic() - started
+        rate = self.points_sent / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total_points - self.points_sent, 0) if self.total_points is not None else None
+        return {'points_sent': self.points_sent, 'total_points': self.total_points,
+                'messages_sent': self.messages_sent, 'retries': self.retries, 'elapsed': elapsed,
+                'points_per_second': rate, 'eta_seconds': remaining / rate if rate and remaining is not None else None}
+
+    def _report(self, started):
+        report = self.progress(started)
+        if self.on_progress is not None:
+            self.on_progress(report)
+        percent = f"{100.0 * report['points_sent'] / report['total_points']:.1f}%" if report['total_points'] else "-"
+        self.logger.info(f"Backfill {percent}: {report['points_sent']} points in {report['messages_sent']} messages, "
+                         f"{report['points_per_second']:.0f} points/s")
+
+    def run(self):
+        """Sends the range (or its remainder after a checkpoint). Returns the final progress report."""
+        checkpoint = self.load_checkpoint()
+        start_time = self.start_time
+        if checkpoint is not None:
+            if checkpoint.get('done'):
+                self.logger.info("Backfill already completed according to its checkpoint.")
+                return dict(self.progress(time.monotonic()), done=True)
+            if checkpoint.get('delivered_until') is not None:
+                self.resume_time = start_time = checkpoint['delivered_until']
+                self.points_sent = checkpoint.get('points_sent', 0)
+                self.messages_sent = checkpoint.get('messages_sent', 0)
+                self.logger.info(f"Resuming backfill after {self.resume_time}.")
+        self.total_points = self.points_sent + self.count_points(start_time)
+
+        started = last_report = time.monotonic()
+        pending = {}  # future -> sequence
+        self._batches = {}  # sequence -> (last timestamp, points) until confirmed
+        self._completed = set()
+        self._next_to_confirm = 0
+        self._delivered_until = self.resume_time
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='Backfill') as executor:
+            try:
+                for sequence, (last_ts, points, entries) in enumerate(self.batches(start_time)):
+                    if self.limiter is not None:
+                        self.limiter.acquire(points)
+                    self._batches[sequence] = (last_ts, points)
+                    pending[executor.submit(self._send, entries)] = sequence
+                    if len(pending) >= self.concurrency * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        self._collect(pending, done)
+                    if time.monotonic() - last_report >= self.progress_interval:
+                        self.save_checkpoint(self._delivered_until)
+                        self._report(started)
+                        last_report = time.monotonic()
+                self._collect(pending, list(pending))
+            except Exception:
+                for future in pending:
+                    future.cancel()
+                self.save_checkpoint(self._delivered_until)
+                self.logger.error(f"Backfill stopped; checkpoint at {self._delivered_until}.")
+                raise
+        self.save_checkpoint(self._delivered_until, done=True)
+        self._report(started)
+        return dict(self.progress(started), done=True)
+
+    def _collect(self, pending, done):
+        """Records finished sends; only a contiguous run of delivered batches advances the checkpoint."""
+        for future in done:
+            future.result()
+            self._completed.add(pending.pop(future))
+        while self._next_to_confirm in self._completed:
+            self._completed.discard(self._next_to_confirm)
+            self._delivered_until, points = self._batches.pop(self._next_to_confirm)
+            self.points_sent += points
+            self.messages_sent += 1
+            self._next_to_confirm += 1
+
+
+def parse_time(value):
+    """Epoch seconds or an ISO 8601 date/time (UTC unless it carries an offset)."""
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+
+def main(argv=None):
+    from storage.segment_archive import SegmentArchive
+
+    parser = argparse.ArgumentParser(description="Re-publish archived readings to ThingsBoard")
+    parser.add_argument('--archive', required=True, help="SegmentArchive directory")
+    parser.add_argument('--start', required=True, type=parse_time, help="Epoch seconds or ISO time (UTC)")
+    parser.add_argument('--end', required=True, type=parse_time, help="Epoch seconds or ISO time (UTC)")
+    parser.add_argument('--transport', choices=('http', 'mqtt'), default='http')
+    parser.add_argument('--host', required=True)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--tls', action='store_true', help="Use HTTPS for the HTTP transport")
+    parser.add_argument('--token', required=True, help="Device access token")
+    parser.add_argument('--checkpoint', default=None, help="Checkpoint file for resuming")
+    parser.add_argument('--batch-size', type=int, default=500, help="Points per message")
+    parser.add_argument('--rate', type=float, default=2000.0, help="Points per second, 0 for unthrottled")
+    parser.add_argument('--concurrency', type=int, default=4, help="Connections / messages in flight")
+    args = parser.parse_args(argv)
+
+    archive = SegmentArchive(args.archive)
+    tb_client = None
+    if args.transport == 'http':
+        transport = HTTPTelemetryTransport(args.host, args.token, args.port, args.tls, args.concurrency)
+    else:
+        tb_client = ThingsBoardClient(args.host, args.token, port=args.port or 1883)
+        tb_client.connect()
+        transport = MQTTTelemetryTransport(tb_client)
+    try:
+        report = Backfill(archive, transport, args.start, args.end, args.checkpoint, batch_size=args.batch_size,
+                          rate=args.rate, concurrency=args.concurrency).run()
+        print(json.dumps(report, indent=2))
+    finally:
+        transport.close()
+        if tb_client is not None:
+            tb_client.disconnect()
+        archive.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,472 @@
+"""The broker_stub.py module provides an in-process, localhost MQTT 3.1.1 broker stand-in
+that speaks enough of the ThingsBoard device API to exercise ThingsBoardClient without a live server.
+It acknowledges telemetry and attribute publishes, answers attribute requests, echoes client-side RPC
+requests and can push server-side RPC calls and shared attribute updates to connected devices."""
+
+# broker_stub.py
+import json
+import logging
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+# MQTT control packet types (upper nibble of the fixed header)
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+CONNACK_ACCEPTED = 0
+CONNACK_BAD_CREDENTIALS = 4
+
+TELEMETRY_TOPIC = 'v1/devices/me/telemetry'
+ATTRIBUTES_TOPIC = 'v1/devices/me/attributes'
+ATTRIBUTES_REQUEST_PREFIX = 'v1/devices/me/attributes/request/'
+ATTRIBUTES_RESPONSE_PREFIX = 'v1/devices/me/attributes/response/'
+RPC_REQUEST_PREFIX = 'v1/devices/me/rpc/request/'
+RPC_RESPONSE_PREFIX = 'v1/devices/me/rpc/response/'
+
+
+def encode_remaining_length(length):
+    """Encodes an MQTT 'remaining length' as a variable length integer."""
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length > 0:
+            byte |= 0x80
+        encoded.append(byte)
+        if length == 0:
+            return bytes(encoded)
+
+
+def encode_string(value):
+    """Encodes a UTF-8 string with its two byte length prefix."""
+    data = value.encode('utf-8')
+    return struct.pack('!H', len(data)) + data
+
+
+def topic_matches(topic_filter, topic):
+    """Returns True if a topic matches an MQTT subscription filter ('+' and '#' wildcards)."""
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+    for index, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != '+' and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class _Session:
+    """Per-connection state: the socket, credentials and active subscriptions."""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.client_id = None
+        self.access_token = None
+        self.subscriptions = {}
+        self.send_lock = threading.Lock()
+        # Publishes from other connections' threads check the subscriptions while this one changes them
+        self.subscription_lock = threading.Lock()
+
+    def send(self, packet):
+        with self.send_lock:
+            self.sock.sendall(packet)
+
+    def subscribe(self, topic_filter, qos):
+        with self.subscription_lock:
+            self.subscriptions[topic_filter] = qos
+
+    def unsubscribe(self, topic_filter):
+        with self.subscription_lock:
+            self.subscriptions.pop(topic_filter, None)
+
+    def is_subscribed(self, topic):
+        with self.subscription_lock:
+            return any(topic_matches(topic_filter, topic) for topic_filter in self.subscriptions)
+
+
+class _MQTTConnectionHandler(socketserver.BaseRequestHandler):
+    """Reads MQTT packets from one client connection and hands them to the broker stub."""
+
+    def handle(self):
+        stub = self.server.stub
+        session = _Session(self.request, self.client_address)
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                packet = self._read_packet()
+                if packet is None:
+                    break
+                header, body = packet
+                if not stub._handle_packet(session, header, body):
+                    break
+        except (ConnectionError, OSError) as e:
+            stub.logger.debug(f"Connection from {self.client_address} closed: {e}")
+        finally:
+            stub._remove_session(session)
+
+    def _read_exact(self, size):
+        chunks = []
+        while size > 0:
+            chunk = self.request.recv(size)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def _read_packet(self):
+        header = self._read_exact(1)
+        if header is None:
+            return None
+        multiplier = 1
+        remaining_length = 0
+        for _ in range(4):
+            encoded = self._read_exact(1)
+            if encoded is None:
+                return None
+            remaining_length += (encoded[0] & 0x7F) * multiplier
+            if not encoded[0] & 0x80:
+                break
+            multiplier *= 128
+        else:
+            raise ConnectionError("Malformed remaining length")
+        body = self._read_exact(remaining_length) if remaining_length else b''
+        if body is None:
+            return None
+        return header[0], body
+
+
+class _ThreadingMQTTServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ThingsBoardBrokerStub:
+    """A minimal ThingsBoard-flavoured MQTT broker for local tests and load generation."""
+
+    def __init__(self, host='127.0.0.1', port=0, access_tokens=None, parse_payloads=True):
+        self.host = host
+        self.port = port
+        self.access_tokens = set(access_tokens) if access_tokens else None
+        self.parse_payloads = parse_payloads
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.client_attributes = {}
+        self.shared_attributes = {}
+        self.last_telemetry = None
+
+        self._server = None
+        self._thread = None
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._telemetry_received = threading.Condition(self._lock)
+        self._counters = {
+            'connections': 0,
+            'telemetry_messages': 0,
+            'attribute_messages': 0,
+            'client_rpc_requests': 0,
+            'server_rpc_responses': 0,
+            'malformed_payloads': 0,
+            'bytes_received': 0,
+        }
+        self._rpc_id = 0
+        self._pending_rpc = {}
+
+    # Lifecycle
+
+    def start(self):
+        """Starts serving on a background thread and returns the bound port."""
+        self._server = _ThreadingMQTTServer((self.host, self.port), _MQTTConnectionHandler)
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='BrokerStub', daemon=True)
+        self._thread.start()
+        self.logger.info(f"ThingsBoard broker stub listening on {self.host}:{self.port}")
+        return self.port
+
+    def stop(self):
+        """Stops serving and closes every client connection."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            try:
+                session.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._server.server_close()
+        self._thread.join(timeout=5)
+        self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    # Inspection helpers
+
+    def stats(self):
+        """Returns a snapshot of the broker counters."""
+        with self._lock:
+            return dict(self._counters)
+
+    def wait_for_telemetry(self, count, timeout=5.0):
+        """Blocks until at least `count` telemetry messages have arrived. Returns True on success."""
+        deadline = time.monotonic() + timeout
+        with self._telemetry_received:
+            while self._counters['telemetry_messages'] < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._telemetry_received.wait(remaining)
+            return True
+
+    # Server-initiated traffic
+
+    def send_rpc(self, method, params=None, timeout=5.0):
+        """Sends a server-side RPC request to subscribed devices and waits for the response."""
+        with self._lock:
+            self._rpc_id += 1
+            request_id = self._rpc_id
+            waiter = {'event': threading.Event(), 'response': None}
+            self._pending_rpc[request_id] = waiter
+        payload = json.dumps({'method': method, 'params': params})
+        delivered = self._publish_to_sessions(f'{RPC_REQUEST_PREFIX}{request_id}', payload)
+        if not delivered:
+            self.logger.warning(f"No device subscribed for RPC {method}")
+        waiter['event'].wait(timeout)
+        with self._lock:
+            self._pending_rpc.pop(request_id, None)
+        return waiter['response']
+
+    def update_shared_attributes(self, attributes):
+        """Updates shared attributes and pushes the change to subscribed devices."""
+        with self._lock:
+            self.shared_attributes.update(attributes)
+        return self._publish_to_sessions(ATTRIBUTES_TOPIC, json.dumps(attributes))
+
+    # Packet handling
+
+    def _remove_session(self, session):
+        with self._lock:
+            self._sessions.discard(session)
+        try:
+            session.sock.close()
+        except OSError:
+            pass
+
+    def _handle_packet(self, session, header, body):
+        packet_type = header >> 4
+        with self._lock:
+            self._counters['bytes_received'] += len(body) + 2
+        if packet_type == CONNECT:
+            return self._handle_connect(session, body)
+        if session.client_id is None:
+            self.logger.warning("Packet received before CONNECT, closing connection.")
+            return False
+        if packet_type == PUBLISH:
+            self._handle_publish(session, header, body)
+        elif packet_type == PUBREL:
+            session.send(bytes([PUBCOMP << 4, 2]) + body[:2])
+        elif packet_type == SUBSCRIBE:
+            self._handle_subscribe(session, body)
+        elif packet_type == UNSUBSCRIBE:
+            self._handle_unsubscribe(session, body)
+        elif packet_type == PINGREQ:
+            session.send(bytes([PINGRESP << 4, 0]))
+        elif packet_type == DISCONNECT:
+            return False
+        # PUBACK/PUBREC/PUBCOMP from the client need no reply, deliveries are QoS 0
+        return True
+
+    def _handle_connect(self, session, body):
+        offset = 0
+        (name_length,) = struct.unpack_from('!H', body, offset)
+        offset += 2 + name_length
+        level, flags = body[offset], body[offset + 1]
+        offset += 4  # level, flags, keep alive
+
+        def read_string(position):
+            (length,) = struct.unpack_from('!H', body, position)
+            return body[position + 2:position + 2 + length], position + 2 + length
+
+        client_id, offset = read_string(offset)
+        if flags & 0x04:  # will topic and message
+            _, offset = read_string(offset)
+            _, offset = read_string(offset)
+        username = None
+        if flags & 0x80:
+            username, offset = read_string(offset)
+            username = username.decode('utf-8')
+
+        if level != 4:
+            self.logger.warning(f"Client requested unsupported protocol level {level}")
+        if self.access_tokens is not None and username not in self.access_tokens:
+            session.send(bytes([CONNACK << 4, 2, 0, CONNACK_BAD_CREDENTIALS]))
+            return False
+
+        session.client_id = client_id.decode('utf-8', errors='replace') or f'{session.address}'
+        session.access_token = username
+        with self._lock:
+            self._sessions.add(session)
+            self._counters['connections'] += 1
+        session.send(bytes([CONNACK << 4, 2, 0, CONNACK_ACCEPTED]))
+        return True
+
+    def _handle_publish(self, session, header, body):
+        qos = (header >> 1) & 0x03
+        (topic_length,) = struct.unpack_from('!H', body, 0)
+        topic = body[2:2 + topic_length].decode('utf-8')
+        offset = 2 + topic_length
+        packet_id = None
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+        payload = body[offset:]
+
+        self._route(session, topic, payload)
+
+        if qos == 1:
+            session.send(bytes([PUBACK << 4, 2]) + packet_id)
+        elif qos == 2:
+            session.send(bytes([PUBREC << 4, 2]) + packet_id)
+
+    def _decode(self, payload):
+        try:
+            return json.loads(payload)
+        except ValueError:
+            with self._lock:
+                self._counters['malformed_payloads'] += 1
+            return None
+
+    def _route(self, session, topic, payload):
+        """Applies the ThingsBoard topic conventions to a device publish."""
+        if topic == TELEMETRY_TOPIC:
+            data = self._decode(payload) if self.parse_payloads else payload
+            with self._telemetry_received:
+                self._counters['telemetry_messages'] += 1
+                self.last_telemetry = data
+                self._telemetry_received.notify_all()
+        elif topic == ATTRIBUTES_TOPIC:
+            data = self._decode(payload)
+            with self._lock:
+                self._counters['attribute_messages'] += 1
+                if isinstance(data, dict):
+                    self.client_attributes.update(data)
+        elif topic.startswith(ATTRIBUTES_REQUEST_PREFIX):
+            request = self._decode(payload) or {}
+            request_id = topic[len(ATTRIBUTES_REQUEST_PREFIX):]
+            session_response = self._attributes_response(request)
+            self._send_publish(session, f'{ATTRIBUTES_RESPONSE_PREFIX}{request_id}', json.dumps(session_response))
+        elif topic.startswith(RPC_REQUEST_PREFIX):
+            # Client-side RPC: echo the request back as the response
+            request_id = topic[len(RPC_REQUEST_PREFIX):]
+            with self._lock:
+                self._counters['client_rpc_requests'] += 1
+            self._send_publish(session, f'{RPC_RESPONSE_PREFIX}{request_id}', payload)
+        elif topic.startswith(RPC_RESPONSE_PREFIX):
+            request_id = topic[len(RPC_RESPONSE_PREFIX):]
+            response = self._decode(payload)
+            with self._lock:
+                self._counters['server_rpc_responses'] += 1
+                waiter = self._pending_rpc.get(int(request_id)) if request_id.isdigit() else None
+            if waiter is not None:
+                waiter['response'] = response
+                waiter['event'].set()
+        else:
+            self.logger.debug(f"Ignoring publish on unsupported topic {topic}")
+
+    def _attributes_response(self, request):
+        with self._lock:
+            response = {}
+            client_keys = request.get('clientKeys')
+            shared_keys = request.get('sharedKeys')
+            if client_keys is not None:
+                keys = client_keys.split(',') if client_keys else self.client_attributes.keys()
+                response['client'] = {k: self.client_attributes[k] for k in keys if k in self.client_attributes}
+            if shared_keys is not None:
+                keys = shared_keys.split(',') if shared_keys else self.shared_attributes.keys()
+                response['shared'] = {k: self.shared_attributes[k] for k in keys if k in self.shared_attributes}
+            if client_keys is None and shared_keys is None:
+                response = {'client': dict(self.client_attributes), 'shared': dict(self.shared_attributes)}
+            return response
+
+    def _handle_subscribe(self, session, body):
+        packet_id = body[:2]
+        offset = 2
+        granted = bytearray()
+        while offset < len(body):
+            (length,) = struct.unpack_from('!H', body, offset)
+            topic_filter = body[offset + 2:offset + 2 + length].decode('utf-8')
+            requested_qos = body[offset + 2 + length]
+            offset += 3 + length
+            session.subscribe(topic_filter, min(requested_qos, 1))
+            granted.append(min(requested_qos, 1))
+        session.send(bytes([SUBACK << 4]) + encode_remaining_length(2 + len(granted)) + packet_id + bytes(granted))
+
+    def _handle_unsubscribe(self, session, body):
+        packet_id = body[:2]
+        offset = 2
+        while offset < len(body):
+            (length,) = struct.unpack_from('!H', body, offset)
+            session.unsubscribe(body[offset + 2:offset + 2 + length].decode('utf-8'))
+            offset += 2 + length
+        session.send(bytes([UNSUBACK << 4, 2]) + packet_id)
+
+    def _send_publish(self, session, topic, payload):
+        """Delivers a QoS 0 publish to a session if it subscribed to the topic."""
+        if not session.is_subscribed(topic):
+            return False
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        body = encode_string(topic) + payload
+        try:
+            session.send(bytes([PUBLISH << 4]) + encode_remaining_length(len(body)) + body)
+        except OSError as e:
+            self.logger.debug(f"Delivery to {session.client_id} failed: {e}")
+            return False
+        return True
+
+    def _publish_to_sessions(self, topic, payload):
+        with self._lock:
+            sessions = list(self._sessions)
+        delivered = 0
+        for session in sessions:
+            if self._send_publish(session, topic, payload):
+                delivered += 1
+        return delivered
+
+
+# Example usage
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    with ThingsBoardBrokerStub(port=1883) as broker:
+        logging.info("Press Ctrl+C to stop the broker stub.")
+        try:
+            while True:
+                time.sleep(5)
+                logging.info(f"Broker stats: {broker.stats()}")
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,140 @@
+"""The http_stub.py module provides an in-process, localhost stand-in for ThingsBoard's HTTP device API
+(POST /api/v1/{access_token}/telemetry). It speaks HTTP/1.1 with keep-alive, records every telemetry
+entry it accepts and can be told to fail or slow down requests, so backfills and other HTTP publishers
+can be exercised without a live server."""
+
+# http_stub.py
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _TelemetryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep connections open between requests
+
+    def setup(self):
+        super().setup()
+        self.server.stub._count('connections')
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 4 or parts[:2] != ['api', 'v1'] or parts[3] != 'telemetry':
+            return self._reply(404)
+        if stub.access_tokens is not None and parts[2] not in stub.access_tokens:
+            return self._reply(401)
+        status = stub._next_status()
+        if status != 200:
+            return self._reply(status)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            stub._count('malformed_payloads')
+            return self._reply(400)
+        stub._record(data if isinstance(data, list) else [data], len(body))
+        self._reply(200)
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        self.server.stub.logger.debug(format % args)
+
+
+class _ThreadingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ThingsBoardHTTPStub:
+    """A minimal ThingsBoard HTTP telemetry endpoint for local tests."""
+
+    def __init__(self, host='127.0.0.1', port=0, access_tokens=None, latency=0.0):
+        self.host = host
+        self.port = port
+        self.access_tokens = set(access_tokens) if access_tokens else None
+        self.latency = latency
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.entries = []  # accepted {'ts': ..., 'values': {...}} entries in arrival order
+        self._fail_statuses = []
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counters = {'connections': 0, 'requests': 0, 'telemetry_messages': 0, 'failed_requests': 0,
+                          'malformed_payloads': 0, 'bytes_received': 0}
+
+    def start(self):
+        """Starts serving on a background thread and returns the bound port."""
+        self._server = _ThreadingHTTPServer((self.host, self.port), _TelemetryHandler)
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='HTTPStub', daemon=True)
+        self._thread.start()
+        self.logger.info(f"ThingsBoard HTTP stub listening on {self.host}:{self.port}")
+        return self.port
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+        self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def fail_next(self, count=1, status=503, after=0):
+        """Makes count telemetry requests fail with the given HTTP status, after `after` successful ones."""
+        with self._lock:
+            self._fail_statuses.extend([200] * after + [status] * count)
+
+    def clear_failures(self):
+        with self._lock:
+            self._fail_statuses.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _next_status(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._counters['requests'] += 1
+            status = self._fail_statuses.pop(0) if self._fail_statuses else 200
+            if status != 200:
+                self._counters['failed_requests'] += 1
+            return status
+
+    def _record(self, entries, size):
+        with self._lock:
+            self.entries.extend(entries)
+            self._counters['telemetry_messages'] += 1
+            self._counters['bytes_received'] += size
+
+
+# Example usage
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    with ThingsBoardHTTPStub(port=8080) as stub:
+        logging.info("Press Ctrl+C to stop the HTTP stub.")
+        try:
+            while True:
+                time.sleep(5)
+                logging.info(f"HTTP stub stats: {stub.stats()}")
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,282 @@
+"""The load_generator.py script drives the real ThingsBoardClient at a configurable message rate and
+payload size and reports sustained throughput, delivery latency percentiles, CPU usage and memory.
+By default it starts a ThingsBoardBrokerStub in a child process, so publisher performance can be validated
+without a live ThingsBoard and the CPU and RSS figures cover the publishing process only, not the broker;
+pass --host/--port to target an external broker instead."""
+
+# load_generator.py
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import threading
+import time
+
+from thingsboard_client.thingsboard_client import ThingsBoardClient
+from thingsboard_client.broker_stub import ThingsBoardBrokerStub
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def current_rss_bytes():
+    """Returns the resident set size of this process, falling back to the peak RSS."""
+    try:
+        with open('/proc/self/status', 'r') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def build_payload_template(payload_size):
+    """Builds a telemetry dict whose JSON encoding is roughly payload_size bytes."""
+    telemetry = {'seq': 0, 'level': 1.234, 'pH': 7.01, 'turbidity': 12.5, 'pad': ''}
+    overhead = len(json.dumps(telemetry)) + 8  # room for larger sequence numbers
+    telemetry['pad'] = 'x' * max(0, payload_size - overhead)
+    return telemetry
+
+
+class PublishLoadGenerator:
+    """Publishes telemetry through ThingsBoardClient at a fixed rate and measures delivery."""
+
+    def __init__(self, tb_client, rate=100.0, duration=10.0, payload_size=256, drain_timeout=10.0):
+        self.tb_client = tb_client
+        self.rate = rate
+        self.duration = duration
+        self.payload_size = payload_size
+        self.drain_timeout = drain_timeout
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._lock = threading.Lock()
+        self._sent_at = {}
+        self._early_acks = {}
+        self._latencies = []
+        self._last_ack = None
+        self._publishing_done = False
+        self._all_acked = threading.Event()
+
+    def _on_publish(self, client, userdata, mid):
+        now = time.perf_counter()
+        with self._lock:
+            sent_at = self._sent_at.pop(mid, None)
+            if sent_at is None:
+                # The ack raced ahead of the bookkeeping in run()
+                self._early_acks[mid] = now
+                return
+            self._record_ack(sent_at, now)
+
+    def _record_ack(self, sent_at, acked_at):
+        self._latencies.append(acked_at - sent_at)
+        self._last_ack = acked_at
+        if self._publishing_done and not self._sent_at:
+            self._all_acked.set()
+
+    def run(self):
+        """Runs the load and returns a report dict."""
+        self.tb_client.mqtt_client.on_publish = self._on_publish
+        telemetry = build_payload_template(self.payload_size)
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+
+        cpu_start = os.times()
+        rss_start = current_rss_bytes()
+        start = time.perf_counter()
+        deadline = start + self.duration
+        sent = 0
+        failed = 0
+        next_send = start
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if interval and now < next_send:
+                time.sleep(min(next_send - now, deadline - now))
+                continue
+            telemetry['seq'] = sent
+            sent_at = time.perf_counter()
+            info = self.tb_client.publish_telemetry(telemetry)
+            sent += 1
+            next_send += interval
+            if info.rc != 0:
+                failed += 1
+                continue
+            with self._lock:
+                acked_at = self._early_acks.pop(info.mid, None)
+                if acked_at is None:
+                    self._sent_at[info.mid] = sent_at
+                else:
+                    self._record_ack(sent_at, acked_at)
+
+        publish_end = time.perf_counter()
+        with self._lock:
+            self._publishing_done = True
+            if not self._sent_at:
+                self._all_acked.set()
+        self._all_acked.wait(self.drain_timeout)
+        cpu_end = os.times()
+
+        with self._lock:
+            latencies = sorted(self._latencies)
+            unacked = len(self._sent_at)
+            last_ack = self._last_ack or publish_end
+
+        elapsed = max(last_ack, publish_end) - start
+        cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+        return {
+            'target_rate': self.rate,
+            'payload_bytes': len(json.dumps(telemetry)),
+            'sent': sent,
+            'acked': len(latencies),
+            'failed': failed,
+            'unacked': unacked,
+            'elapsed_s': elapsed,
+            'publish_rate': sent / (publish_end - start) if publish_end > start else 0.0,
+            'sustained_throughput': len(latencies) / elapsed if elapsed > 0 else 0.0,
+            'latency_ms': {
+                'p50': _ms(percentile(latencies, 0.50)),
+                'p90': _ms(percentile(latencies, 0.90)),
+                'p99': _ms(percentile(latencies, 0.99)),
+                'max': _ms(latencies[-1] if latencies else None),
+            },
+            'cpu_percent': 100.0 * cpu_seconds / elapsed if elapsed > 0 else 0.0,
+            'rss_bytes': current_rss_bytes(),
+            'rss_growth_bytes': current_rss_bytes() - rss_start,
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000.0, 3)
+
+
+def _serve_broker_stub(conn, access_tokens):
+    """Child process body: runs a broker stub, reports its port, and answers 'stats' until told to 'stop'."""
+    broker = ThingsBoardBrokerStub(access_tokens=access_tokens)
+    conn.send(broker.start())
+    try:
+        while conn.recv() == 'stats':
+            conn.send(broker.stats())
+    except EOFError:
+        pass  # the parent went away
+    finally:
+        broker.stop()
+        conn.close()
+
+
+class BrokerStubProcess:
+    """Runs a ThingsBoardBrokerStub in a separate process, so its work is not measured as the client's."""
+
+    def __init__(self, access_tokens=None, start_timeout=10.0):
+        self.access_tokens = access_tokens
+        self.start_timeout = start_timeout
+        self._conn = None
+        self._process = None
+
+    def start(self):
+        """Starts the child process and returns the port its stub is listening on."""
+        context = multiprocessing.get_context('spawn')  # no inherited threads or locks from this process
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_serve_broker_stub, args=(child_conn, self.access_tokens),
+                                        name='BrokerStub', daemon=True)
+        self._process.start()
+        child_conn.close()
+        if not self._conn.poll(self.start_timeout):
+            self.stop()
+            raise TimeoutError("Timed out waiting for the broker stub process")
+        return self._conn.recv()
+
+    def stats(self):
+        """Returns a snapshot of the stub's counters."""
+        self._conn.send('stats')
+        return self._conn.recv()
+
+    def stop(self):
+        """Stops the stub and waits for the child process to exit."""
+        if self._process is None:
+            return
+        try:
+            self._conn.send('stop')
+        except OSError:
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._conn.close()
+        self._process = None
+
+
+def wait_for_connection(tb_client, timeout=10.0):
+    """Waits until the underlying MQTT client reports a connection."""
+    deadline = time.monotonic() + timeout
+    while not tb_client.mqtt_client.is_connected():
+        if time.monotonic() >= deadline:
+            raise TimeoutError("Timed out waiting for the MQTT connection")
+        time.sleep(0.01)
+
+
+def run_load_test(rate=100.0, duration=10.0, payload_size=256, qos=1, max_inflight=20,
+                  host=None, port=1883, access_token='LOAD_TEST_TOKEN'):
+    """Runs a load test against an external broker, or a stub in a child process when host is None."""
+    broker = None
+    if host is None:
+        broker = BrokerStubProcess(access_tokens=[access_token])
+        port = broker.start()
+        host = '127.0.0.1'
+
+    tb_client = ThingsBoardClient(host, access_token, port=port)
+    tb_client.qos = qos
+    tb_client.mqtt_client.max_inflight_messages_set(max_inflight)
+    try:
+        tb_client.connect()
+        wait_for_connection(tb_client)
+        report = PublishLoadGenerator(tb_client, rate, duration, payload_size).run()
+        report['qos'] = qos
+        report['max_inflight'] = max_inflight
+        if broker is not None:
+            report['broker'] = broker.stats()
+        return report
+    finally:
+        tb_client.disconnect()
+        if broker is not None:
+            broker.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ThingsBoardClient publish load generator")
+    parser.add_argument('--rate', type=float, default=100.0, help="Messages per second, 0 for unthrottled")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to publish for")
+    parser.add_argument('--payload-size', type=int, default=256, help="Approximate telemetry JSON size in bytes")
+    parser.add_argument('--qos', type=int, choices=(0, 1), default=1)
+    parser.add_argument('--max-inflight', type=int, default=20, help="paho max in-flight QoS>0 messages")
+    parser.add_argument('--host', default=None, help="External broker host; omit to run the stub in a child process")
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--token', default='LOAD_TEST_TOKEN')
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.rate, args.duration, args.payload_size, args.qos, args.max_inflight,
+                           args.host, args.port, args.token)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        latency = report['latency_ms']
+        print(f"Sent {report['sent']} messages ({report['payload_bytes']} B) at QoS {report['qos']}, "
+              f"acked {report['acked']}, unacked {report['unacked']}, failed {report['failed']}")
+        print(f"Sustained throughput: {report['sustained_throughput']:.1f} msg/s "
+              f"(target {report['target_rate']:.1f} msg/s)")
+        print(f"Latency ms: p50={latency['p50']} p90={latency['p90']} p99={latency['p99']} max={latency['max']}")
+        print(f"CPU: {report['cpu_percent']:.1f}%  RSS: {report['rss_bytes'] / 1048576:.1f} MiB")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    main()
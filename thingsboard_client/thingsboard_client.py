@@ -36,6 +36,10 @@ class ThingsBoardClient:
         self.max_reconnect_delay = 120
         self.current_reconnect_delay = self.min_reconnect_delay
 
+        # Callbacks receiving shared attribute updates as a dict
+        self.attribute_listeners = []
+        self.attribute_request_id = 0
+
     def connect(self):
         logger.info("Connecting to ThingsBoard...")
         self.mqtt_client.connect(self.host, self.port, 60)
@@ -46,6 +50,7 @@ class ThingsBoardClient:
             logger.info("Connected to ThingsBoard.")
             self.mqtt_client.subscribe("v1/devices/me/rpc/request/+", qos=self.qos)
             self.mqtt_client.subscribe("v1/devices/me/attributes", qos=self.qos)
+            self.mqtt_client.subscribe("v1/devices/me/attributes/response/+", qos=self.qos)
             self.current_reconnect_delay = self.min_reconnect_delay
         else:
             logger.error(f"Failed to connect to ThingsBoard: {rc}")
@@ -70,6 +75,10 @@ class ThingsBoardClient:
         elif msg.topic == 'v1/devices/me/attributes':
             self.handle_attributes_update(payload)
 
+        elif msg.topic.startswith('v1/devices/me/attributes/response/'):
+            # Response to request_shared_attributes
+            self.handle_attributes_update(payload.get('shared', {}))
+
     def handle_rpc_request(self, topic, payload):
         request_id = topic.split('/')[-1]
         # Implement your RPC handling logic here
@@ -88,9 +97,26 @@ class ThingsBoardClient:
             return {"status": "success", "data": "Unknown method"}
 
     def handle_attributes_update(self, payload):
-        # Process attribute update
-        # Implement your attributes update handling logic here
-        pass
+        """Passes shared attribute updates to every registered listener."""
+        for listener in list(self.attribute_listeners):
+            try:
+                listener(payload)
+            except Exception as e:
+                logger.error(f"Attribute listener failed: {e}")
+
+    def add_attribute_listener(self, callback):
+        self.attribute_listeners.append(callback)
+
+    def publish_attributes(self, attributes):
+        """Publishes client attributes and returns the MQTTMessageInfo."""
+        return self.mqtt_client.publish('v1/devices/me/attributes', json.dumps(attributes), qos=self.qos)
+
+    def request_shared_attributes(self, keys=None):
+        """Asks ThingsBoard for the current shared attributes; the answer goes to the listeners."""
+        self.attribute_request_id += 1
+        request = {'sharedKeys': ','.join(keys) if keys else ''}
+        return self.mqtt_client.publish(f'v1/devices/me/attributes/request/{self.attribute_request_id}',
+                                        json.dumps(request), qos=self.qos)
 
     def on_disconnect(self, client, userdata, rc):
         if rc != 0:
@@ -99,8 +125,14 @@ class ThingsBoardClient:
         else:
             logger.info("Disconnected from ThingsBoard.")
 
+    def disconnect(self):
+        """Cleanly disconnects from ThingsBoard and stops the network loop."""
+        self.mqtt_client.disconnect()
+        self.mqtt_client.loop_stop()
+
     def publish_telemetry(self, telemetry):
-        self.mqtt_client.publish('v1/devices/me/telemetry', json.dumps(telemetry), qos=self.qos)
+        """Publishes telemetry and returns the MQTTMessageInfo so callers can track delivery."""
+        return self.mqtt_client.publish('v1/devices/me/telemetry', json.dumps(telemetry), qos=self.qos)
 
 # Example usage
 if __name__ == '__main__':